@@ -1,6 +1,7 @@
 from aws_sagemaker_remote.s3 import parse_s3
 import uuid
 from aws_sagemaker_remote.util.logging_util import print_err
+from aws_sagemaker_remote.session import s3_client
 
 
 def create_job(
@@ -9,7 +10,7 @@ def create_job(
     description, role_name, confirmation_required=True,
     ignore=0
 ):
-    s3 = session.client('s3')
+    s3 = s3_client(session)
     s3control = session.client('s3control')
     manifest = parse_s3(manifest)
     report = parse_s3(report)
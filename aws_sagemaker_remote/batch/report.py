@@ -3,10 +3,10 @@ import csv
 import json
 import sagemaker
 import os
-import codecs
-from aws_sagemaker_remote.s3 import get_file_string, get_file
+from aws_sagemaker_remote.s3 import get_file_string, open_file_text
 from aws_sagemaker_remote.util.batch import batch_describe
 from aws_sagemaker_remote.util.cli_argument import cli_argument
+from aws_sagemaker_remote.session import s3_client
 
 
 def batch_report(session, job, output):
@@ -28,7 +28,7 @@ def batch_report(session, job, output):
     report_manifests.reverse()
     failure_set = set()
     success_set = set()
-    s3 = session.boto_session.client('s3')
+    s3 = s3_client(session)
     os.makedirs(output, exist_ok=True)
     success_report = os.path.join(output, 'success.csv')
     failure_report = os.path.join(output, 'failure.csv')
@@ -66,9 +66,8 @@ def batch_report(session, job, output):
     with open(success_report, 'w', newline='') as fsuccess:
         wsuccess = csv.writer(fsuccess)
         for sr in success_reports:
-            with get_file(url=sr, s3=s3) as fi:
-                reader = codecs.getreader('utf-8')(fi)
-                for row in csv.reader(reader):
+            with open_file_text(url=sr, s3=s3, newline='', read_ahead=4) as f:
+                for row in csv.reader(f):
                     file_url = f"s3://{row[0]}/{row[1]}"
                     if file_url not in success_set:
                         wsuccess.writerow(row)
@@ -77,9 +76,8 @@ def batch_report(session, job, output):
     with open(failure_report, 'w', newline='') as ffailure:
         wfailure = csv.writer(ffailure)
         for fr in failure_reports:
-            with get_file(url=fr, s3=s3) as fi:
-                reader = codecs.getreader('utf-8')(fi)
-                for row in csv.reader(reader):
+            with open_file_text(url=fr, s3=s3, newline='', read_ahead=4) as f:
+                for row in csv.reader(f):
                     file_url = f"s3://{row[0]}/{row[1]}"
                     if file_url not in success_set and file_url not in failure_set:
                         wfailure.writerow(row)
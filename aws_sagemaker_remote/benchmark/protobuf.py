@@ -0,0 +1,118 @@
+"""
+Read throughput of RecordIO-protobuf readers.
+
+Compares ``util.protobuf_reader`` against ``mlio.RecordIOProtobufReader``
+(when ``mlio`` is installed) on a synthetic file of float32 and int32 features.
+
+Run with ``python -m aws_sagemaker_remote.benchmark.protobuf``.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from aws_sagemaker_remote.util.protobuf import RecordWriter
+from aws_sagemaker_remote.util.protobuf_reader import iterate_protobuf_batches
+from aws_sagemaker_remote.benchmark.recordio import MB, rates, write_report
+try:
+    import mlio
+    from mlio.integ.numpy import to_numpy
+except ImportError:
+    mlio = None
+
+STRING_FEATURE = 'text'
+
+
+def record_features(records, dim, seed=0, strings=None):
+    """
+    Features of ``records`` synthetic records: a float32 vector, an int32 vector,
+    an int32 label and, if ``strings`` is given, ``strings[i]`` as a string feature
+    """
+    rng = np.random.RandomState(seed)
+    for i in range(records):
+        features = {
+            'values': rng.rand(dim).astype(np.float32),
+            'ids': rng.randint(-2 ** 31, 2 ** 31 - 1, size=dim).astype(np.int32),
+            'label': np.array([i % 10], dtype=np.int32)
+        }
+        if strings is not None:
+            features[STRING_FEATURE] = strings[i]
+        yield features
+
+
+def write_records(path, records, dim, seed=0, strings=None):
+    """
+    Write the records of ``record_features`` and return the file size
+    """
+    with RecordWriter(path) as writer:
+        for features in record_features(records, dim=dim, seed=seed, strings=strings):
+            writer.write(features=features)
+    return os.path.getsize(path)
+
+
+def read_fallback(path, batch_size):
+    count = 0
+    with open(path, 'rb', buffering=0) as f:
+        for batch in iterate_protobuf_batches(f, batch_size=batch_size):
+            count += batch['label'].shape[0]
+    return count
+
+
+def read_mlio(path, batch_size):
+    reader = mlio.RecordIOProtobufReader(mlio.DataReaderParams(
+        dataset=[mlio.File(path)],
+        batch_size=batch_size
+    ))
+    count = 0
+    for example in reader:
+        count += to_numpy(example['label']).shape[0]
+    return count
+
+
+def readers():
+    ret = {'python': read_fallback}
+    if mlio is not None:
+        ret['mlio'] = read_mlio
+    return ret
+
+
+def benchmark(records=100000, dim=32, batch_size=64, repeat=3):
+    """
+    Compare reader throughput on a synthetic RecordIO-protobuf file and return a report dict
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'records.pbr')
+        size = write_records(path, records=records, dim=dim)
+        report = {
+            'records': records,
+            'dim': dim,
+            'batch_size': batch_size,
+            'file_mb': size / MB,
+            'readers': {}
+        }
+        for name, reader in readers().items():
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                count = reader(path, batch_size)
+                times.append(time.perf_counter() - start)
+                assert count == records
+            report['readers'][name] = rates(records, size, min(times))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RecordIO-protobuf readers')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    report = benchmark(
+        records=args.records, dim=args.dim,
+        batch_size=args.batch_size, repeat=args.repeat)
+    write_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Read throughput of RecordIO readers.
+
+Compares ``util.recordio.iterate_records`` against the reader that
+``util.pipes.read_examples`` used previously, which made an 8-byte header read
+and a fresh allocation per record.
+
+Run with ``python -m aws_sagemaker_remote.benchmark.recordio``.
+"""
+import argparse
+import array
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from aws_sagemaker_remote.util.recordio import MAGIC, write_recordio, iterate_records, DEFAULT_READ_BUFFER_SIZE
+
+MB = 1024 * 1024
+
+
+class PipeStream(object):
+    """
+    File wrapper whose ``read`` fills a buffer like an ``mlio`` pipe stream
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, buf):
+        return self.f.readinto(buf)
+
+
+def legacy_read_bytes(s, cnt):
+    bufs = []
+    tot = 0
+    while tot < cnt:
+        rem = cnt - tot
+        buf = bytearray(rem)
+        read = s.read(buf)
+        if read == 0:
+            raise ValueError(
+                "read 0 bytes. need {}/{} got {}".format(rem, cnt, read))
+        elif read == rem:
+            bufs.append(buf)
+        else:
+            bufs.append(buf[:read])
+        tot += read
+    if len(bufs) == 1:
+        return bufs[0]
+    else:
+        return b"".join(bufs)
+
+
+def legacy_read_examples(s):
+    """
+    Previous ``read_examples`` loop without its per-record logging and record cap
+    """
+    header_buf = array.array('I', [0, 0])
+    while True:
+        read = s.read(header_buf)
+        if read == 0:
+            break
+        if read != 8:
+            raise ValueError("Expected 8 got {}: {}".format(read, header_buf))
+        if header_buf[0] != MAGIC:
+            raise ValueError("Expected magic {} got {}".format(
+                hex(MAGIC), hex(header_buf[0])))
+        length = header_buf[1]
+        padding = (((length + 3) >> 2) << 2) - length
+        data_buf = legacy_read_bytes(s, length)
+        yield io.BytesIO(data_buf)
+        if padding > 0:
+            read = s.read(bytearray(padding))
+            if read != padding:
+                raise ValueError(
+                    "Expected to read padding {} but got {}".format(padding, read))
+
+
+def random_payloads(records, record_size, seed=0):
+    """
+    Random payloads of ``record_size`` bytes on average (between half and one and a half times)
+
+    Sizes and contents both come from ``seed``, so runs are reproducible.
+    """
+    rng = random.Random(seed)
+    for _ in range(records):
+        size = rng.randint(record_size // 2, record_size * 3 // 2)
+        yield rng.getrandbits(8 * size).to_bytes(size, 'little') if size else b''
+
+
+def write_records(path, payloads):
+    """
+    Write ``payloads`` as a RecordIO file and return the payload bytes
+    """
+    total = 0
+    with open(path, 'wb') as f:
+        for payload in payloads:
+            write_recordio(f, payload)
+            total += len(payload)
+    return total
+
+
+def rates(count, size, seconds):
+    return {
+        'seconds': seconds,
+        'records_per_second': count / seconds,
+        'mb_per_second': size / MB / seconds
+    }
+
+
+def write_report(report, output=None):
+    """
+    Write ``report`` as JSON to ``output`` (stdout if empty)
+    """
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+
+def record_length(record):
+    if isinstance(record, io.BytesIO):
+        return record.getbuffer().nbytes
+    return record.nbytes
+
+
+def time_reader(path, reader):
+    """
+    Read every record of ``path`` with ``reader`` and return ``(records, bytes, seconds)``
+    """
+    count = 0
+    size = 0
+    start = time.perf_counter()
+    with open(path, 'rb', buffering=0) as f:
+        for record in reader(PipeStream(f)):
+            count += 1
+            size += record_length(record)
+    return count, size, time.perf_counter() - start
+
+
+READERS = {
+    'legacy': legacy_read_examples,
+    'buffered': lambda s: iterate_records(s, buffer_size=DEFAULT_READ_BUFFER_SIZE)
+}
+
+
+def benchmark(records=200000, record_size=1024, repeat=3):
+    """
+    Compare reader throughput on a synthetic RecordIO file and return a report dict
+
+    The file is written to a temporary directory that is removed afterwards.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'records.rec')
+        payload = write_records(path, random_payloads(records, record_size))
+        report = {
+            'records': records,
+            'record_size': record_size,
+            'payload_mb': payload / MB,
+            'readers': {}
+        }
+        for name, reader in READERS.items():
+            best = min(
+                time_reader(path, reader)[2]
+                for _ in range(repeat)
+            )
+            report['readers'][name] = rates(records, payload, best)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RecordIO readers')
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--record-size', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    report = benchmark(
+        records=args.records, record_size=args.record_size, repeat=args.repeat)
+    write_report(report)
+
+
+if __name__ == '__main__':
+    main()
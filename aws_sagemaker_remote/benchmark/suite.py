@@ -0,0 +1,332 @@
+"""
+Throughput suite for the Pipe mode and RecordIO hot paths.
+
+Generates synthetic RecordIO and RecordIO-protobuf data and measures records/s
+and MB/s for each reader and writer against a local file or a FIFO. With a
+FIFO, a background thread feeds (or drains) the pipe like the SageMaker agent,
+so the numbers include the pipe overhead a training job sees.
+
+Cases:
+
+* ``write_recordio``: ``util.recordio.write_recordio``
+* ``encode_binary``: ``util.protobuf.encode_binary`` on each payload
+* ``write_record``: ``util.protobuf.write_record`` with float, int and string features
+* ``record_writer``: the same records through ``util.protobuf.RecordWriter``
+* ``iterate_records``: ``util.recordio.iterate_records``
+* ``read_examples``: ``util.pipes.read_examples``
+* ``chunk_iterable``: ``read_examples`` grouped by ``util.pipes.chunk_iterable``
+* ``protobuf_batches``: ``util.protobuf_reader.iterate_protobuf_batches``
+* ``decode_strings``: ``protobuf_batches`` plus ``decode_strings_batch`` on the string feature
+
+The report is JSON with one entry per case; the best of ``repeat`` runs is kept.
+
+Run with ``python -m aws_sagemaker_remote.benchmark.suite`` or
+``aws-sagemaker-remote benchmark run``.
+"""
+import argparse
+import contextlib
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from aws_sagemaker_remote.util.recordio import write_recordio, iterate_records
+from aws_sagemaker_remote.util.pipes import FilePipe, read_examples, chunk_iterable
+from aws_sagemaker_remote.util.protobuf import (
+    encode_binary, write_record, decode_strings_batch, LENGTH_FEATURE, RecordWriter
+)
+from aws_sagemaker_remote.util.protobuf_reader import iterate_protobuf_batches
+from aws_sagemaker_remote.benchmark.recordio import MB, random_payloads, write_records, rates, write_report
+from aws_sagemaker_remote.benchmark import protobuf
+from aws_sagemaker_remote.benchmark.protobuf import STRING_FEATURE, record_features
+
+TARGETS = ['file', 'fifo']
+PIPE_BUFFER_SIZE = MB
+
+
+def feed_fifo(source, fifo):
+    try:
+        with open(source, 'rb') as f, open(fifo, 'wb') as fo:
+            shutil.copyfileobj(f, fo, PIPE_BUFFER_SIZE)
+    except BrokenPipeError:
+        pass
+
+
+def drain_fifo(fifo):
+    with open(fifo, 'rb', buffering=0) as f:
+        buf = bytearray(PIPE_BUFFER_SIZE)
+        while f.readinto(buf):
+            pass
+
+
+@contextlib.contextmanager
+def read_target(source, target, directory):
+    """
+    Yield a pipe prefix ``path`` whose ``{path}_0`` reads the contents of ``source``.
+
+    For ``fifo`` a thread writes ``source`` into a new FIFO.
+    """
+    path = os.path.join(directory, 'read')
+    if target == 'file':
+        yield source[:-len('_0')]
+        return
+    os.mkfifo(path + '_0')
+    thread = threading.Thread(target=feed_fifo, args=(source, path + '_0'), daemon=True)
+    thread.start()
+    try:
+        yield path
+    finally:
+        thread.join()
+        os.unlink(path + '_0')
+
+
+@contextlib.contextmanager
+def write_target(target, directory):
+    """
+    Yield a file path to write to. For ``fifo`` a thread reads and discards everything written.
+    """
+    path = os.path.join(directory, 'write')
+    if target == 'file':
+        try:
+            yield path
+        finally:
+            os.unlink(path)
+        return
+    os.mkfifo(path)
+    thread = threading.Thread(target=drain_fifo, args=(path,), daemon=True)
+    thread.start()
+    try:
+        yield path
+    finally:
+        thread.join()
+        os.unlink(path)
+
+
+def case_write_recordio(data, path):
+    size = 0
+    with open(path, 'wb') as f:
+        for payload in data['payloads']:
+            size += write_recordio(f, payload)
+    return len(data['payloads']), size
+
+
+def case_encode_binary(data, path):
+    size = 0
+    for payload in data['payloads']:
+        size += encode_binary(payload).nbytes
+    return len(data['payloads']), size
+
+
+def case_write_record(data, path):
+    with open(path, 'wb') as f:
+        for features in data['features']:
+            write_record(f, features=features)
+        size = f.tell()
+    return len(data['features']), size
+
+
+def case_record_writer(data, path):
+    with RecordWriter(path) as writer:
+        for features in data['features']:
+            writer.write(features=features)
+    return writer.records, writer.bytes
+
+
+def case_iterate_records(data, path):
+    count = 0
+    size = 0
+    with FilePipe(path).open_read() as f:
+        for record in iterate_records(f):
+            count += 1
+            size += record.nbytes
+    return count, size
+
+
+def case_read_examples(data, path):
+    count = 0
+    size = 0
+    for example in read_examples(FilePipe(path)):
+        count += 1
+        size += example.nbytes
+    return count, size
+
+
+def case_chunk_iterable(data, path):
+    count = 0
+    size = 0
+    examples = (bytes(example) for example in read_examples(FilePipe(path)))
+    for chunk in chunk_iterable(examples, data['batch_size'], last='yield'):
+        count += len(chunk)
+        size += sum(len(example) for example in chunk)
+    return count, size
+
+
+def case_protobuf_batches(data, path):
+    count = 0
+    with FilePipe(path).open_read() as f:
+        for batch in iterate_protobuf_batches(f, batch_size=data['batch_size']):
+            count += batch['label'].shape[0]
+    return count, data['protobuf_size']
+
+
+def case_decode_strings(data, path):
+    count = 0
+    with FilePipe(path).open_read() as f:
+        for batch in iterate_protobuf_batches(f, batch_size=data['batch_size']):
+            strings = decode_strings_batch(
+                batch[STRING_FEATURE], batch[LENGTH_FEATURE.format(STRING_FEATURE)],
+                encoding='latin-1')
+            count += len(strings)
+    return count, data['protobuf_size']
+
+
+# name: (function, kind, source file of "read" cases)
+CASES = {
+    'write_recordio': (case_write_recordio, 'write', None),
+    'encode_binary': (case_encode_binary, 'memory', None),
+    'write_record': (case_write_record, 'write', None),
+    'record_writer': (case_record_writer, 'write', None),
+    'iterate_records': (case_iterate_records, 'read', 'recordio'),
+    'read_examples': (case_read_examples, 'read', 'recordio'),
+    'chunk_iterable': (case_chunk_iterable, 'read', 'recordio'),
+    'protobuf_batches': (case_protobuf_batches, 'read', 'protobuf'),
+    'decode_strings': (case_decode_strings, 'read', 'protobuf'),
+}
+
+
+def run_case(name, data, target, directory):
+    fn, kind, source = CASES[name]
+    if kind == 'read':
+        with read_target(data[source], target, directory) as path:
+            start = time.perf_counter()
+            count, size = fn(data, path)
+            seconds = time.perf_counter() - start
+    elif kind == 'write':
+        with write_target(target, directory) as path:
+            start = time.perf_counter()
+            count, size = fn(data, path)
+            seconds = time.perf_counter() - start
+    else:
+        start = time.perf_counter()
+        count, size = fn(data, None)
+        seconds = time.perf_counter() - start
+    return count, size, seconds
+
+
+def environment():
+    try:
+        import mlio
+        mlio_version = getattr(mlio, '__version__', 'installed')
+    except ImportError:
+        mlio_version = None
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'mlio': mlio_version
+    }
+
+
+def benchmark(
+    records=100000, record_size=256, dim=32, batch_size=64, repeat=3,
+    targets=('file',), cases=None, directory=None, seed=0
+):
+    """
+    Run the suite and return a report dict
+
+    Args:
+        records: number of synthetic records
+        record_size: average payload size in bytes
+        dim: length of the float32 and int32 protobuf features
+        batch_size: batch size of the batched readers and ``chunk_iterable``
+        repeat: runs per case; the fastest is reported
+        targets: ``file`` and/or ``fifo``
+        cases: names of ``CASES`` to run (default all)
+        directory: directory for the synthetic files (default a temporary directory)
+        seed: random seed of the synthetic data
+    """
+    cases = list(cases or CASES.keys())
+    for name in cases:
+        if name not in CASES:
+            raise ValueError("Unknown benchmark case [{}] (expected one of {})".format(
+                name, list(CASES.keys())))
+    for target in targets:
+        if target not in TARGETS:
+            raise ValueError("Unknown benchmark target [{}] (expected one of {})".format(
+                target, TARGETS))
+    tmp = tempfile.mkdtemp(prefix='benchmark-', dir=directory)
+    try:
+        payloads = list(random_payloads(records, record_size, seed=seed))
+        data = {
+            'payloads': payloads,
+            'features': list(record_features(records, dim=dim, seed=seed, strings=payloads)),
+            'batch_size': batch_size,
+            'recordio': os.path.join(tmp, 'recordio_0'),
+            'protobuf': os.path.join(tmp, 'protobuf_0')
+        }
+        write_records(data['recordio'], payloads)
+        data['protobuf_size'] = protobuf.write_records(
+            data['protobuf'], records, dim=dim, seed=seed, strings=payloads)
+        report = {
+            'environment': environment(),
+            'parameters': {
+                'records': records,
+                'record_size': record_size,
+                'dim': dim,
+                'batch_size': batch_size,
+                'repeat': repeat,
+                'payload_mb': sum(len(p) for p in payloads) / MB,
+                'protobuf_mb': data['protobuf_size'] / MB
+            },
+            'results': []
+        }
+        for name in cases:
+            kind = CASES[name][1]
+            for target in (targets if kind != 'memory' else ['memory']):
+                runs = [run_case(name, data, target, tmp) for _ in range(repeat)]
+                count, size, seconds = min(runs, key=lambda r: r[2])
+                if count != records:
+                    raise ValueError("Benchmark case [{}] processed {} of {} records".format(
+                        name, count, records))
+                result = dict({
+                    'case': name,
+                    'kind': kind,
+                    'target': target,
+                    'records': count,
+                    'mb': size / MB
+                }, **rates(count, size, seconds))
+                report['results'].append(result)
+                print("{case:>18} {target:>6}: {records_per_second:12.0f} rec/s {mb_per_second:10.1f} MB/s".format(
+                    **result), file=sys.stderr)
+        return report
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Pipe mode and RecordIO readers and writers')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--record-size', type=int, default=256)
+    parser.add_argument('--dim', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--target', choices=TARGETS, action='append', default=None,
+                        help='Read and write a local file or a FIFO (repeatable, default file)')
+    parser.add_argument('--case', choices=list(CASES.keys()), action='append', default=None,
+                        help='Case to run (repeatable, default all)')
+    parser.add_argument('--directory', default=None, help='Directory for synthetic data')
+    parser.add_argument('--output', default=None, help='JSON report path (default stdout)')
+    args = parser.parse_args()
+    report = benchmark(
+        records=args.records, record_size=args.record_size, dim=args.dim,
+        batch_size=args.batch_size, repeat=args.repeat,
+        targets=args.target or ['file'], cases=args.case,
+        directory=args.directory)
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
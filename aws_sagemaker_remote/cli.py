@@ -5,6 +5,7 @@ import logging
 import os
 from aws_sagemaker_remote.util.upload import upload
 from aws_sagemaker_remote.util.concat import s3_concat
+from aws_sagemaker_remote.s3 import download_file_or_folder
 from aws_sagemaker_remote.util.json_read import json_read
 from aws_sagemaker_remote.util.cli_argument import cli_argument
 from aws_sagemaker_remote.ecr.images import Images, ecr_build_image, Image
@@ -15,6 +16,8 @@ from aws_sagemaker_remote.inference.endpoint import endpoint_create, endpoint_de
 from aws_sagemaker_remote.inference.endpoint_config import endpoint_config_create, endpoint_config_delete, endpoint_config_describe
 from aws_sagemaker_remote.batch.report import batch_report
 from aws_sagemaker_remote.transform.transform import transform_create
+from aws_sagemaker_remote.util.shards import write_shards, SHARD_FORMATS, DEFAULT_SHARD_MB
+from aws_sagemaker_remote.util.recordio_index import build_index
 
 logging.getLogger('boto3').setLevel(logging.CRITICAL)
 logging.getLogger('botocore').setLevel(logging.CRITICAL)
@@ -103,20 +106,50 @@ def cli_s3():
 @click.argument('dst')
 @click.option('--gz/--no-gz', default=False)
 @click.option('--root', type=str, default=".", help="Target path in resulting zip file")
-def cli_s3_upload(src, dst, gz, root):
+@click.option('--gz-level', type=click.IntRange(0, 9), default=9, help="Compression level for --gz")
+@click.option('--sync/--no-sync', default=False, help="Only upload files that are new or changed")
+@click.option('--compare', type=click.Choice(['mtime', 'md5']), default='mtime', help="--sync compares size and modification time (mtime) or size and MD5 ETag (md5)")
+@click.option('--workers', type=int, default=16, help="Number of concurrent uploads for --sync")
+def cli_s3_upload(src, dst, gz, root, gz_level, sync, compare, workers):
     """
     Upload a file or directory to S3, optionally with GZIP
     """
     session = boto3.Session(profile_name=current_profile)
     session = sagemaker.Session(session)
-    upload(src=src, dst=dst, gz=gz, session=session, root=root)
+    upload(
+        src=src, dst=dst, gz=gz, session=session, root=root, gz_level=gz_level,
+        sync=sync, compare=compare, workers=workers)
+
+
+@cli_s3.command(name='download')
+@click.argument('src')
+@click.argument('dst')
+@click.option('--workers', type=int, default=16, help="Number of concurrent GET requests")
+@click.option('--part-size-mb', type=int, default=16, help="Files larger than this are downloaded as parallel byte ranges")
+def cli_s3_download(src, dst, workers, part_size_mb):
+    """
+    Download a file or directory from S3 using parallel and ranged GETs
+    """
+    session = boto3.Session(profile_name=current_profile)
+    download_file_or_folder(
+        uri=cli_argument(src, session=session),
+        session=session,
+        dest=dst,
+        file_subfolder=False,
+        workers=workers,
+        part_size=part_size_mb * 1024 * 1024
+    )
 
 
 @cli_s3.command(name='concat')
 @click.option('--manifest', help="Input manifest file")
 @click.option('--limit', type=int, default=0, help="Number of files (0 for all)")
-@click.option('--output', type=str, required=True, help="Output file path")
-def cli_s3_concat(manifest, limit, output):
+@click.option('--output', type=str, required=True, help="Output file path or S3 URI")
+@click.option('--workers', type=int, default=16, help="Number of concurrent GET requests")
+@click.option('--max-buffer-mb', type=int, default=256, help="Maximum size of fetched files waiting to be written")
+@click.option('--format', 'output_format', type=click.Choice(['raw', 'recordio']), default='raw', help="Write raw bytes or RecordIO records readable in Pipe mode")
+@click.option('--attribute', 'attributes', multiple=True, help="Manifest attribute to write for each line (repeatable, default file-ref, requires --format recordio). Attributes ending in -ref are downloaded")
+def cli_s3_concat(manifest, limit, output, workers, max_buffer_mb, output_format, attributes):
     """
     Download and concatenate multiple files from an S3 manifest
     """
@@ -126,8 +159,106 @@ def cli_s3_concat(manifest, limit, output):
         manifest=cli_argument(manifest, session=session),
         limit=limit,
         output=output,
-        session=session
+        session=session,
+        workers=workers,
+        max_buffer=max_buffer_mb * 1024 * 1024,
+        format=output_format,
+        attributes=attributes
+    )
+
+
+@cli.group(name='recordio')
+def cli_recordio():
+    """
+    RecordIO conversion commands
+    """
+    pass
+
+
+@cli_recordio.command(name='shard')
+@click.argument('input', type=click.Path(exists=True, file_okay=False))
+@click.option('--output', type=str, required=True, help="Output directory for shards")
+@click.option('--extension', 'extensions', multiple=True, help="Extension of the files of each example, in record order (repeatable, default every file is an example)")
+@click.option('--format', 'shard_format', type=click.Choice(SHARD_FORMATS), default='recordio', help="One RecordIO record per file or one RecordIO-protobuf record per example")
+@click.option('--shard-mb', type=float, default=DEFAULT_SHARD_MB, help="Target shard size in MB of input files (0 for no limit)")
+@click.option('--shard-records', type=int, default=0, help="Target examples per shard (0 for no limit)")
+@click.option('--name', type=str, default='shard', help="Shard file name prefix")
+@click.option('--manifest', type=str, default=None, help="Manifest path (default [output]-manifest.json)")
+@click.option('--manifest-prefix', type=str, default=None, help="Shard prefix in the manifest, usually the S3 URI the output is uploaded to")
+@click.option('--workers', type=int, default=None, help="Number of processes (default number of CPUs)")
+@click.option('--shuffle-seed', type=int, default=None, help="Shuffle examples across shards with this seed")
+@click.option('--index/--no-index', default=False, help="Write a .idx offset index next to each shard")
+def cli_recordio_shard(input, output, extensions, shard_format, shard_mb, shard_records, name, manifest, manifest_prefix, workers, shuffle_seed, index):
+    """
+    Convert a folder of samples into RecordIO shards and a ManifestFile manifest
+    """
+    write_shards(
+        input=input,
+        output=output,
+        extensions=extensions,
+        format=shard_format,
+        shard_mb=shard_mb,
+        shard_records=shard_records,
+        name=name,
+        manifest=manifest,
+        manifest_prefix=manifest_prefix,
+        workers=workers,
+        shuffle_seed=shuffle_seed,
+        index=index
+    )
+
+
+@cli_recordio.command(name='index')
+@click.argument('paths', nargs=-1, required=True)
+def cli_recordio_index(paths):
+    """
+    Build the .idx offset index of one or more RecordIO files
+    """
+    for path in paths:
+        offsets, lengths = build_index(path)
+        print("Indexed {} records of [{}]".format(len(offsets), path))
+
+
+@cli.group(name='benchmark')
+def cli_benchmark():
+    """
+    Local throughput benchmarks
+    """
+    pass
+
+
+@cli_benchmark.command(name='run')
+@click.option('--records', type=int, default=100000, help="Number of synthetic records")
+@click.option('--record-size', type=int, default=256, help="Average record payload size in bytes")
+@click.option('--dim', type=int, default=32, help="Length of the numeric protobuf features")
+@click.option('--batch-size', type=int, default=64, help="Batch size of batched readers")
+@click.option('--repeat', type=int, default=3, help="Runs per case (fastest is reported)")
+@click.option('--target', 'targets', type=click.Choice(['file', 'fifo']), multiple=True, help="Read and write a local file or a FIFO (repeatable, default file)")
+@click.option('--case', 'cases', type=str, multiple=True, help="Case to run (repeatable, default all). See `benchmark.suite.CASES`.")
+@click.option('--directory', type=str, default=None, help="Directory for synthetic data")
+@click.option('--output', type=str, default=None, help="JSON report path (default stdout)")
+def cli_benchmark_run(records, record_size, dim, batch_size, repeat, targets, cases, directory, output):
+    """
+    Measure records/s and MB/s of the RecordIO and Pipe mode readers and writers
+    """
+    # Imported here so other commands do not load the Pipe mode readers
+    from aws_sagemaker_remote.benchmark.suite import benchmark, write_report, CASES
+    for case in cases:
+        if case not in CASES:
+            raise click.BadParameter(
+                "Unknown case [{}] (expected one of {})".format(case, list(CASES.keys())),
+                param_hint='--case')
+    report = benchmark(
+        records=records,
+        record_size=record_size,
+        dim=dim,
+        batch_size=batch_size,
+        repeat=repeat,
+        targets=targets or ['file'],
+        cases=cases,
+        directory=directory
     )
+    write_report(report, output)
 
 
 @cli.group()
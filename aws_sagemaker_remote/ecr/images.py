@@ -12,6 +12,7 @@ except:
         Some aws-sagemaker-remote features may not be available"
     )
 from aws_sagemaker_remote.util.sts import get_account
+from aws_sagemaker_remote.session import s3_client
 
 
 class Image(object):
@@ -221,7 +222,7 @@ def download_files(
     files, session, base
 ):
     #print(f"download_files: {files} to base {base}")
-    s3 = session.client('s3')
+    s3 = s3_client(session)
     ret = {}
     for k, v in files.items():
         dest = os.path.join(base, k)
@@ -5,8 +5,8 @@ import torch
 from scipy.io import wavfile
 import json
 from urllib.parse import urlparse
-import boto3
 import os
+from aws_sagemaker_remote.session import s3_client, profile_session
 
 def input_fn(request_body, request_content_type):
     request_content_type = (request_content_type or "").strip()
@@ -25,8 +25,7 @@ def input_fn(request_body, request_content_type):
             ext = os.path.splitext(uri)[-1]
             ext = ext.lstrip(".")
             key = url.path.lstrip("/")
-            session = boto3.Session()
-            s3 = session.client('s3')
+            s3 = s3_client(profile_session())
             obj = s3.get_object(Bucket=bucket, Key=key)
             contents = BytesIO(obj['Body'].read())
             if ext.lower() == 'wav':
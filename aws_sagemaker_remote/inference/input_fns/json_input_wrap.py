@@ -1,9 +1,9 @@
 import os
 import json
-import boto3
 
 from aws_sagemaker_remote.inference.mime import JSON_TYPES, MIME_KEYS, MIME
 from aws_sagemaker_remote.s3 import get_file_bytes
+from aws_sagemaker_remote.session import s3_client, profile_session
 
 
 def get_mime(info, uri):
@@ -39,8 +39,7 @@ def json_input_wrap(request_body, request_content_type, profile_name=None):
             uri = uri.strip()
             #print("S3 Json: `{}`".format(uri))
             #url = parse_s3(uri)
-            session = boto3.Session(profile_name=profile_name)
-            s3 = session.client('s3')
+            s3 = s3_client(profile_session(profile_name))
             data = get_file_bytes(uri, s3=s3)
             extension = get_extension(info=info, uri=uri)
             mime = get_mime(info=info, uri=uri)
@@ -1,4 +1,5 @@
 import hashlib
+import os
 try:
     from shutil import COPY_BUFSIZE
 except:
@@ -23,3 +24,27 @@ def check_md5(path, md5=None):
             raise ValueError("MD5 mismatch. expected [{}], got [{}]".format(
                 md5, file_md5
             ))
+
+
+def calc_etag(path, part_size=None):
+    """
+    Calculate the S3 ETag of a file uploaded unencrypted in parts of ``part_size``
+    (a plain MD5 if the file is not larger than one part)
+    """
+    if not part_size or os.path.getsize(path) <= part_size:
+        return calc_md5(path)
+    digests = []
+    with open(path, 'rb') as f:
+        while True:
+            part_hash = hashlib.md5()
+            remaining = part_size
+            while remaining > 0:
+                fb = f.read(min(COPY_BUFSIZE, remaining))
+                if not fb:
+                    break
+                part_hash.update(fb)
+                remaining -= len(fb)
+            if remaining == part_size:
+                break
+            digests.append(part_hash.digest())
+    return "{}-{}".format(hashlib.md5(b"".join(digests)).hexdigest(), len(digests))
@@ -1,15 +1,70 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import inspect
 import multiprocessing
+import pickle
+import queue
+import threading
 import traceback
 
+ERROR_POLICIES = ['raise', 'collect']
 
-def wrap_worker(fn, *args):
-    semaphore.release()
+
+class WorkerError(object):
+    """
+    Result in place of a datum whose worker raised an exception (``errors='collect'``)
+
+    Attributes:
+        index: position of the datum in ``data``
+        datum: the datum
+        exception: the exception raised by the worker
+        traceback: formatted traceback of the exception
+    """
+
+    def __init__(self, index, datum, exception, traceback):
+        self.index = index
+        self.datum = datum
+        self.exception = exception
+        self.traceback = traceback
+
+    def __repr__(self):
+        return "WorkerError(index={}, exception={!r})".format(self.index, self.exception)
+
+
+def picklable_exception(e):
     try:
-        fn(*args)
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(repr(e))
+
+
+def call_worker(fn, index, datum, args, expand, errors):
+    try:
+        if expand:
+            return fn(*datum, *args)
+        else:
+            return fn(datum, *args)
     except Exception as e:
+        if errors == 'raise':
+            raise
         print("exception in worker: {}".format(e))
         traceback.print_exc()
-        raise e
+        return WorkerError(
+            index=index, datum=datum,
+            exception=picklable_exception(e),
+            traceback=traceback.format_exc()
+        )
+
+
+def wrap_worker(fn, start, chunk, args, expand, errors):
+    semaphore.release()
+    return [
+        call_worker(fn, start + i, datum, args, expand, errors)
+        for i, datum in enumerate(chunk)
+    ]
 
 
 def init_child(semaphore_):
@@ -17,23 +72,246 @@ def init_child(semaphore_):
     semaphore = semaphore_
 
 
-def run_workers(workers, fn, data, *args, expand=False, queue_size=100):
+def iterate_chunks(data, chunksize):
+    chunk = []
+    for datum in data:
+        chunk.append(datum)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def wrap_thread_worker(sem, fn, start, chunk, args, expand, errors):
+    sem.release()
+    return [
+        call_worker(fn, start + i, datum, args, expand, errors)
+        for i, datum in enumerate(chunk)
+    ]
+
+
+async def call_worker_async(fn, index, datum, args, expand, errors):
+    try:
+        if expand:
+            return await fn(*datum, *args)
+        else:
+            return await fn(datum, *args)
+    except Exception as e:
+        if errors == 'raise':
+            raise
+        print("exception in worker: {}".format(e))
+        traceback.print_exc()
+        return WorkerError(
+            index=index, datum=datum, exception=e,
+            traceback=traceback.format_exc()
+        )
+
+
+async def wrap_async_worker(limit, sem, fn, start, chunk, args, expand, errors):
+    async with limit:
+        sem.release()
+        return [
+            await call_worker_async(fn, start + i, datum, args, expand, errors)
+            for i, datum in enumerate(chunk)
+        ]
+
+
+@contextlib.contextmanager
+def process_pool(workers, queue_size):
+    """
+    Yield ``(submit, semaphore)`` for a process pool. ``submit`` returns a ``Future``
+    """
+    sem = multiprocessing.Semaphore(queue_size)
+    with multiprocessing.Pool(workers, initializer=init_child, initargs=(sem,)) as pool:
+        def submit(task):
+            future = concurrent.futures.Future()
+            pool.apply_async(
+                wrap_worker, task,
+                callback=future.set_result,
+                error_callback=future.set_exception
+            )
+            return future
+        yield submit, sem
+        pool.close()
+        pool.join()
+
+
+@contextlib.contextmanager
+def thread_pool(workers, queue_size):
+    sem = threading.Semaphore(queue_size)
+    executor = concurrent.futures.ThreadPoolExecutor(workers)
+    futures = []
+
+    def submit(task):
+        future = executor.submit(wrap_thread_worker, sem, *task)
+        futures.append(future)
+        if len(futures) > queue_size + workers:
+            futures[:] = [f for f in futures if not f.done()]
+        return future
+    try:
+        yield submit, sem
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        executor.shutdown(wait=True)
+
+
+async def cancel_tasks():
+    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@contextlib.contextmanager
+def asyncio_pool(workers, queue_size):
+    """
+    Run coroutines on an event loop in a background thread, at most ``workers`` at once
+    """
+    sem = threading.Semaphore(queue_size)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name='imap_workers', daemon=True)
+    thread.start()
+
+    async def create_limit():
+        return asyncio.Semaphore(workers)
+    limit = asyncio.run_coroutine_threadsafe(create_limit(), loop).result()
+
+    def submit(task):
+        return asyncio.run_coroutine_threadsafe(wrap_async_worker(limit, sem, *task), loop)
+    try:
+        yield submit, sem
+    except BaseException:
+        asyncio.run_coroutine_threadsafe(cancel_tasks(), loop).result()
+        raise
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+POOLS = {
+    'process': process_pool,
+    'thread': thread_pool,
+    'asyncio': asyncio_pool
+}
+BACKENDS = list(POOLS.keys()) + ['auto']
+
+
+def resolve_backend(backend, fn):
+    """
+    Backend for ``backend='auto'``: ``asyncio`` for coroutine functions and
+    ``process`` otherwise. Threads are only used when requested with
+    ``backend='thread'``, since ``auto`` cannot tell whether ``fn`` is I/O-bound.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend [{}] (expected one of {})".format(
+            backend, BACKENDS))
+    coroutine = inspect.iscoroutinefunction(fn)
+    if backend == 'auto':
+        return 'asyncio' if coroutine else 'process'
+    if coroutine != (backend == 'asyncio'):
+        raise ValueError("Backend [{}] {} a coroutine function".format(
+            backend, 'requires' if backend == 'asyncio' else 'does not accept'))
+    return backend
+
+
+def collect_results(submit, sem, tasks, ordered, max_pending):
+    """
+    Submit ``tasks`` while yielding the results of finished ones.
+
+    ``sem`` is acquired before each submission and released by the task when it starts.
+    """
+    if ordered:
+        pending = collections.deque()
+        for task in tasks:
+            sem.acquire()
+            pending.append(submit(task))
+            while pending and (pending[0].done() or len(pending) > max_pending):
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    else:
+        done = queue.Queue()
+        running = 0
+        for task in tasks:
+            sem.acquire()
+            submit(task).add_done_callback(done.put)
+            running += 1
+            while running and (not done.empty() or running > max_pending):
+                running -= 1
+                yield from done.get().result()
+        while running:
+            running -= 1
+            yield from done.get().result()
+
+
+def imap_workers(
+    workers, fn, data, *args, expand=False, queue_size=100, chunksize=1,
+    ordered=True, errors='raise', backend='process'
+):
+    """
+    Apply ``fn`` to each datum with ``workers`` parallel workers and yield the results.
+
+    At most ``queue_size`` tasks wait for a worker at any time, so ``data``
+    can be a very large generator. Each task is a chunk of ``chunksize``
+    datums, which saves a round trip per datum for small, fast tasks.
+
+    Args:
+        workers: number of workers (1 runs in the current thread, except with ``asyncio``)
+        fn: function called as ``fn(datum, *args)`` (or ``fn(*datum, *args)`` with ``expand``)
+        data: iterable of datums
+        expand: unpack each datum into positional arguments
+        queue_size: maximum number of tasks waiting for a worker
+        chunksize: datums per task
+        ordered: yield results in the order of ``data``; otherwise in order of completion
+        errors: ``raise`` to stop all workers and raise the first exception, or
+            ``collect`` to yield a ``WorkerError`` in place of each failed result
+        backend: ``process`` for a process pool, ``thread`` for a thread pool
+            (I/O-bound functions, no pickling), ``asyncio`` to run ``workers``
+            coroutines of a coroutine function ``fn`` at once, or ``auto`` (see ``resolve_backend``)
+    """
     assert workers > 0
-    if workers > 1:
+    assert chunksize > 0
+    if errors not in ERROR_POLICIES:
+        raise ValueError("Unknown error policy [{}] (expected one of {})".format(
+            errors, ERROR_POLICIES))
+    backend = resolve_backend(backend, fn)
+    if workers > 1 or backend == 'asyncio':
         assert queue_size > 0
-        sem = multiprocessing.Semaphore(queue_size)
-        with multiprocessing.Pool(workers, initializer=init_child, initargs=(sem,)) as pool:
-            for datum in data:
-                sem.acquire()
-                if expand:
-                    pool.apply_async(wrap_worker, (fn, *datum, *args))
-                else:
-                    pool.apply_async(wrap_worker, (fn, datum, *args))
-            pool.close()
-            pool.join()
+        tasks = (
+            (fn, i * chunksize, chunk, args, expand, errors)
+            for i, chunk in enumerate(iterate_chunks(data, chunksize))
+        )
+        with POOLS[backend](workers, queue_size) as (submit, sem):
+            yield from collect_results(
+                submit, sem, tasks, ordered=ordered, max_pending=queue_size + workers)
     else:
-        for datum in data:
-            if expand:
-                fn(*datum, *args)
-            else:
-                fn(datum, *args)
+        for i, datum in enumerate(data):
+            yield call_worker(fn, i, datum, args, expand, errors)
+
+
+def run_workers(
+    workers, fn, data, *args, expand=False, queue_size=100, chunksize=1,
+    ordered=True, errors='raise', backend='process', return_results=False
+):
+    """
+    Run ``fn`` on each datum (see ``imap_workers`` for arguments).
+
+    Results are discarded as they arrive unless ``return_results``, in which
+    case the list of results is returned. Use ``imap_workers`` to stream them.
+
+    An exception raised by a worker stops the run and is re-raised
+    (``errors='raise'``). Earlier versions only printed exceptions raised in
+    worker processes; pass ``errors='collect'`` to run every datum regardless.
+    """
+    results = imap_workers(
+        workers, fn, data, *args, expand=expand, queue_size=queue_size,
+        chunksize=chunksize, ordered=ordered, errors=errors, backend=backend
+    )
+    if return_results:
+        return list(results)
+    collections.deque(results, maxlen=0)
@@ -15,7 +15,7 @@ import datetime
 from aws_sagemaker_remote.util.cli_argument import cli_argument
 from aws_sagemaker_remote.util.json_read import json_converter
 from aws_sagemaker_remote.ecr.images import Images, ecr_ensure_image, Image
-from ..session import sagemaker_session
+from ..session import sagemaker_session, s3_client
 from .iam import ensure_processing_role
 from ..args import variable_to_argparse, get_local_path, PathArgument
 from .args import PROCESSING_INSTANCE, PROCESSING_JOB_NAME, PROCESSING_RUNTIME_SECONDS, INPUT_MOUNT, OUTPUT_MOUNT, MODULE_MOUNT
@@ -237,7 +237,7 @@ def process(
     command = ['sh']
     path_arguments = {}
     processing_inputs = []
-    s3 = session.boto_session.client('s3')
+    s3 = s3_client(session)
     for name, source in inputs.items():
         processing_input, path_argument = make_processing_input(
             mount=input_mount,
@@ -2,13 +2,28 @@ import boto3
 from urllib.request import urlparse
 from botocore.exceptions import ClientError
 import io
+import json
 from contextlib import closing
 import codecs
+import threading
+import time
+import weakref
 
 import os
 import sagemaker
-from aws_sagemaker_remote.util.fs import ensure_path
-from sagemaker.s3 import S3Downloader
+from aws_sagemaker_remote.util.download import (
+    download_objects, relative_key, DEFAULT_WORKERS, DEFAULT_PART_SIZE
+)
+from aws_sagemaker_remote.util.copy import (
+    copy_objects, DEFAULT_COPY_WORKERS, DEFAULT_COPY_PART_SIZE, DEFAULT_COPY_THRESHOLD
+)
+from aws_sagemaker_remote.util.listing import (
+    iterate_objects_parallel, DEFAULT_LIST_WORKERS, DEFAULT_QUEUE_SIZE, DEFAULT_MAX_DEPTH
+)
+from aws_sagemaker_remote.util.threads import prefetch_iterable
+from aws_sagemaker_remote.session import s3_client, client_session
+
+DEFAULT_READ_BUFFER = 1024 * 1024
 
 
 def list_objects(s3, url, **kwargs):
@@ -47,6 +62,29 @@ def iterate_all_objects(s3, url,  MaxKeys=1000):
             break
 
 
+def iterate_all_objects_parallel(
+    s3, url, workers=DEFAULT_LIST_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+    max_depth=DEFAULT_MAX_DEPTH, delimiter='/', MaxKeys=1000
+):
+    """
+    Iterate all objects under a prefix using parallel LIST requests.
+
+    Hierarchical prefixes are split by common prefix and flat prefixes by
+    ``StartAfter`` key ranges. Objects are yielded unordered. Unlike
+    ``iterate_all_objects``, an empty prefix yields nothing instead of raising.
+    """
+    return iterate_objects_parallel(
+        s3=s3,
+        bucket=url['Bucket'],
+        prefix=url['Key'],
+        workers=workers,
+        queue_size=queue_size,
+        max_depth=max_depth,
+        delimiter=delimiter,
+        MaxKeys=MaxKeys
+    )
+
+
 def list_all_objects(s3, url,  MaxKeys=1000):
     return [
         {
@@ -71,12 +109,107 @@ def get_file_string(url, s3, encoding='utf-8'):
     return get_file_bytes(url=url, s3=s3).decode(encoding)
 
 
-"""
 def get_file_text(url, s3, encoding='utf-8'):
-    with 
-    text = io.TextIOWrapper(get_file(url=url, s3=s3), encoding=encoding)
-    return text
-"""
+    """
+    Open an S3 object as a streaming text file. Use as a context manager.
+    """
+    obj = s3.get_object(**parse_s3(url))
+    return closing(codecs.getreader(encoding)(obj['Body']))
+
+
+def iterate_file_chunks(url, s3, chunk_size=DEFAULT_READ_BUFFER, read_ahead=0):
+    """
+    Yield an S3 object as byte chunks of at most ``chunk_size``.
+
+    If ``read_ahead`` is positive, a background thread keeps up to
+    ``read_ahead`` chunks downloaded ahead of the consumer.
+    """
+    with get_file(url=url, s3=s3) as body:
+        chunks = body.iter_chunks(chunk_size)
+        if read_ahead:
+            chunks = prefetch_iterable(chunks, read_ahead)
+        for chunk in chunks:
+            yield chunk
+
+
+class ChunkStream(io.RawIOBase):
+    """
+    Read-only raw stream over an iterator of byte chunks
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.chunk = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.chunk:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.chunk = memoryview(chunk)
+        n = min(len(b), len(self.chunk))
+        b[:n] = self.chunk[:n]
+        self.chunk = self.chunk[n:]
+        return n
+
+    def close(self):
+        if not self.closed and hasattr(self.chunks, 'close'):
+            self.chunks.close()
+        super(ChunkStream, self).close()
+
+
+def open_file_text(
+    url, s3, encoding='utf-8', newline=None, chunk_size=DEFAULT_READ_BUFFER, read_ahead=0
+):
+    """
+    Open an S3 object as a streaming text file (``io.TextIOWrapper``). Use as a context manager.
+
+    ``newline`` works like in ``open``; pass ``newline=''`` for ``csv.reader``.
+    See ``iterate_file_chunks`` for ``chunk_size`` and ``read_ahead``.
+    """
+    raw = ChunkStream(iterate_file_chunks(
+        url=url, s3=s3, chunk_size=chunk_size, read_ahead=read_ahead))
+    return io.TextIOWrapper(
+        io.BufferedReader(raw, buffer_size=chunk_size),
+        encoding=encoding,
+        newline=newline
+    )
+
+
+def iterate_file_lines(
+    url, s3, encoding='utf-8', chunk_size=DEFAULT_READ_BUFFER, read_ahead=0
+):
+    """
+    Yield decoded lines of an S3 object without line endings.
+
+    Lines end at ``\\n`` (a preceding ``\\r`` is dropped). Memory is bounded
+    by ``chunk_size`` (times ``read_ahead``) plus the longest line.
+    """
+    with open_file_text(
+        url=url, s3=s3, encoding=encoding, newline='\n',
+        chunk_size=chunk_size, read_ahead=read_ahead
+    ) as f:
+        for line in f:
+            if line.endswith('\n'):
+                line = line[:-1]
+            yield line[:-1] if line.endswith('\r') else line
+
+
+def iterate_file_jsonlines(
+    url, s3, encoding='utf-8', chunk_size=DEFAULT_READ_BUFFER, read_ahead=0
+):
+    """
+    Yield parsed records of a JSON-lines S3 object, skipping blank lines
+    """
+    for line in iterate_file_lines(
+        url=url, s3=s3, encoding=encoding, chunk_size=chunk_size, read_ahead=read_ahead
+    ):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
 
 
 def parse_s3(url, trailing=None):
@@ -106,85 +239,203 @@ class FileType(object):
     FOLDER = 'Folder'
 
 
-def is_s3_folder(uri, s3):
+DEFAULT_CACHE_TTL = 60
+
+
+def split_s3(uri):
     url = urlparse(uri)
     assert url.scheme == 's3'
     bucket = url.hostname
     key = url.path
     if key.startswith('/'):
         key = key[1:]
-    if not key.endswith('/'):
+    return bucket, key
+
+
+def folder_prefix(key):
+    if key and not key.endswith('/'):
         key += '/'
-    try:
-        response = s3.list_objects_v2(
-            Bucket=bucket,
-            # Delimiter='string',
-            # EncodingType='url',
-            MaxKeys=1,
-            Prefix=key,
-            # ContinuationToken='string',
-            # FetchOwner=True|False,
-            # StartAfter='string',
-            # RequestPayer='requester',
-            # ExpectedBucketOwner='string'
-        )
-        if response['KeyCount']:
-            return True
-        else:
-            return False
-    except ClientError:
-        return False
+    return key
+
+
+class S3MetadataCache(object):
+    """
+    Short-lived cache of HEAD and LIST results for one session and region.
+
+    Only positive results are cached, so objects created after a miss are
+    seen on the next lookup.
+    """
+
+    def __init__(self, s3, ttl=DEFAULT_CACHE_TTL):
+        self.s3 = s3
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def cached(self, key, fn):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = fn()
+        if value and self.ttl > 0:
+            with self.lock:
+                self.entries[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+
+    def head(self, bucket, key):
+        def fetch():
+            try:
+                return self.s3.head_object(Bucket=bucket, Key=key)
+            except ClientError:
+                return None
+        return self.cached(('head', bucket, key), fetch)
+
+    def is_folder(self, bucket, key):
+        def fetch():
+            try:
+                response = self.s3.list_objects_v2(
+                    Bucket=bucket,
+                    MaxKeys=1,
+                    Prefix=folder_prefix(key)
+                )
+                return bool(response['KeyCount'])
+            except ClientError:
+                return False
+        return self.cached(('folder', bucket, key), fetch)
+
+    def file_type(self, bucket, key):
+        """
+        Determine file or folder with a single ``list_objects_v2(MaxKeys=2)``.
+
+        Falls back to HEAD then LIST if listing is not permitted, and to a
+        folder LIST if sibling keys such as ``key.txt`` fill the first page.
+        """
+        def fetch():
+            try:
+                response = self.s3.list_objects_v2(
+                    Bucket=bucket,
+                    MaxKeys=2,
+                    Prefix=key
+                )
+            except ClientError:
+                if self.head(bucket, key):
+                    return FileType.FILE
+                elif self.is_folder(bucket, key):
+                    return FileType.FOLDER
+                else:
+                    return None
+            contents = response.get('Contents', [])
+            folder = folder_prefix(key)
+            if any(c['Key'] == key for c in contents):
+                return FileType.FILE
+            elif any(c['Key'].startswith(folder) for c in contents):
+                return FileType.FOLDER
+            elif response.get('IsTruncated', False) and self.is_folder(bucket, key):
+                return FileType.FOLDER
+            else:
+                return None
+        return self.cached(('type', bucket, key), fetch)
+
+
+# Session (or client not created by ``get_client``) to caches by region
+_metadata_caches = weakref.WeakKeyDictionary()
+_metadata_caches_lock = threading.Lock()
+
+
+def metadata_cache(s3, ttl=None):
+    """
+    Get the metadata cache of S3 client ``s3``, creating it if necessary.
+
+    Clients created by ``session.get_client`` share one cache per session and
+    region, whatever their connection pool size. Other clients get their own cache.
+    """
+    owner = client_session(s3) or s3
+    region = getattr(getattr(s3, 'meta', None), 'region_name', None)
+    with _metadata_caches_lock:
+        caches = _metadata_caches.get(owner)
+        if caches is None:
+            caches = {}
+            _metadata_caches[owner] = caches
+        cache = caches.get(region)
+        if cache is None:
+            cache = S3MetadataCache(
+                s3, ttl=DEFAULT_CACHE_TTL if ttl is None else ttl)
+            caches[region] = cache
+        elif ttl is not None:
+            cache.ttl = ttl
+    return cache
+
+
+def is_s3_folder(uri, s3):
+    bucket, key = split_s3(uri)
+    return metadata_cache(s3).is_folder(bucket, key)
 
 
 def is_s3_file(uri, s3):
-    url = urlparse(uri)
-    assert url.scheme == 's3'
-    bucket = url.hostname
-    key = url.path
-    if key.startswith('/'):
-        key = key[1:]
-    try:
-        response = s3.head_object(
-            Bucket=bucket,
-            Key=key)
-        return response
-    except ClientError:
-        return None
+    bucket, key = split_s3(uri)
+    return metadata_cache(s3).head(bucket, key)
 
 
 def get_file_type(uri, s3):
-    if is_s3_file(uri, s3):
-        return FileType.FILE
-    elif is_s3_folder(uri, s3):
-        return FileType.FOLDER
+    bucket, key = split_s3(uri)
+    file_type = metadata_cache(s3).file_type(bucket, key)
+    if file_type:
+        return file_type
     else:
         raise ValueError(
             "Cannot determine if URI [{}] is file or folder. Check your permissions, your AWS profile connection, and that URI exists.".format(uri))
 
 
-def download_file(Filename, s3, **kwargs):
-    ensure_path(Filename)
-    s3.download_file(
-        Filename=Filename,
-        **kwargs
+def download_file(Filename, s3, workers=DEFAULT_WORKERS, part_size=DEFAULT_PART_SIZE, **kwargs):
+    return download_objects(
+        s3=s3,
+        objects=[dict(Filename=Filename, **kwargs)],
+        workers=workers,
+        part_size=part_size
     )
 
 
-def download_folder(Filename, Bucket, Key, session):
-    if isinstance(session, boto3.Session):
-        session = sagemaker.Session(boto_session=session)
-    ensure_path(Filename)
-    S3Downloader.download(
-        s3_uri=f"s3://{Bucket}/{Key}",
-        local_path=Filename,
-        sagemaker_session=session
+def download_folder(Filename, Bucket, Key, session, workers=DEFAULT_WORKERS, part_size=DEFAULT_PART_SIZE):
+    if isinstance(session, sagemaker.Session):
+        session = session.boto_session
+    s3 = s3_client(session, workers=workers)
+    os.makedirs(Filename, exist_ok=True)
+
+    def objects():
+        for obj in iterate_all_objects_parallel(s3=s3, url={'Bucket': Bucket, 'Key': Key}):
+            key = obj['Key']
+            if key.endswith('/'):
+                continue
+            rel = relative_key(key, Key)
+            if rel is None:
+                continue
+            yield {
+                'Bucket': Bucket,
+                'Key': key,
+                'Size': obj['Size'],
+                'Filename': os.path.join(Filename, *rel.split('/'))
+            }
+    return download_objects(
+        s3=s3,
+        objects=objects(),
+        workers=workers,
+        part_size=part_size
     )
 
 
-def download_file_or_folder(uri, session, dest, file_subfolder=True, skip_if_exist=True):
+def download_file_or_folder(
+    uri, session, dest, file_subfolder=True, skip_if_exist=True,
+    workers=DEFAULT_WORKERS, part_size=DEFAULT_PART_SIZE
+):
     if isinstance(session, sagemaker.Session):
         session = session.boto_session
-    s3 = session.client('s3')
+    s3 = s3_client(session, workers=workers)
     ft = get_file_type(uri, s3=s3)
     url = parse_s3(uri)
     if ft == FileType.FILE:
@@ -192,6 +443,8 @@ def download_file_or_folder(uri, session, dest, file_subfolder=True, skip_if_exi
             download_folder(
                 session=session,
                 Filename=dest,
+                workers=workers,
+                part_size=part_size,
                 **url
             )
             return os.path.join(
@@ -202,6 +455,8 @@ def download_file_or_folder(uri, session, dest, file_subfolder=True, skip_if_exi
             download_file(
                 s3=s3,
                 Filename=dest,
+                workers=workers,
+                part_size=part_size,
                 **url
             )
             return dest
@@ -209,6 +464,8 @@ def download_file_or_folder(uri, session, dest, file_subfolder=True, skip_if_exi
         download_folder(
             session=session,
             Filename=dest,
+            workers=workers,
+            part_size=part_size,
             **url
         )
         return dest
@@ -217,36 +474,48 @@ def download_file_or_folder(uri, session, dest, file_subfolder=True, skip_if_exi
     pass
 
 
-def copy_s3(src, dst, s3):
+def copy_s3(
+    src, dst, s3, workers=DEFAULT_COPY_WORKERS, part_size=DEFAULT_COPY_PART_SIZE,
+    threshold=DEFAULT_COPY_THRESHOLD
+):
+    """
+    Copy every object under prefix ``src`` to prefix ``dst`` server-side.
+
+    Listing is paginated, objects are copied concurrently and objects larger
+    than ``threshold`` use multipart ``UploadPartCopy``. Headers and tags are
+    kept either way (see ``util.copy``).
+
+    Returns:
+        TransferStats with the number of objects and bytes copied
+    """
     src = parse_s3(src, trailing=True)
     dst = parse_s3(dst, trailing=True)
-    response = s3.list_objects_v2(
-        Bucket=src["Bucket"],
-        # Delimiter='string',
-        # EncodingType='url',
-        # MaxKeys=123,
-        Prefix=src['Key'],
-        # ContinuationToken='string',
-        # FetchOwner=True|False,
-        # StartAfter='string',
-        # RequestPayer='requester',
-        # ExpectedBucketOwner='string'
-    )
-    if 'Contents' in response:
-        for file in response['Contents']:
+
+    def objects():
+        for file in iterate_all_objects_parallel(s3=s3, url=src):
             fkey = file['Key'].lstrip('/')
             assert fkey.startswith(src['Key'])
             fout = f"{dst['Key']}{fkey[len(src['Key']):]}"
-            s3.copy_object(
-                CopySource={
-                    "Bucket": src['Bucket'],
-                    "Key": file['Key']
-                },
-                Bucket=dst['Bucket'],
-                Key=fout
-            )
+            yield {
+                "SrcBucket": src['Bucket'],
+                "SrcKey": file['Key'],
+                "Bucket": dst['Bucket'],
+                "Key": fout,
+                "Size": file['Size']
+            }
+    stats = copy_objects(
+        s3=s3,
+        objects=objects(),
+        workers=workers,
+        part_size=part_size,
+        threshold=threshold,
+        verbose=False
+    )
+    if stats.files:
+        print(stats)
     else:
         print(f"No files found under {src}")
+    return stats
 
 
 if __name__ == '__main__':
@@ -1,13 +1,121 @@
-
-from sagemaker.session import Session as SagemakerSession
+import threading
+import weakref
+from botocore.config import Config
 from boto3.session import Session as Boto3Session
 
+DEFAULT_MAX_POOL_CONNECTIONS = 64
+DEFAULT_MAX_ATTEMPTS = 10
+DEFAULT_RETRY_MODE = 'adaptive'
+
+client_defaults = {
+    'max_pool_connections': DEFAULT_MAX_POOL_CONNECTIONS,
+    'max_attempts': DEFAULT_MAX_ATTEMPTS,
+    'retry_mode': DEFAULT_RETRY_MODE
+}
+_clients = weakref.WeakKeyDictionary()
+# Client to a weak reference of the session that created it
+_client_sessions = weakref.WeakKeyDictionary()
+_profile_sessions = {}
+_lock = threading.Lock()
+
 
 def sagemaker_session(profile_name=None):
     if profile_name and len(profile_name) > 0:
         profile_name = profile_name
     else:
         profile_name = None
+    # Imported here so the inference containers can share clients without sagemaker
+    from sagemaker.session import Session as SagemakerSession
     boto_session = Boto3Session(profile_name=profile_name)
     sagemaker_session = SagemakerSession(boto_session=boto_session)
     return sagemaker_session
+
+
+def set_client_defaults(max_pool_connections=None, max_attempts=None, retry_mode=None):
+    """
+    Change the connection pool and retry settings used for clients created by ``get_client``.
+
+    Clients that were already created keep their settings.
+    """
+    with _lock:
+        if max_pool_connections is not None:
+            client_defaults['max_pool_connections'] = max_pool_connections
+        if max_attempts is not None:
+            client_defaults['max_attempts'] = max_attempts
+        if retry_mode is not None:
+            client_defaults['retry_mode'] = retry_mode
+
+
+def profile_session(profile_name=None):
+    """
+    Boto3 session for ``profile_name``, shared across calls
+    """
+    with _lock:
+        session = _profile_sessions.get(profile_name)
+        if session is None:
+            session = Boto3Session(profile_name=profile_name)
+            _profile_sessions[profile_name] = session
+    return session
+
+
+def get_client(session, service, region_name=None, max_pool_connections=None):
+    """
+    Get a boto3 client shared by everything using the same session, service and region.
+
+    Clients are thread-safe, so one pooled client can serve many concurrent
+    requests. The connection pool is larger than the botocore default of 10
+    and retries use adaptive mode so parallel transfers back off under throttling.
+
+    Args:
+        session: ``boto3.Session``, ``sagemaker.Session`` or ``None`` for the default profile
+        service: service name (e.g., ``s3``)
+        region_name: region override
+        max_pool_connections: connection pool size (default from ``set_client_defaults``)
+    """
+    # ``sagemaker.Session`` wraps the boto3 session that creates clients
+    session = getattr(session, 'boto_session', session)
+    if session is None:
+        session = profile_session()
+    with _lock:
+        pool = max_pool_connections or client_defaults['max_pool_connections']
+        key = (service, region_name, pool)
+        clients = _clients.get(session)
+        if clients is None:
+            clients = {}
+            _clients[session] = clients
+        client = clients.get(key)
+        if client is None:
+            config = Config(
+                max_pool_connections=pool,
+                retries={
+                    'max_attempts': client_defaults['max_attempts'],
+                    'mode': client_defaults['retry_mode']
+                }
+            )
+            client = session.client(
+                service,
+                region_name=region_name,
+                config=config
+            )
+            clients[key] = client
+            _client_sessions[client] = weakref.ref(session)
+    return client
+
+
+def client_session(client):
+    """
+    Session that created ``client`` with ``get_client``, or ``None``
+    """
+    with _lock:
+        ref = _client_sessions.get(client)
+    return ref() if ref is not None else None
+
+
+def s3_client(session, workers=None):
+    """
+    Shared S3 client with enough pooled connections for ``workers`` concurrent requests
+    """
+    pool = None
+    if workers and workers > client_defaults['max_pool_connections']:
+        pool = workers
+    return get_client(session, 's3', max_pool_connections=pool)
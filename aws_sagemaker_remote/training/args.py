@@ -128,6 +128,8 @@ def sagemaker_training_args(
     checkpoint_s3='default',
     checkpoint_container=CHECKPOINT_LOCAL_PATH,
     checkpoint_initial=None,
+    input_s3='default',
+    local_pipes=False,
     training_image=Images.TRAINING.tag,
     training_image_path=Images.TRAINING.path,
     training_image_accounts=Images.TRAINING.accounts,
@@ -206,6 +208,13 @@ def sagemaker_training_args(
     checkpoint_container: string, optional
         Local directory for checkpoints when running remotely.
         Set default for ``--sagemaker-checkpoint-container``.
+    input_s3: string, optional
+        S3 prefix for uploading local inputs or "default" for a prefix under the job name.
+        Use a fixed prefix so unchanged input files are not uploaded again on every run.
+        Set default for ``--sagemaker-input-s3``.
+    local_pipes: bool, optional
+        When running locally, serve Pipe mode inputs through local FIFOs like SageMaker does.
+        Set default for ``--sagemaker-local-pipes``.
     training_image : str, optional
         URI of ECR or DockerHub Docker image to use for training. 
         Set default for ``--sagemaker-training-image``.
@@ -314,6 +323,14 @@ def sagemaker_training_args(
             type=str,
             default=output_json,
             help='Output job details to JSON file.')
+        group.add_argument(
+            '--sagemaker-input-s3',
+            type=str,
+            default=input_s3,
+            help='S3 prefix for uploading local inputs or "default".'
+            ' Unchanged files already under a fixed prefix are not uploaded again. (default: "{}")'.format(input_s3))
+        bool_argument(group, '--sagemaker-local-pipes', default=local_pipes,
+                      help="When running locally, serve Pipe mode inputs through FIFOs (yes/no default={})".format(local_pipes))
 
         sagemaker_training_dependency_args(
             parser=parser, dependencies=config.dependencies)
@@ -3,10 +3,11 @@ from pathlib import Path
 from urllib.parse import urlparse, urljoin
 from urllib.request import pathname2url, url2pathname
 import sagemaker
-from sagemaker.s3 import S3Uploader
 from aws_sagemaker_remote.args import PathArgument
 from aws_sagemaker_remote.util.cli_argument import cli_argument
 from aws_sagemaker_remote.s3 import parse_s3, get_file_type, FileType
+from aws_sagemaker_remote.util.sync import sync_upload
+from aws_sagemaker_remote.session import s3_client
 
 
 def process_channels(channels, args, session, prefix):
@@ -105,10 +106,12 @@ def upload_local_channel(channel, session, s3_uri):
         return channel
     elif url.scheme == 'file':
         path = url2pathname(url.path)
-        S3Uploader.upload(
-            local_path=path,
-            desired_s3_uri=s3_uri,
-            sagemaker_session=session
+        dst = parse_s3(s3_uri)
+        sync_upload(
+            s3=s3_client(session),
+            src=path,
+            Bucket=dst['Bucket'],
+            Key=dst['Key']
         )
         if os.path.isfile(path):
             #todo: urljoin
@@ -126,7 +129,7 @@ def upload_local_channel(channel, session, s3_uri):
 def expand_folder_channels(channels, session):
     if isinstance(session, sagemaker.Session):
         session = session.boto_session
-    s3 = session.client('s3')
+    s3 = s3_client(session)
     chs = {}
     """
     v.mode in [
@@ -190,7 +193,7 @@ def expand_repeated_channels(channels):
 def set_suffixes(channels, session, hyperparameters):
     if isinstance(session, sagemaker.Session):
         session = session.boto_session
-    s3 = session.client('s3')
+    s3 = s3_client(session)
     for k, v in channels.items():
         key = '{}-suffix'.format(k.replace('_', '-'))
         if v.mode in ['File']:
@@ -0,0 +1,87 @@
+import os
+from aws_sagemaker_remote.args import get_mode, get_s3_data_type, get_record_wrapping
+from aws_sagemaker_remote.util.pipe_emulator import PipeEmulator, list_prefix, is_s3
+
+
+def local_pipe_channels(args, config, emulator: PipeEmulator):
+    """
+    Expand the Pipe mode inputs of ``args`` into emulated channels.
+
+    Channels are named like the channels of a remote job: lists become
+    ``{name}_{i}``, manifest folders ``{name}_{manifest}`` and repeated
+    channels ``{name}_repeat_{i}``.
+
+    Returns:
+        dict of input name to dict of channel name to ``PipeChannel`` arguments
+    """
+    inputs = {}
+    for k, v in config.inputs.items():
+        mode = getattr(args, "{}_mode".format(k), None) or v.mode
+        local = getattr(args, k, None)
+        if not local or get_mode(mode) != 'Pipe':
+            continue
+        attributes = v.attributes
+        if callable(attributes):
+            attributes = attributes(args)
+        repeat = getattr(args, "{}_repeat".format(k), v.repeat) or 1
+        shuffle = getattr(args, "{}_shuffle".format(k), v.shuffle)
+        if isinstance(local, list):
+            uris = {"{}_{}".format(k, i): x for i, x in enumerate(local)}
+        else:
+            uris = {k: local}
+        if "Folder" in mode:
+            mode = mode.replace("Folder", "File")
+            uris = {
+                "{}_{}".format(name, os.path.splitext(os.path.basename(m))[0].replace("-", "_")): m
+                for name, uri in uris.items()
+                for m in list_prefix(uri, s3=emulator.client() if is_s3(uri) else None)
+            }
+        channels = {}
+        for name, uri in uris.items():
+            kwargs = {
+                'uri': uri,
+                's3_data_type': get_s3_data_type(mode),
+                'record_wrapping': get_record_wrapping(mode),
+                'attribute_names': attributes,
+                'shuffle': shuffle
+            }
+            if repeat > 1:
+                for i in range(repeat):
+                    channels["{}_repeat_{}".format(name, i)] = kwargs
+            else:
+                channels[name] = kwargs
+        inputs[k] = channels
+    return inputs
+
+
+def local_pipe_args(args, config, emulator: PipeEmulator):
+    """
+    Serve the Pipe mode inputs of ``args`` with ``emulator`` and point the arguments at the FIFOs.
+
+    Arguments are rewritten like ``sagemaker_env_args`` does inside a SageMaker
+    container: an input with one channel becomes the pipe path, and an input
+    with several channels becomes a dictionary of channel suffix to pipe path.
+    Shuffled channels use seed ``123 + i`` like remote jobs.
+    """
+    kwargs = vars(args)
+    i = 0
+    for k, channels in local_pipe_channels(args, config, emulator).items():
+        paths = {}
+        for name, channel in channels.items():
+            channel = dict(channel)
+            shuffle = channel.pop('shuffle')
+            paths[name] = emulator.add_channel(
+                name=name,
+                shuffle_seed=123 + i if shuffle else None,
+                **channel
+            )
+            i += 1
+        if list(paths.keys()) == [k]:
+            kwargs[k] = paths[k]
+        else:
+            kwargs[k] = {
+                name[len(k) + 1:]: path for name, path in paths.items()
+            }
+            kwargs.update(paths)
+        print("Local pipe input [{}]: [{}]".format(k, kwargs[k]))
+    return args
@@ -1,5 +1,7 @@
 from .train import sagemaker_training_run
 from .args import sagemaker_training_args, sagemaker_env_args
+from .local_pipes import local_pipe_args
+from ..util.pipe_emulator import PipeEmulator
 from argparse import ArgumentParser
 import inspect
 import os
@@ -18,7 +20,14 @@ def sagemaker_training_handle(args, config, main, metrics=None):
     else:
         # Local processing or on SageMaker container
         args = sagemaker_env_args(args=args, config=config)
-        main(args)
+        if getattr(args, 'sagemaker_local_pipes', False) and not args.is_sagemaker:
+            # Serve Pipe mode inputs through local FIFOs
+            emulator = PipeEmulator(profile_name=args.sagemaker_profile)
+            args = local_pipe_args(args=args, config=config, emulator=emulator)
+            with emulator:
+                main(args)
+        else:
+            main(args)
 
 
 class TrainingCommand(Command):
@@ -22,6 +22,7 @@ from sagemaker.s3 import S3Uploader
 from sagemaker.inputs import ShuffleConfig
 from aws_sagemaker_remote.ecr.images import ecr_ensure_image, Image
 from aws_sagemaker_remote.s3 import copy_s3
+from aws_sagemaker_remote.session import s3_client
 
 
 def sagemaker_training_run(
@@ -75,7 +76,14 @@ def sagemaker_training_run(
     tags["BaseJobName"] = args.sagemaker_base_job_name
     tags = make_tags(tags)
     #checkpoint_s3_uri = 's3://{}/{}/checkpoints'.format(bucket, job_name)
-    input_prefix = "s3://{}/{}/inputs".format(bucket, job_name)
+    input_s3 = getattr(args, 'sagemaker_input_s3', None)
+    if input_s3 and input_s3 != 'default':
+        if not input_s3.startswith('s3://'):
+            raise ValueError(
+                "--sagemaker-input-s3 must be an S3 URI (s3://...) or \"default\"")
+        input_prefix = input_s3.rstrip('/')
+    else:
+        input_prefix = "s3://{}/{}/inputs".format(bucket, job_name)
     iam = session.boto_session.client('iam')
     training_role = ensure_training_role(
         iam=iam, role_name=args.sagemaker_training_role)
@@ -96,7 +104,7 @@ def sagemaker_training_run(
             copy_s3(
                 args.checkpoint_initial,
                 checkpoint_s3,
-                session.boto_session.client('s3')
+                s3_client(session)
             )
         else:
             S3Uploader.upload(
@@ -108,7 +116,7 @@ def sagemaker_training_run(
     if 'sagemaker-job-name' in hyperparameters:
         del hyperparameters['sagemaker-job-name']
 
-    s3 = session.boto_session.client('s3')
+    s3 = s3_client(session)
     channels = config.inputs
     channels = process_channels(
         channels,
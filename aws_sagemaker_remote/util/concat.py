@@ -1,21 +1,228 @@
+import collections
 import json
 import os
-from aws_sagemaker_remote.s3 import get_file
+import threading
+from contextlib import closing, contextmanager
+from aws_sagemaker_remote.s3 import parse_s3, iterate_file_lines
+from aws_sagemaker_remote.session import s3_client
+from aws_sagemaker_remote.util.download import TransferStats, MB
+from aws_sagemaker_remote.util.multipart import MultipartUploadWriter
+from aws_sagemaker_remote.util.recordio import write_recordio, encode_attribute
+from aws_sagemaker_remote.util.threads import BoundedExecutor
 
+DEFAULT_CONCAT_WORKERS = 16
+DEFAULT_CONCAT_BUFFER = 256 * MB
+OUTPUT_FORMATS = ['raw', 'recordio']
+DEFAULT_ATTRIBUTES = ['file-ref']
 
-def s3_concat(session, manifest, output, limit):
-    s3 = session.boto_session.client('s3')
-    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
-    with open(output, 'wb') as fo:
+
+def iterate_manifest_lines(manifest, s3):
+    if manifest.startswith('s3://'):
+        for line in iterate_file_lines(url=manifest, s3=s3, read_ahead=4):
+            yield line
+    else:
         with open(manifest) as f:
-            for i, line in enumerate(f):
-                info = json.loads(line)
-                ref = info['file-ref']
-                with get_file(
-                    url=ref,
-                    s3=s3
-                ) as data:
-                    fo.write(data.read())
-                if limit and i + 1 >= limit:
-                    break
-    print(f"Concatenated {i+1} files")
+            for line in f:
+                yield line
+
+
+class ByteBudget(object):
+    """
+    Caps the bytes held by fetched objects that are waiting to be written.
+
+    The next object to be written may always proceed so ordered output cannot deadlock.
+    After ``abort``, waiting and later ``acquire`` calls raise so fetch threads exit.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.next_index = 0
+        self.aborted = False
+        self.condition = threading.Condition()
+
+    def acquire(self, size, index):
+        with self.condition:
+            while not (
+                self.aborted or
+                self.used + size <= self.limit or
+                index == self.next_index
+            ):
+                self.condition.wait()
+            if self.aborted:
+                raise RuntimeError("Concatenation aborted")
+            self.used += size
+
+    def abort(self):
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+
+    def release(self, size, index=None):
+        with self.condition:
+            self.used -= size
+            if index is not None:
+                self.next_index = index + 1
+            self.condition.notify_all()
+
+
+def fetch_object(s3, url, index, budget):
+    if not url.startswith('s3://'):
+        size = os.path.getsize(url)
+        budget.acquire(size, index)
+        try:
+            with open(url, 'rb') as f:
+                return f.read()
+        except BaseException:
+            budget.release(size)
+            raise
+    response = s3.get_object(**parse_s3(url))
+    size = response['ContentLength']
+    budget.acquire(size, index)
+    try:
+        with closing(response['Body']) as body:
+            return body.read()
+    except BaseException:
+        budget.release(size)
+        raise
+
+
+def fetch_records(s3, info, attributes, index, budget):
+    """
+    Fetch one payload per attribute of manifest line ``info``.
+
+    Attributes ending in ``-ref`` are S3 URIs (or local paths) whose objects
+    are fetched, other attributes are encoded with ``encode_attribute``.
+    """
+    records = []
+    try:
+        for attribute in attributes:
+            if attribute not in info:
+                raise ValueError("Manifest line {} has no attribute [{}]".format(
+                    index, attribute))
+            if attribute.endswith('-ref'):
+                records.append(fetch_object(
+                    s3=s3, url=info[attribute], index=index, budget=budget))
+            else:
+                data = encode_attribute(info[attribute])
+                budget.acquire(len(data), index)
+                records.append(data)
+    except BaseException:
+        budget.release(sum(len(r) for r in records))
+        raise
+    return records
+
+
+@contextmanager
+def open_output(output, s3):
+    if output.startswith('s3://'):
+        with MultipartUploadWriter(s3=s3, **parse_s3(output)) as fo:
+            yield fo
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'wb') as fo:
+            yield fo
+
+
+def check_format(format, attributes):
+    if format not in OUTPUT_FORMATS:
+        raise ValueError("Unknown format [{}] (expected one of {})".format(
+            format, OUTPUT_FORMATS))
+    attributes = list(attributes or DEFAULT_ATTRIBUTES)
+    if format == 'raw' and attributes != DEFAULT_ATTRIBUTES:
+        raise ValueError(
+            "Attributes other than {} require format [recordio]".format(DEFAULT_ATTRIBUTES))
+    return attributes
+
+
+def concat_lines(
+    fo, s3, lines, workers=DEFAULT_CONCAT_WORKERS, max_buffer=DEFAULT_CONCAT_BUFFER,
+    format='raw', attributes=None, stats=None
+):
+    """
+    Write the records of parsed manifest lines to file object ``fo`` in order.
+
+    See ``s3_concat`` for the arguments.
+    """
+    attributes = check_format(format, attributes)
+    budget = ByteBudget(max_buffer)
+    window = collections.deque()
+    stats = stats or TransferStats('Concatenated')
+
+    def write_next():
+        index, future = window.popleft()
+        records = future.result()
+        size = 0
+        for data in records:
+            if format == 'recordio':
+                write_recordio(fo, data)
+            else:
+                fo.write(data)
+            size += len(data)
+        stats.add(files=1, bytes=size)
+        budget.release(size, index)
+
+    with BoundedExecutor(workers) as executor:
+        try:
+            for i, info in enumerate(lines):
+                window.append((i, executor.submit(
+                    fetch_records,
+                    s3=s3,
+                    info=info,
+                    attributes=attributes,
+                    index=i,
+                    budget=budget
+                )))
+                while window and (
+                    window[0][1].done() or
+                    len(window) > workers * 4
+                ):
+                    write_next()
+            while window:
+                write_next()
+        except BaseException:
+            # Wake fetches waiting for budget before the executor waits for them
+            budget.abort()
+            raise
+    return stats
+
+
+def s3_concat(
+    session, manifest, output, limit,
+    workers=DEFAULT_CONCAT_WORKERS, max_buffer=DEFAULT_CONCAT_BUFFER,
+    format='raw', attributes=None
+):
+    """
+    Concatenate the ``file-ref`` objects of a JSON-lines manifest in manifest order.
+
+    Up to ``workers`` GETs are in flight while earlier objects are written,
+    and fetched objects waiting to be written are capped at ``max_buffer``
+    bytes. ``output`` may be a local path or an S3 URI.
+
+    With ``format='recordio'`` every payload is framed as a RecordIO record,
+    so the output can be read in Pipe mode. ``attributes`` selects the
+    manifest attributes written for each line, in order, like the
+    ``AttributeNames`` of an ``AugmentedManifestFile`` channel.
+    """
+    attributes = check_format(format, attributes)
+    s3 = s3_client(session, workers=workers)
+
+    def lines():
+        for i, line in enumerate(iterate_manifest_lines(manifest, s3=s3)):
+            if limit and i >= limit:
+                break
+            yield json.loads(line)
+
+    with open_output(output, s3=s3) as fo:
+        stats = concat_lines(
+            fo=fo,
+            s3=s3,
+            lines=lines(),
+            workers=workers,
+            max_buffer=max_buffer,
+            format=format,
+            attributes=attributes
+        )
+    stats.finish()
+    print(stats)
+    return stats
@@ -0,0 +1,204 @@
+"""
+Concurrent server-side S3 copy.
+
+Objects are copied with ``copy_object`` by a thread pool. Objects larger than
+``threshold`` (and always those over the 5 GB ``copy_object`` limit) are copied
+with a multipart upload whose ``UploadPartCopy`` parts also run in parallel.
+
+``copy_object`` keeps all headers of the source (``MetadataDirective=COPY``).
+Multipart copies set the ``COPY_HEADERS`` returned by ``head_object`` and the
+source tags on the new upload, so both paths produce the same object. Objects
+encrypted with customer-provided keys (SSE-C) are not supported.
+"""
+import threading
+from urllib.parse import urlencode
+from aws_sagemaker_remote.util.download import TransferStats, byte_ranges
+from aws_sagemaker_remote.util.threads import BoundedExecutor
+
+DEFAULT_COPY_WORKERS = 16
+DEFAULT_COPY_PART_SIZE = 256 * 1024 * 1024
+DEFAULT_COPY_THRESHOLD = 1024 * 1024 * 1024
+MAX_COPY_OBJECT_SIZE = 5 * 1024 * 1024 * 1024
+MAX_PARTS = 10000
+COPY_HEADERS = [
+    'CacheControl', 'ContentDisposition', 'ContentEncoding', 'ContentLanguage',
+    'ContentType', 'Expires', 'Metadata', 'WebsiteRedirectLocation',
+    'ServerSideEncryption', 'SSEKMSKeyId', 'BucketKeyEnabled', 'StorageClass',
+    'ObjectLockMode', 'ObjectLockRetainUntilDate', 'ObjectLockLegalHoldStatus'
+]
+
+
+def copy_headers(s3, Bucket, Key):
+    """
+    ``create_multipart_upload`` arguments that reproduce the headers and tags of an object
+    """
+    head = s3.head_object(Bucket=Bucket, Key=Key)
+    kwargs = {
+        header: head[header]
+        for header in COPY_HEADERS
+        if head.get(header)
+    }
+    tags = s3.get_object_tagging(Bucket=Bucket, Key=Key)['TagSet']
+    if tags:
+        kwargs['Tagging'] = urlencode([(tag['Key'], tag['Value']) for tag in tags])
+    return kwargs
+
+
+def copy_whole(s3, SrcBucket, SrcKey, Bucket, Key, Size, stats):
+    s3.copy_object(
+        CopySource={
+            "Bucket": SrcBucket,
+            "Key": SrcKey
+        },
+        Bucket=Bucket,
+        Key=Key
+    )
+    stats.add(files=1, bytes=Size)
+
+
+class MultipartCopy(object):
+    """
+    Multipart copy of one object. The upload is completed by whichever part finishes last
+    and aborted if any part or the completion fails. ``copy_objects`` also aborts
+    uploads left unfinished because their parts were cancelled.
+    """
+
+    def __init__(self, s3, SrcBucket, SrcKey, Bucket, Key, Size, part_size, stats):
+        self.s3 = s3
+        self.SrcBucket = SrcBucket
+        self.SrcKey = SrcKey
+        self.Bucket = Bucket
+        self.Key = Key
+        self.Size = Size
+        self.stats = stats
+        # Stay under the part count limit for very large objects
+        self.part_size = max(part_size, -(-Size // MAX_PARTS))
+        self.ranges = list(byte_ranges(Size, self.part_size))
+        self.parts = {}
+        self.failed = False
+        self.completed = False
+        self.lock = threading.Lock()
+        self.upload_id = None
+
+    def start(self):
+        kwargs = copy_headers(self.s3, Bucket=self.SrcBucket, Key=self.SrcKey)
+        response = self.s3.create_multipart_upload(
+            Bucket=self.Bucket,
+            Key=self.Key,
+            **kwargs
+        )
+        self.upload_id = response['UploadId']
+
+    def copy_part(self, number, start, end):
+        try:
+            response = self.s3.upload_part_copy(
+                Bucket=self.Bucket,
+                Key=self.Key,
+                UploadId=self.upload_id,
+                PartNumber=number,
+                CopySource={
+                    "Bucket": self.SrcBucket,
+                    "Key": self.SrcKey
+                },
+                CopySourceRange="bytes={}-{}".format(start, end)
+            )
+        except Exception:
+            self.abort()
+            raise
+        self.stats.add(bytes=end - start + 1)
+        with self.lock:
+            self.parts[number] = response['CopyPartResult']['ETag']
+            last = len(self.parts) == len(self.ranges)
+        if last:
+            self.complete()
+
+    def complete(self):
+        try:
+            self.s3.complete_multipart_upload(
+                Bucket=self.Bucket,
+                Key=self.Key,
+                UploadId=self.upload_id,
+                MultipartUpload={
+                    'Parts': [
+                        {'PartNumber': n, 'ETag': self.parts[n]}
+                        for n in sorted(self.parts)
+                    ]
+                }
+            )
+        except Exception:
+            self.abort()
+            raise
+        with self.lock:
+            self.completed = True
+        self.stats.add(files=1)
+
+    def abort(self):
+        with self.lock:
+            if self.failed or self.completed or self.upload_id is None:
+                return
+            self.failed = True
+        self.s3.abort_multipart_upload(
+            Bucket=self.Bucket,
+            Key=self.Key,
+            UploadId=self.upload_id
+        )
+
+    def submit(self, executor):
+        for number, (start, end) in enumerate(self.ranges, 1):
+            executor.submit(self.copy_part, number, start, end)
+
+
+def copy_objects(
+    s3, objects, workers=DEFAULT_COPY_WORKERS, part_size=DEFAULT_COPY_PART_SIZE,
+    threshold=DEFAULT_COPY_THRESHOLD, verbose=True
+):
+    """
+    Copy many S3 objects concurrently without downloading them
+
+    Args:
+        s3: boto3 S3 client
+        objects: iterable of dicts with ``SrcBucket``, ``SrcKey``, ``Bucket``, ``Key`` and ``Size``
+        workers: number of concurrent copy requests
+        part_size: part size for multipart copies
+        threshold: objects larger than this use multipart ``UploadPartCopy``
+        verbose: print a summary when finished
+
+    Returns:
+        TransferStats
+    """
+    threshold = min(threshold, MAX_COPY_OBJECT_SIZE)
+    stats = TransferStats('Copied')
+    multipart = []
+    try:
+        with BoundedExecutor(workers) as executor:
+            for obj in objects:
+                if obj['Size'] > threshold:
+                    copy = MultipartCopy(
+                        s3=s3,
+                        part_size=part_size,
+                        stats=stats,
+                        **obj
+                    )
+                    multipart = [c for c in multipart if not c.completed]
+                    multipart.append(copy)
+                    copy.start()
+                    copy.submit(executor)
+                else:
+                    executor.submit(
+                        copy_whole,
+                        s3=s3,
+                        stats=stats,
+                        **obj
+                    )
+    finally:
+        # Uploads whose parts were cancelled by another failure are still open
+        for copy in multipart:
+            try:
+                copy.abort()
+            except Exception as e:
+                print("Failed to abort multipart copy of [s3://{}/{}]: {}".format(
+                    copy.Bucket, copy.Key, e))
+    stats.finish()
+    if verbose:
+        print(stats)
+    return stats
@@ -0,0 +1,208 @@
+"""
+Parallel S3 download engine.
+
+Many objects are fetched at once by a thread pool. Objects larger than
+``part_size`` are split into byte ranges that are fetched with parallel
+ranged GETs and written in place into a preallocated file.
+
+Objects are written to ``{Filename}.tmp`` and renamed once complete, so a
+file at ``Filename`` is always a whole download. Partial files are removed
+if the download fails.
+"""
+import os
+import threading
+import time
+from aws_sagemaker_remote.util.fs import ensure_path
+from aws_sagemaker_remote.util.threads import BoundedExecutor
+
+DEFAULT_WORKERS = 16
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+MB = 1024 * 1024
+PARTIAL_SUFFIX = '.tmp'
+
+
+class TransferStats(object):
+    """
+    Thread-safe counter of files and bytes transferred
+    """
+
+    def __init__(self, action='Downloaded'):
+        self.action = action
+        self.files = 0
+        self.bytes = 0
+        self.start = time.time()
+        self.end = None
+        self.lock = threading.Lock()
+
+    def add(self, files=0, bytes=0):
+        with self.lock:
+            self.files += files
+            self.bytes += bytes
+
+    def finish(self):
+        self.end = time.time()
+        return self
+
+    @property
+    def elapsed(self):
+        return (self.end or time.time()) - self.start
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return "{} {} files ({:.1f} MB) in {:.1f}s ({:.1f} MB/s)".format(
+            self.action,
+            self.files,
+            self.bytes / MB,
+            self.elapsed,
+            self.rate / MB
+        )
+
+
+def byte_ranges(size, part_size):
+    """
+    Split ``size`` bytes into inclusive ``(start, end)`` ranges of at most ``part_size`` bytes
+    """
+    assert part_size > 0
+    for start in range(0, size, part_size):
+        yield start, min(start + part_size, size) - 1
+
+
+def write_body(body, f, stats):
+    for chunk in body.iter_chunks(CHUNK_SIZE):
+        f.write(chunk)
+        stats.add(bytes=len(chunk))
+
+
+def partial_path(filename):
+    return filename + PARTIAL_SUFFIX
+
+
+def download_whole(s3, Bucket, Key, Filename, stats):
+    response = s3.get_object(Bucket=Bucket, Key=Key)
+    partial = partial_path(Filename)
+    with open(partial, 'wb') as f:
+        write_body(response['Body'], f, stats)
+    os.replace(partial, Filename)
+    stats.add(files=1)
+
+
+class PartTracker(object):
+    """
+    Counts outstanding ranges of one object. When the last part lands the
+    partial file is renamed to ``Filename`` and the file is counted once.
+    """
+
+    def __init__(self, parts, stats, Filename):
+        self.remaining = parts
+        self.stats = stats
+        self.Filename = Filename
+        self.lock = threading.Lock()
+
+    def done(self):
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining == 0:
+                os.replace(partial_path(self.Filename), self.Filename)
+                self.stats.add(files=1)
+
+
+def download_range(s3, Bucket, Key, Filename, start, end, stats, tracker):
+    response = s3.get_object(
+        Bucket=Bucket,
+        Key=Key,
+        Range="bytes={}-{}".format(start, end)
+    )
+    with open(partial_path(Filename), 'r+b') as f:
+        f.seek(start)
+        write_body(response['Body'], f, stats)
+    tracker.done()
+
+
+def download_all(s3, objects, workers, part_size, stats, partials):
+    with BoundedExecutor(workers) as executor:
+        for obj in objects:
+            bucket = obj['Bucket']
+            key = obj['Key']
+            filename = obj['Filename']
+            size = obj.get('Size')
+            if size is None:
+                size = s3.head_object(Bucket=bucket, Key=key)['ContentLength']
+            ensure_path(filename)
+            partials.append(partial_path(filename))
+            if part_size and size > part_size:
+                with open(partial_path(filename), 'wb') as f:
+                    f.truncate(size)
+                ranges = list(byte_ranges(size, part_size))
+                tracker = PartTracker(len(ranges), stats, filename)
+                for start, end in ranges:
+                    executor.submit(
+                        download_range,
+                        s3=s3,
+                        Bucket=bucket,
+                        Key=key,
+                        Filename=filename,
+                        start=start,
+                        end=end,
+                        stats=stats,
+                        tracker=tracker
+                    )
+            else:
+                executor.submit(
+                    download_whole,
+                    s3=s3,
+                    Bucket=bucket,
+                    Key=key,
+                    Filename=filename,
+                    stats=stats
+                )
+
+
+def download_objects(
+    s3, objects, workers=DEFAULT_WORKERS, part_size=DEFAULT_PART_SIZE, verbose=True
+):
+    """
+    Download many S3 objects concurrently
+
+    Args:
+        s3: boto3 S3 client
+        objects: iterable of dicts with ``Bucket``, ``Key``, ``Filename`` and optionally ``Size``
+        workers: number of concurrent GET requests
+        part_size: objects larger than this are downloaded as parallel byte ranges of this size
+        verbose: print transfer rate when finished
+
+    Returns:
+        TransferStats
+    """
+    stats = TransferStats()
+    # Partial files of downloads that may not have completed
+    partials = []
+    try:
+        download_all(s3, objects, workers, part_size, stats, partials)
+    except BaseException:
+        for partial in partials:
+            if os.path.exists(partial):
+                os.remove(partial)
+        raise
+    stats.finish()
+    if verbose:
+        print(stats)
+    return stats
+
+
+def relative_key(key, prefix):
+    """
+    Path of ``key`` relative to ``prefix``, or ``None`` if ``key`` is not inside ``prefix``.
+
+    An exact match returns the basename of the key.
+    """
+    if key == prefix:
+        return os.path.basename(key)
+    folder = prefix if (not prefix or prefix.endswith('/')) else prefix + '/'
+    if key.startswith(folder) and len(key) > len(folder):
+        return key[len(folder):]
+    return None
@@ -10,6 +10,7 @@ from .processing import processing_describe
 from .batch import batch_describe
 from .training import training_describe
 from aws_sagemaker_remote.s3 import get_file_string, parse_s3
+from aws_sagemaker_remote.session import s3_client
 
 
 def json_read(path, field, session=None):
@@ -18,7 +19,7 @@ def json_read(path, field, session=None):
             session = session.boto_session
         data = get_file_string(
             url=path,
-            s3=session.client('s3')
+            s3=s3_client(session)
         )
         data = json.loads(data)
     else:
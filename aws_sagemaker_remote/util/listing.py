@@ -0,0 +1,236 @@
+"""
+Parallel S3 prefix listing.
+
+Each prefix is first listed with a delimiter. Hierarchical layouts are walked
+in parallel one common prefix per task. Flat layouts (a truncated first page
+that contains keys) are split into key ranges listed in parallel with
+``StartAfter``. A range whose first page is truncated splits the rest of the
+range again at the digits of the last key listed, so zero-padded numeric keys
+such as ``part-00000`` fan out as well as random keys.
+Pages of results are passed to the caller through a bounded queue so memory
+stays flat regardless of the number of keys.
+"""
+import queue
+import string
+import threading
+
+DEFAULT_LIST_WORKERS = 16
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_MAX_DEPTH = 4
+SHARD_BOUNDARIES = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+_DONE = object()
+
+
+def key_ranges(prefix, boundaries=SHARD_BOUNDARIES):
+    """
+    Split the keys under ``prefix`` into ``(start_after, last)`` ranges.
+
+    Range ``i`` holds keys ``k`` with ``start_after < k <= last``. ``None``
+    means unbounded. Together the ranges cover every key exactly once.
+    """
+    points = [prefix + c for c in sorted(boundaries)]
+    lower = [None] + points
+    upper = points + [None]
+    return list(zip(lower, upper))
+
+
+def split_points(key, prefix, last=None):
+    """
+    Split points of the range ``(key, last]`` of keys under ``prefix``.
+
+    Points are the larger siblings of each digit of ``key`` and of the first
+    character after ``prefix``, from the last position to the first, so they
+    are in increasing order.
+    """
+    points = []
+    for i in range(len(key) - 1, len(prefix) - 1, -1):
+        if key[i] in string.digits:
+            alphabet = string.digits
+        elif i == len(prefix):
+            alphabet = SHARD_BOUNDARIES
+        else:
+            continue
+        for c in sorted(alphabet):
+            if c > key[i]:
+                point = key[:i] + c
+                if last is None or point < last:
+                    points.append(point)
+    return points
+
+
+class ParallelLister(object):
+    def __init__(
+        self, s3, bucket, prefix, workers=DEFAULT_LIST_WORKERS,
+        queue_size=DEFAULT_QUEUE_SIZE, max_depth=DEFAULT_MAX_DEPTH,
+        delimiter='/', MaxKeys=1000
+    ):
+        assert workers > 0
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.workers = workers
+        self.max_depth = max_depth
+        self.delimiter = delimiter
+        self.MaxKeys = MaxKeys
+        self.tasks = queue.Queue()
+        self.results = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.pending = 0
+
+    def add_task(self, fn, *args):
+        with self.lock:
+            self.pending += 1
+        self.tasks.put((fn, args))
+
+    def emit(self, item):
+        while not self.stop.is_set():
+            try:
+                self.results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def list_page(self, **kwargs):
+        return self.s3.list_objects_v2(
+            Bucket=self.bucket,
+            MaxKeys=self.MaxKeys,
+            **kwargs
+        )
+
+    def list_prefix(self, prefix, depth):
+        """
+        List one level with the delimiter, recursing into common prefixes.
+
+        If the first page is truncated and contains keys, the whole prefix is
+        listed flat by key range instead. The decision is made before any
+        common prefix is queued, so no key is listed twice.
+        """
+        kwargs = {'Prefix': prefix}
+        if self.delimiter and depth < self.max_depth:
+            kwargs['Delimiter'] = self.delimiter
+        first = True
+        while not self.stop.is_set():
+            response = self.list_page(**kwargs)
+            contents = response.get('Contents', [])
+            truncated = response.get('IsTruncated', False)
+            if first and truncated and contents:
+                # Flat layout: shard the whole prefix by key range instead of paging serially
+                for start_after, last in key_ranges(prefix):
+                    self.add_task(self.list_range, prefix, start_after, last)
+                return
+            first = False
+            if contents:
+                self.emit(contents)
+            for common in response.get('CommonPrefixes', []):
+                self.add_task(self.list_prefix, common['Prefix'], depth + 1)
+            if truncated:
+                kwargs['ContinuationToken'] = response['NextContinuationToken']
+            else:
+                return
+
+    def list_range(self, prefix, start_after, last):
+        """
+        List all keys under ``prefix`` in ``(start_after, last]`` without a delimiter.
+
+        If a page is truncated, the rest of the range is split at ``split_points``
+        of the last key into ranges listed by new tasks.
+        """
+        kwargs = {'Prefix': prefix}
+        if start_after is not None:
+            kwargs['StartAfter'] = start_after
+        while not self.stop.is_set():
+            response = self.list_page(**kwargs)
+            contents = response.get('Contents', [])
+            if last is not None:
+                inside = [c for c in contents if c['Key'] <= last]
+                finished = len(inside) < len(contents)
+                contents = inside
+            else:
+                finished = False
+            if contents:
+                self.emit(contents)
+            if finished or not response.get('IsTruncated', False):
+                return
+            points = split_points(contents[-1]['Key'], prefix, last) if contents else []
+            if points:
+                bounds = [contents[-1]['Key']] + points + [last]
+                for lower, upper in zip(bounds[:-1], bounds[1:]):
+                    self.add_task(self.list_range, prefix, lower, upper)
+                return
+            kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+    def worker(self):
+        while True:
+            task = self.tasks.get()
+            if task is _DONE:
+                return
+            fn, args = task
+            try:
+                if not self.stop.is_set():
+                    fn(*args)
+            except Exception as e:
+                self.emit(e)
+                self.stop.set()
+            with self.lock:
+                self.pending -= 1
+                finished = self.pending == 0
+            if finished:
+                for _ in range(self.workers):
+                    self.tasks.put(_DONE)
+                self.emit(_DONE)
+
+    def __iter__(self):
+        self.add_task(self.list_prefix, self.prefix, 0)
+        threads = [
+            threading.Thread(target=self.worker, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = self.results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                for obj in item:
+                    yield obj
+        finally:
+            self.stop.set()
+            for _ in range(self.workers):
+                self.tasks.put(_DONE)
+
+
+def iterate_objects_parallel(
+    s3, bucket, prefix, workers=DEFAULT_LIST_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE, max_depth=DEFAULT_MAX_DEPTH,
+    delimiter='/', MaxKeys=1000
+):
+    """
+    Iterate all objects under ``prefix`` using parallel LIST requests.
+
+    Objects are yielded in no particular order.
+
+    Args:
+        s3: boto3 S3 client
+        bucket: bucket name
+        prefix: key prefix
+        workers: number of concurrent LIST requests
+        queue_size: number of pages buffered before workers block
+        max_depth: number of delimiter levels to walk before listing flat
+        delimiter: hierarchy delimiter (``None`` to always list flat)
+        MaxKeys: page size
+    """
+    return iter(ParallelLister(
+        s3=s3,
+        bucket=bucket,
+        prefix=prefix,
+        workers=workers,
+        queue_size=queue_size,
+        max_depth=max_depth,
+        delimiter=delimiter,
+        MaxKeys=MaxKeys
+    ))
@@ -0,0 +1,147 @@
+"""
+Streaming writer into an S3 multipart upload.
+
+Data written to ``MultipartUploadWriter`` is cut into parts that are hashed and
+uploaded by background threads while the caller keeps writing, so nothing
+needs to be staged on disk.
+"""
+import base64
+import hashlib
+from aws_sagemaker_remote.util.download import TransferStats, MB
+from aws_sagemaker_remote.util.threads import BoundedExecutor
+
+DEFAULT_UPLOAD_PART_SIZE = 16 * MB
+DEFAULT_UPLOAD_WORKERS = 8
+MIN_PART_SIZE = 5 * MB
+PART_SIZE_GROWTH_INTERVAL = 1000
+
+
+class MultipartUploadWriter(object):
+    """
+    Write-only file object that uploads to ``s3://Bucket/Key``.
+
+    Objects smaller than one part are sent with a single ``put_object`` on
+    close. The part size doubles every 1000 parts so any stream fits in the
+    10000 part limit. The upload is aborted if writing fails.
+    """
+
+    def __init__(
+        self, s3, Bucket, Key, part_size=DEFAULT_UPLOAD_PART_SIZE,
+        workers=DEFAULT_UPLOAD_WORKERS, max_pending=None, verbose=False, **kwargs
+    ):
+        assert part_size >= MIN_PART_SIZE
+        self.s3 = s3
+        self.Bucket = Bucket
+        self.Key = Key
+        self.part_size = part_size
+        self.kwargs = kwargs
+        self.verbose = verbose
+        self.executor = BoundedExecutor(workers, max_pending=max_pending or workers)
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.futures = []
+        self.closed = False
+        self.stats = TransferStats('Uploaded')
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.stats.bytes + len(self.buffer)
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed MultipartUploadWriter")
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self.submit_part(part)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def submit_part(self, part):
+        if self.upload_id is None:
+            response = self.s3.create_multipart_upload(
+                Bucket=self.Bucket,
+                Key=self.Key,
+                **self.kwargs
+            )
+            self.upload_id = response['UploadId']
+        number = len(self.futures) + 1
+        if number % PART_SIZE_GROWTH_INTERVAL == 0:
+            self.part_size *= 2
+        self.futures.append(
+            self.executor.submit(self.upload_part, number, part)
+        )
+
+    def upload_part(self, number, part):
+        md5 = base64.b64encode(hashlib.md5(part).digest()).decode('ascii')
+        response = self.s3.upload_part(
+            Bucket=self.Bucket,
+            Key=self.Key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=part,
+            ContentMD5=md5
+        )
+        self.stats.add(bytes=len(part))
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.upload_id is None:
+                body = bytes(self.buffer)
+                self.s3.put_object(
+                    Bucket=self.Bucket,
+                    Key=self.Key,
+                    Body=body,
+                    **self.kwargs
+                )
+                self.stats.add(bytes=len(body))
+            else:
+                if self.buffer:
+                    self.submit_part(bytes(self.buffer))
+                self.executor.close()
+                self.s3.complete_multipart_upload(
+                    Bucket=self.Bucket,
+                    Key=self.Key,
+                    UploadId=self.upload_id,
+                    MultipartUpload={
+                        'Parts': [f.result() for f in self.futures]
+                    }
+                )
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self.buffer = bytearray()
+        self.stats.add(files=1)
+        self.stats.finish()
+        if self.verbose:
+            print("{} to s3://{}/{}".format(self.stats, self.Bucket, self.Key))
+
+    def abort(self):
+        self.closed = True
+        self.executor.shutdown(cancel=True)
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(
+                Bucket=self.Bucket,
+                Key=self.Key,
+                UploadId=self.upload_id
+            )
+            self.upload_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
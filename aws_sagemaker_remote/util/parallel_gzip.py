@@ -0,0 +1,106 @@
+"""
+Block-parallel gzip compression.
+
+Like ``pigz``, input is cut into fixed-size blocks that are compressed on
+several threads at once. Each block becomes a complete gzip member and members
+are written in order, and a concatenation of gzip members is a valid gzip file.
+``zlib`` releases the GIL while compressing, so threads use all cores.
+"""
+import collections
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from aws_sagemaker_remote.util.download import MB
+
+DEFAULT_BLOCK_SIZE = MB
+# Same default as gzip and tarfile
+DEFAULT_COMPRESSION_LEVEL = 9
+
+
+def compress_member(data, level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    Compress ``data`` into one complete gzip member
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class ParallelGzipWriter(object):
+    """
+    Write-only file object that gzip-compresses into ``fileobj`` using multiple threads.
+
+    Closing the writer does not close ``fileobj``.
+    """
+
+    def __init__(
+        self, fileobj, level=DEFAULT_COMPRESSION_LEVEL, block_size=DEFAULT_BLOCK_SIZE,
+        workers=None, max_pending=None
+    ):
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = block_size
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 2
+        self.executor = ThreadPoolExecutor(self.workers)
+        self.pending = collections.deque()
+        self.buffer = bytearray()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.closed = False
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.bytes_in
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed ParallelGzipWriter")
+        self.buffer += data
+        self.bytes_in += len(data)
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            self.submit(block)
+        return len(data)
+
+    def submit(self, block):
+        self.pending.append(
+            self.executor.submit(compress_member, block, self.level)
+        )
+        while len(self.pending) > self.max_pending:
+            self.write_next()
+
+    def write_next(self):
+        member = self.pending.popleft().result()
+        self.fileobj.write(member)
+        self.bytes_out += len(member)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.buffer or not self.bytes_out and not self.pending:
+                self.submit(bytes(self.buffer))
+                self.buffer = bytearray()
+            while self.pending:
+                self.write_next()
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.closed = True
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+        else:
+            self.close()
@@ -0,0 +1,176 @@
+"""
+Iterable dataset over repeated Pipe mode channels.
+
+A channel with ``repeat=N`` is expanded into ``{name}_repeat_0`` ...
+``{name}_repeat_{N-1}`` channels, each with its own FIFOs. ``PipeDataset``
+assigns every pipe to exactly one consumer, where the consumers are the
+DataLoader workers of every distributed rank, so all pipes are read in
+parallel and no FIFO is opened twice.
+
+SageMaker creates a new FIFO ``{path}_{epoch}`` for each pass over a channel.
+The dataset opens ``{path}_{epoch}`` on each iteration, taking the epoch from
+``set_epoch`` or from the number of passes already made over the pipe,
+whichever is larger. Passes are counted in shared memory created with the
+dataset, so the count survives non-persistent DataLoader workers, which get a
+fresh copy of the dataset every epoch, and persistent workers, which never see
+``set_epoch`` calls made in the main process.
+"""
+import multiprocessing
+import re
+import warnings
+from aws_sagemaker_remote.util.pipes import chunk_iterable
+from aws_sagemaker_remote.util.recordio import iterate_records, DEFAULT_READ_BUFFER_SIZE
+from aws_sagemaker_remote.util.shuffle import shuffle_iterable, epoch_seed
+try:
+    from torch.utils.data import IterableDataset, get_worker_info
+    import torch.distributed as dist
+except ImportError:
+    IterableDataset = object
+    dist = None
+
+    def get_worker_info():
+        return None
+
+REPEAT_PATTERN = re.compile(r'repeat_(\d+)$')
+
+
+def repeated_pipe_paths(paths):
+    """
+    List the pipe paths of a channel.
+
+    Args:
+        paths: a path, a list of paths, or the dictionary of repeated channel
+            paths that ``sagemaker_env_args`` creates for a repeated channel
+            (``{'repeat_0': path, ...}``)
+    """
+    if isinstance(paths, str):
+        return [paths]
+    elif isinstance(paths, dict):
+        def order(key):
+            match = REPEAT_PATTERN.search(key)
+            return (0, int(match.group(1)), key) if match else (1, 0, key)
+        return [paths[k] for k in sorted(paths.keys(), key=order)]
+    else:
+        return list(paths)
+
+
+def consumer_info(rank=None, world_size=None):
+    """
+    Return ``(consumer, consumers)`` for the current DataLoader worker and distributed rank
+    """
+    if rank is None or world_size is None:
+        if dist is not None and dist.is_available() and dist.is_initialized():
+            rank = dist.get_rank() if rank is None else rank
+            world_size = dist.get_world_size() if world_size is None else world_size
+        else:
+            rank = rank or 0
+            world_size = world_size or 1
+    info = get_worker_info()
+    if info is None:
+        worker, num_workers = 0, 1
+    else:
+        worker, num_workers = info.id, info.num_workers
+    return rank * num_workers + worker, world_size * num_workers
+
+
+def assign_pipes(paths, consumer, consumers):
+    """
+    Indices of the pipes read by ``consumer``. Every pipe is assigned to exactly one of ``consumers``.
+    """
+    if consumers > len(paths):
+        warnings.warn(
+            "{} pipes for {} consumers. Some DataLoader workers will be idle. "
+            "Increase the channel repeat to read with every worker.".format(
+                len(paths), consumers))
+    return list(range(len(paths)))[consumer::consumers]
+
+
+def pipe_epoch_path(path, epoch):
+    return "{}_{}".format(path, epoch)
+
+
+class PipeDataset(IterableDataset):
+    """
+    ``IterableDataset`` that reads RecordIO records from repeated Pipe mode channels.
+
+    Args:
+        paths: pipe paths (see ``repeated_pipe_paths``)
+        size: records per example. Consecutive records are grouped into lists, like ``RawPipeIterator``
+        transform: function applied to each example
+        rank: distributed rank (default from ``torch.distributed``, else 0)
+        world_size: distributed world size (default from ``torch.distributed``, else 1)
+        buffer_size: RecordIO read buffer size
+        shuffle_buffer: shuffle examples through a buffer of this many examples (0 to disable)
+        shuffle_bytes: limit the shuffle buffer to this many bytes
+        shuffle_seed: shuffle seed, combined with the epoch and the pipe index
+    """
+
+    def __init__(
+        self, paths, size=1, transform=None, rank=None, world_size=None,
+        buffer_size=DEFAULT_READ_BUFFER_SIZE, shuffle_buffer=0, shuffle_bytes=None,
+        shuffle_seed=None
+    ):
+        super(PipeDataset, self).__init__()
+        self.paths = repeated_pipe_paths(paths)
+        if not self.paths:
+            raise ValueError("PipeDataset requires at least one pipe")
+        self.size = size
+        self.transform = transform
+        self.rank = rank
+        self.world_size = world_size
+        self.buffer_size = buffer_size
+        self.shuffle_buffer = shuffle_buffer
+        self.shuffle_bytes = shuffle_bytes
+        self.shuffle_seed = shuffle_seed
+        self.epoch = 0
+        # Passes over each pipe, shared with DataLoader worker processes
+        self.passes = multiprocessing.Array('q', len(self.paths))
+
+    def set_epoch(self, epoch):
+        """
+        Set the epoch of the next iteration, like ``DistributedSampler.set_epoch``.
+
+        Only needed to skip epochs; without it each pipe moves to its next FIFO.
+        """
+        self.epoch = epoch
+
+    def next_epoch(self, pipe):
+        """
+        Epoch of the next pass over pipe index ``pipe``
+        """
+        with self.passes.get_lock():
+            epoch = max(self.epoch, self.passes[pipe])
+            self.passes[pipe] = epoch + 1
+        return epoch
+
+    def pipes(self):
+        consumer, consumers = consumer_info(
+            rank=self.rank, world_size=self.world_size)
+        return assign_pipes(self.paths, consumer, consumers)
+
+    def read_pipe(self, path):
+        with open(path, 'rb', buffering=0) as f:
+            for record in iterate_records(f, buffer_size=self.buffer_size):
+                yield bytes(record)
+
+    def iterate_examples(self, path):
+        records = self.read_pipe(path)
+        if self.size == 1:
+            return records
+        return chunk_iterable(records, self.size, last='error')
+
+    def __iter__(self):
+        for pipe in self.pipes():
+            epoch = self.next_epoch(pipe)
+            examples = self.iterate_examples(pipe_epoch_path(self.paths[pipe], epoch))
+            if self.shuffle_buffer or self.shuffle_bytes:
+                examples = shuffle_iterable(
+                    examples,
+                    buffer_size=self.shuffle_buffer or None,
+                    buffer_bytes=self.shuffle_bytes,
+                    seed=epoch_seed(self.shuffle_seed, epoch, worker=pipe)
+                )
+            for example in examples:
+                if self.transform is not None:
+                    example = self.transform(example)
+                yield example
@@ -0,0 +1,286 @@
+"""
+Local emulation of SageMaker Pipe mode.
+
+For each channel a background process creates the FIFO ``{channel}_{epoch}``
+and streams the channel data into it, like the SageMaker agent does inside a
+training container. The next FIFO is created as soon as the reader opens the
+current one, so a reader can move from ``_0`` to ``_1`` and so on.
+
+Channels are local files or directories, S3 prefixes, manifest files or
+augmented manifest files. ``RecordIO`` record wrapping and augmented manifest
+attribute framing are written with the same code as ``s3 concat --format
+recordio``. A shuffle seed shuffles the object (or manifest line) order
+per epoch with seed ``shuffle_seed + epoch``.
+"""
+import json
+import os
+import random
+import shutil
+import tempfile
+import traceback
+import multiprocessing
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+import boto3
+from aws_sagemaker_remote.s3 import iterate_file_chunks, get_file_text, parse_s3
+from aws_sagemaker_remote.session import profile_session, s3_client
+from aws_sagemaker_remote.util.concat import concat_lines, iterate_manifest_lines, DEFAULT_CONCAT_WORKERS
+from aws_sagemaker_remote.util.listing import iterate_objects_parallel
+from aws_sagemaker_remote.util.download import MB
+from aws_sagemaker_remote.util.logging_util import print_err
+
+S3_DATA_TYPES = ['S3Prefix', 'ManifestFile', 'AugmentedManifestFile']
+PIPE_BUFFER_SIZE = MB
+
+
+def is_s3(uri):
+    return uri.startswith('s3://')
+
+
+def local_path(uri):
+    if uri.startswith('file://'):
+        return url2pathname(urlparse(uri).path)
+    return uri
+
+
+def list_prefix(uri, s3):
+    """
+    Objects of an ``S3Prefix`` channel in key order: files under a local path or keys under an S3 prefix
+    """
+    if is_s3(uri):
+        url = parse_s3(uri)
+        return sorted(
+            "s3://{}/{}".format(url['Bucket'], obj['Key'])
+            for obj in iterate_objects_parallel(s3=s3, bucket=url['Bucket'], prefix=url['Key'])
+            if not obj['Key'].endswith('/')
+        )
+    path = os.path.abspath(local_path(uri))
+    if os.path.isfile(path):
+        return [path]
+    if os.path.isdir(path):
+        path = os.path.join(path, '')
+    files = []
+    for root, dirs, names in os.walk(os.path.dirname(path)):
+        files.extend(
+            os.path.join(root, name) for name in names
+            if os.path.join(root, name).startswith(path)
+        )
+    return sorted(files)
+
+
+def read_manifest(uri, s3):
+    """
+    Objects listed by a manifest file (``[{"prefix": ...}, "relative key", ...]``)
+    """
+    if is_s3(uri):
+        with get_file_text(url=uri, s3=s3) as f:
+            manifest = json.load(f)
+    else:
+        with open(local_path(uri)) as f:
+            manifest = json.load(f)
+    prefix = manifest[0]['prefix']
+    return [prefix + key for key in manifest[1:]]
+
+
+def read_augmented_manifest(uri, s3):
+    if not is_s3(uri):
+        uri = local_path(uri)
+    return [
+        json.loads(line)
+        for line in iterate_manifest_lines(uri, s3=s3)
+        if line.strip()
+    ]
+
+
+class PipeChannel(object):
+    """
+    One emulated Pipe mode channel
+
+    Args:
+        name: channel name
+        uri: local path or S3 URI of the data, manifest or augmented manifest
+        s3_data_type: ``S3Prefix``, ``ManifestFile`` or ``AugmentedManifestFile``
+        record_wrapping: ``RecordIO`` to frame each object as a record
+        attribute_names: attributes written for each augmented manifest line
+        shuffle_seed: shuffle objects per epoch with this seed (``None`` for no shuffle)
+    """
+
+    def __init__(
+        self, name, uri, s3_data_type='S3Prefix', record_wrapping=None,
+        attribute_names=None, shuffle_seed=None
+    ):
+        if s3_data_type not in S3_DATA_TYPES:
+            raise ValueError("Unknown S3 data type [{}] (expected one of {})".format(
+                s3_data_type, S3_DATA_TYPES))
+        if s3_data_type == 'AugmentedManifestFile' and not attribute_names:
+            raise ValueError(
+                "Channel [{}] is an AugmentedManifestFile and requires attribute names".format(name))
+        self.name = name
+        self.uri = uri
+        self.s3_data_type = s3_data_type
+        self.record_wrapping = record_wrapping
+        self.attribute_names = attribute_names
+        self.shuffle_seed = shuffle_seed
+        self.items = None
+
+    def load(self, s3):
+        """
+        Resolve the objects or manifest lines streamed by the channel
+        """
+        if self.s3_data_type == 'AugmentedManifestFile':
+            self.items = read_augmented_manifest(self.uri, s3=s3)
+        elif self.s3_data_type == 'ManifestFile':
+            self.items = read_manifest(self.uri, s3=s3)
+        else:
+            self.items = list_prefix(self.uri, s3=s3)
+        if not self.items:
+            raise ValueError("Channel [{}] has no data at [{}]".format(
+                self.name, self.uri))
+
+    def uses_s3(self):
+        if is_s3(self.uri):
+            return True
+        if self.s3_data_type == 'AugmentedManifestFile':
+            return any(
+                is_s3(v) for item in self.items for k, v in item.items()
+                if k.endswith('-ref') and isinstance(v, str)
+            )
+        return any(is_s3(item) for item in self.items)
+
+    def epoch_items(self, epoch):
+        items = list(self.items)
+        if self.shuffle_seed is not None:
+            random.Random(self.shuffle_seed + epoch).shuffle(items)
+        return items
+
+    def write_epoch(self, fo, epoch, s3, workers=DEFAULT_CONCAT_WORKERS):
+        items = self.epoch_items(epoch)
+        if self.s3_data_type == 'AugmentedManifestFile':
+            concat_lines(
+                fo=fo, s3=s3, lines=items, workers=workers,
+                format='recordio', attributes=self.attribute_names)
+        elif self.record_wrapping == 'RecordIO':
+            concat_lines(
+                fo=fo, s3=s3, lines=[{'file-ref': item} for item in items],
+                workers=workers, format='recordio')
+        else:
+            for item in items:
+                if is_s3(item):
+                    for chunk in iterate_file_chunks(url=item, s3=s3, read_ahead=4):
+                        fo.write(chunk)
+                else:
+                    with open(item, 'rb') as f:
+                        shutil.copyfileobj(f, fo, PIPE_BUFFER_SIZE)
+
+
+def serve_channel(channel, path, epochs, profile_name, workers):
+    """
+    Stream ``channel`` into the FIFOs ``{path}_{epoch}``. Runs in a child process.
+    """
+    s3 = None
+    if channel.uses_s3():
+        # A fresh session: boto3 sessions and clients are not safe to share across processes
+        s3 = s3_client(boto3.Session(profile_name=profile_name), workers=workers)
+    epoch = 0
+    try:
+        while epochs is None or epoch < epochs:
+            fifo = "{}_{}".format(path, epoch)
+            try:
+                with open(fifo, 'wb', buffering=PIPE_BUFFER_SIZE) as fo:
+                    if epochs is None or epoch + 1 < epochs:
+                        os.mkfifo("{}_{}".format(path, epoch + 1))
+                    channel.write_epoch(fo, epoch=epoch, s3=s3, workers=workers)
+            except BrokenPipeError:
+                print_err("Reader closed pipe [{}] early".format(fifo))
+            os.unlink(fifo)
+            epoch += 1
+    except BaseException:
+        traceback.print_exc()
+        raise
+
+
+class PipeEmulator(object):
+    """
+    Serve channels through FIFOs in ``directory`` until stopped. Use as a context manager.
+
+    Args:
+        directory: directory for the FIFOs (default a temporary directory)
+        epochs: number of epochs served per channel (``None`` for unlimited)
+        profile_name: AWS profile used for S3 channels
+        workers: concurrent GETs per channel for RecordIO framing
+    """
+
+    def __init__(self, directory=None, epochs=None, profile_name=None, workers=DEFAULT_CONCAT_WORKERS):
+        self.directory = directory
+        self.cleanup = directory is None
+        self.epochs = epochs
+        self.profile_name = profile_name
+        self.workers = workers
+        self.channels = {}
+        self.processes = []
+        self.s3 = None
+
+    def client(self):
+        if self.s3 is None:
+            self.s3 = s3_client(profile_session(self.profile_name))
+        return self.s3
+
+    def add_channel(self, name, uri, **kwargs):
+        """
+        Add a channel (see ``PipeChannel`` for arguments) and return the pipe path prefix
+        """
+        if name in self.channels:
+            raise ValueError("Channel [{}] already exists".format(name))
+        channel = PipeChannel(name=name, uri=uri, **kwargs)
+        channel.load(s3=self.client() if is_s3(uri) else None)
+        self.channels[name] = channel
+        return self.path(name)
+
+    def path(self, name):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='pipes-')
+        return os.path.join(self.directory, name)
+
+    def start(self):
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+        for name, channel in self.channels.items():
+            path = self.path(name)
+            os.mkfifo("{}_0".format(path))
+            process = multiprocessing.Process(
+                target=serve_channel,
+                kwargs={
+                    'channel': channel,
+                    'path': path,
+                    'epochs': self.epochs,
+                    'profile_name': self.profile_name,
+                    'workers': self.workers
+                },
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+            print("Serving channel [{}] from [{}] at [{}_N]".format(
+                name, channel.uri, path))
+
+    def stop(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        self.processes = []
+        if self.directory is not None:
+            for name in self.channels.keys():
+                prefix = os.path.basename(self.path(name)) + '_'
+                for f in os.listdir(self.directory):
+                    if f.startswith(prefix) and f[len(prefix):].isdigit():
+                        os.unlink(os.path.join(self.directory, f))
+            if self.cleanup:
+                shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
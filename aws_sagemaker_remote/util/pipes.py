@@ -1,22 +1,26 @@
-import sys
 import json
 from sagemaker.amazon.common import read_recordio
 import io
-import array
 from itertools import count
 import multiprocessing
-import warnings
 from aws_sagemaker_remote.util.logging_util import print_err
+from aws_sagemaker_remote.util.recordio import iterate_records, DEFAULT_READ_BUFFER_SIZE
+from aws_sagemaker_remote.util.threads import PrefetchIterator
+from aws_sagemaker_remote.util.shuffle import shuffle_iterable, epoch_seed
+from aws_sagemaker_remote.util.protobuf import LENGTH_FEATURE, decode_strings_batch
 try:
     import mlio
     from mlio.integ.torch import as_torch
 except:
+    mlio = None
     print_err(
         "Python `mlio` package not installed. \
-        Some aws-sagemaker-remote features may not be available"
+        Using pure-Python RecordIO-protobuf reader"
     )
-
-MAGIC = 0xCED7230A
+try:
+    import torch
+except ImportError:
+    torch = None
 
 
 def epoch_iterable(epochs):
@@ -26,33 +30,176 @@ def epoch_iterable(epochs):
         return range(epochs)
 
 
-class ProtobufPipeIterator(object):
-    def __init__(self, path, features, count=0, epochs=1, **reader_params):
+def iterate_prefetch(prefetcher):
+    with prefetcher:
+        for item in prefetcher:
+            yield item
+
+
+class PrefetchMixin(object):
+    """
+    Optionally read and decode on a background thread.
+
+    With ``prefetch > 0``, up to ``prefetch`` decoded items are queued ahead of
+    the consumer. ``prefetcher`` holds the ``PrefetchIterator`` of the current
+    pass, which records how long the consumer stalled waiting for data.
+    Classes using the mixin define ``iterate()``, which reads one pass.
+    """
+    prefetch = 0
+    verbose = False
+    prefetcher = None
+
+    def __iter__(self):
+        if not self.prefetch:
+            return self.iterate()
+        self.prefetcher = PrefetchIterator(
+            self.iterate(),
+            depth=self.prefetch,
+            name="{} [{}]".format(type(self).__name__, self.path),
+            verbose=self.verbose
+        )
+        return iterate_prefetch(self.prefetcher)
+
+
+class ShuffleMixin(object):
+    """
+    Optionally shuffle records through a bounded buffer.
+
+    ``shuffle_buffer`` records (or ``shuffle_bytes`` bytes) are buffered and
+    emitted in random order. The seed for each epoch is ``shuffle_seed + epoch``,
+    mixed with the DataLoader worker id (see ``epoch_seed``).
+    """
+    shuffle_buffer = 0
+    shuffle_bytes = None
+    shuffle_seed = None
+
+    def shuffle(self, records, epoch):
+        if not self.shuffle_buffer and not self.shuffle_bytes:
+            return records
+        return shuffle_iterable(
+            records,
+            buffer_size=self.shuffle_buffer or None,
+            buffer_bytes=self.shuffle_bytes,
+            seed=epoch_seed(self.shuffle_seed, epoch)
+        )
+
+
+class FilePipe(object):
+    """
+    Stand-in for ``mlio.SageMakerPipe`` that opens the FIFO ``{path}_{fifo_id}``
+    """
+
+    def __init__(self, path, fifo_id=0):
+        self.path = path
+        self.fifo_id = fifo_id
+
+    def open_read(self):
+        return open("{}_{}".format(self.path, self.fifo_id), 'rb', buffering=0)
+
+
+def open_pipe(path, fifo_id):
+    if mlio is None:
+        return FilePipe(path, fifo_id=fifo_id)
+    return mlio.SageMakerPipe(path, fifo_id=fifo_id)
+
+
+def to_tensor(value):
+    """
+    Convert an mlio tensor, or a NumPy array from the fallback reader, to torch
+    """
+    if mlio is not None:
+        return as_torch(value)
+    if torch is None or value.dtype == object:
+        return value
+    return torch.from_numpy(value)
+
+
+class ProtobufPipeIterator(PrefetchMixin, ShuffleMixin):
+    """
+    Iterate RecordIO-protobuf records from a SageMaker pipe with ``mlio``.
+
+    Without ``mlio``, records are parsed by ``ProtobufPipeReader`` into the same
+    feature dicts. ``batch_size`` and ``last_example_handling`` (``drop``) of
+    ``reader_params`` are honored and other reader parameters are ignored.
+
+    Set ``shuffle_buffer`` (records) or ``shuffle_bytes`` to shuffle examples
+    (or batches) within each epoch, seeded with ``shuffle_seed + epoch`` and the
+    DataLoader worker id.
+
+    Each item is one reader batch (``batch_size`` in ``reader_params``): a dict
+    holding a ``(batch, ...)`` tensor for each of ``features``. Use it with
+    ``DataLoader(batch_size=None)``. With ``batched=True`` the dict also holds
+    a flattened ``(batch,)`` tensor for each ``{key}_length`` feature present
+    in the records, so variable-length features can be decoded without listing
+    their lengths in ``features``.
+    """
+
+    def __init__(self, path, features, count=0, epochs=1, prefetch=0, verbose=False, batched=False,
+                 shuffle_buffer=0, shuffle_bytes=None, shuffle_seed=None, **reader_params):
         print(f"Created ProtobufPipeIterator path: {path}, count: {count}")
         self.path = path
         self.features = features
+        self.batched = batched
+        self.shuffle_buffer = shuffle_buffer
+        self.shuffle_bytes = shuffle_bytes
+        self.shuffle_seed = shuffle_seed
         self.reader_params = reader_params
         #self.count = count
         # self.pipe = mlio.SageMakerPipe(self.path) #fifo_id =
         self.epochs = epochs
+        self.prefetch = prefetch
+        self.verbose = verbose
         self.count = multiprocessing.Value('i', count)
-        #self.lock = multiprocessing.Lock()
 
     def iterate_features(self, examples):
         for example in examples:
             yield {
-                k: as_torch(example[k]) for k in self.features
+                k: to_tensor(example[k]) for k in self.features
             }
 
+    def length_features(self, example):
+        if isinstance(example, dict):
+            def has_feature(key):
+                return key in example
+        else:
+            def has_feature(key):
+                return example.schema.get_index(key) is not None
+        return [
+            LENGTH_FEATURE.format(k) for k in self.features
+            if LENGTH_FEATURE.format(k) not in self.features and
+            has_feature(LENGTH_FEATURE.format(k))
+        ]
+
+    def iterate_batches(self, examples):
+        lengths = None
+        for example in examples:
+            if lengths is None:
+                lengths = self.length_features(example)
+            batch = {
+                k: to_tensor(example[k]) for k in self.features
+            }
+            for k in lengths:
+                batch[k] = to_tensor(example[k]).reshape(-1)
+            yield batch
+
     def increment(self):
-        #with self.lock:
-        fifo_id = self.count.value
-        self.count.value = fifo_id+1
+        with self.count.get_lock():
+            fifo_id = self.count.value
+            self.count.value = fifo_id+1
         return fifo_id
 
     def pipe_iterator(self, fifo_id=0):
         fifo_id = self.increment()
         print(f"opening pipe iterator {self.path}:{fifo_id}")
+        if mlio is None:
+            from aws_sagemaker_remote.util.protobuf_reader import ProtobufPipeReader
+            return ProtobufPipeReader(
+                self.path,
+                fifo_id=fifo_id,
+                batch_size=self.reader_params.get('batch_size', 1),
+                drop_last=str(self.reader_params.get(
+                    'last_example_handling', '')).lower().endswith('drop')
+            )
         pipe = mlio.SageMakerPipe(self.path, fifo_id=fifo_id)
         reader_params = mlio.DataReaderParams(
             dataset=[pipe],
@@ -61,7 +208,7 @@ class ProtobufPipeIterator(object):
         reader = mlio.RecordIOProtobufReader(reader_params)
         return reader
 
-    def __iter__(self):
+    def iterate(self):
         iterator = self.pipe_iterator()
         epochs = epoch_iterable(self.epochs)
         for epoch in epochs:
@@ -69,7 +216,11 @@ class ProtobufPipeIterator(object):
             if epoch > 0:
                 fifo_id = self.increment()
                 print(f"fifo_id {fifo_id}")
-            for rec in self.iterate_features(iterator):
+            if self.batched:
+                records = self.iterate_batches(iterator)
+            else:
+                records = self.iterate_features(iterator)
+            for rec in self.shuffle(records, epoch):
                 yield rec
             iterator.reset()
             #print("Iterator complete")
@@ -77,52 +228,51 @@ class ProtobufPipeIterator(object):
 
 def decode_strings_numpy(data, data_length):
     assert data.shape[0] == data_length.shape[0]
-    for d, dl in zip(data, data_length):
-        b = d.tobytes()
-        b = b[:dl.item()]
-        b = b.decode('utf-8')
+    for b in decode_strings_batch(data, data_length):
         yield b
 
 
 def decode_strings_torch(data, data_length):
     assert data.size(0) == data_length.size(0)
-    data_np = data.numpy()
-    for d, dl in zip(data_np, data_length):
-        b = d.tobytes()
-        b = b[:dl.item()]
-        b = b.decode('utf-8')
+    for b in decode_strings_batch(data, data_length):
         yield b
 
 
-class RawPipeIterator(object):
-    def __init__(self, path, size=1, count=0, epochs=1):
+class RawPipeIterator(PrefetchMixin, ShuffleMixin):
+    def __init__(self, path, size=1, count=0, epochs=1, prefetch=0, verbose=False,
+                 shuffle_buffer=0, shuffle_bytes=None, shuffle_seed=None):
         self.path = path
         self.size = size
+        self.shuffle_buffer = shuffle_buffer
+        self.shuffle_bytes = shuffle_bytes
+        self.shuffle_seed = shuffle_seed
         #self.count = count
         # self.pipe = mlio.SageMakerPipe(self.path) #fifo_id =
         self.epochs = epochs
+        self.prefetch = prefetch
+        self.verbose = verbose
         self.count = multiprocessing.Value('i', count)
-        self.lock = multiprocessing.Lock()
 
     def pipe_iterator(self):
-        with self.lock:
+        with self.count.get_lock():
             fifo_id = self.count.value
             self.count.value = fifo_id+1
-        pipe = mlio.SageMakerPipe(self.path, fifo_id=fifo_id)
+        pipe = open_pipe(self.path, fifo_id=fifo_id)
+        # Records outlive the read buffer once grouped, shuffled or prefetched, so copy each once
         return chunk_iterable(
-            read_examples(pipe),
+            (io.BytesIO(record) for record in read_examples(pipe)),
             self.size,
             last='error'
         )
 
-    def __iter__(self):
+    def iterate(self):
         # pipe = mlio.SageMakerPipe(self.path)  # fifo_id =
         if self.epochs == 0:
             epochs = count()
         else:
             epochs = range(self.epochs)
         for epoch in epochs:
-            for rec in self.pipe_iterator():
+            for rec in self.shuffle(self.pipe_iterator(), epoch):
                 yield rec
 
 
@@ -192,62 +342,14 @@ def read_bytes(s, cnt):
         return b"".join(bufs)
 
 
-def read_examples(pipe):
-    i = 0
-    read = 0
-    # buf = io.BytesIO()
-    # buf_size = 128
-    # buf = array.array('B', [0 for _ in range(buf_size)])
-    # buf = bytearray(buf_size)
-    header_buf = array.array('I', [0, 0])
-    s = pipe.open_read()
-    print("Opened pipe")
-    while True:
-        read = s.read(header_buf)
-        print("header {}, {}: {}: {}".format(
-            i, read, header_buf, [hex(x) for x in header_buf]))
-        if read == 0:
-            print("Read 0 bytes. EndOfPipe.")
-            break
-        if read != 8:
-            raise ValueError("Expected 8 got {}: {}".format(read, header_buf))
-        if header_buf[0] != MAGIC:
-            raise ValueError("Expected magic {} got {}".format(
-                hex(MAGIC),
-                hex(header_buf[0])
-            ))
-        length = header_buf[1]
-        """
-        if(length > 1024*1024*10):
-            print("Length {} is too large".format(length))
-            length = 601646
-            data_buf = bytearray(1024)
-            read = s.read(data_buf)
-            print("read {}: {}".format(read, [hex(x) for x in data_buf]))
-            raise ValueError()
-        """
-        padding = (((length+3) >> 2) << 2) - length
-        data_buf = read_bytes(s, length)
-        #data_buf = bytearray(length)
-        #read = s.read(data_buf)
-        # if read != length:
-        #    raise ValueError("Expected to read {} got {}".format(length, read))
-        # use data
-        print("Yielding data")
-        yield io.BytesIO(data_buf)
-        # print("Read {} bytes".format(length))
-        if padding > 0:
-            read = s.read(bytearray(padding))
-            if read != padding:
-                raise ValueError(
-                    "Expected to read padding {} but got {}".format(padding, read))
-
-        # print("{}: {}: {}: {}".format(i, read, buf[:read], [hex(x) for x in buf[:read]]))
-        i += 1
-        if i > 10000:
-            raise ValueError("Stuck in loop?")
-        # if i > 100:
-        #    break
+def read_examples(pipe, buffer_size=DEFAULT_READ_BUFFER_SIZE):
+    """
+    Yield each RecordIO record of a pipe as a ``memoryview`` without copying.
+
+    Each view is only valid until the next record is requested (see
+    ``iterate_records``); copy it with ``bytes(record)`` to keep it.
+    """
+    return iterate_records(pipe.open_read(), buffer_size=buffer_size)
 
 
 if __name__ == '__main__':
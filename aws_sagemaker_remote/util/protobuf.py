@@ -1,20 +1,23 @@
-import struct
 import numpy as np
 from sagemaker.amazon.record_pb2 import Record
 from sagemaker.amazon.common import _write_recordio
+from aws_sagemaker_remote.util.recordio import frame_header, padding, PADDING
+from aws_sagemaker_remote.util.protobuf_reader import (
+    RECORD_FEATURES, VALUE_FLOAT32, VALUE_FLOAT64, VALUE_INT32, TENSOR_VALUES, WIRE_LENGTH
+)
 import json
 import io
-from aws_sagemaker_remote.util.logging_util import print_err
 
 try:
     from mlio.integ.numpy import to_numpy
 except:
-    print_err(
-        "Python `mlio` package not installed. \
-        Some aws-sagemaker-remote features may not be available"
-    )
+    # Features from util.protobuf_reader are already NumPy arrays
+    to_numpy = np.asarray
 
 LENGTH_FEATURE = "{}_length"
+DEFAULT_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+# Tensors with at least this many values are serialized with NumPy
+LARGE_TENSOR = 1024
 
 
 def decode_scalar(data):
@@ -24,13 +27,13 @@ def decode_scalar(data):
 
 
 def encode_binary(data):
-    file_size = len(data)
-    pad = ((4-(file_size % 4)) % 4)
-    if pad > 0:
-        data = data + (b"\x00"*pad)
-    data = struct.unpack("i"*(len(data)//4), data)
-    data = np.array(data, dtype=np.int32)
-    return data
+    """
+    Copy ``data`` into a new int32 array for an ``int32_tensor``, zero-padded to a multiple of 4 bytes
+    """
+    data = memoryview(data).cast('B')
+    words = np.zeros((len(data) + padding(len(data))) // 4, dtype=np.int32)
+    words.view(np.uint8)[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+    return words
 
 
 def decode_binary(data, length):
@@ -57,9 +60,45 @@ def decode_string(data, length):
 
 
 def decode_strings(datas, lengths):
-    return [
-        decode_string(data, length) for data, length in zip(datas, lengths)
+    return decode_strings_batch(datas, lengths)
+
+
+def decode_strings_batch(datas, lengths, encoding='utf-8', as_numpy=False):
+    """
+    Decode a batch of binary features in one pass.
+
+    Rows of the padded int32 matrix ``datas`` are sliced out of a single
+    contiguous copy of the batch, so there is one ``tobytes`` per batch
+    instead of one per row.
+
+    Args:
+        datas: ``(batch, width)`` int32 matrix (NumPy array, CPU torch tensor or list of rows)
+        lengths: ``(batch,)`` or ``(batch, 1)`` byte lengths
+        encoding: text encoding, or ``None`` to return ``bytes``
+        as_numpy: return a NumPy object array instead of a list
+    """
+    if hasattr(datas, 'numpy'):
+        datas = datas.numpy()
+    datas = np.ascontiguousarray(datas, dtype=np.int32)
+    lengths = np.asarray(lengths).reshape(-1).tolist()
+    if datas.shape[0] != len(lengths):
+        raise ValueError("Got {} rows and {} lengths".format(
+            datas.shape[0], len(lengths)))
+    buf = datas.tobytes()
+    stride = datas.nbytes // len(lengths) if lengths else 0
+    if lengths and max(lengths) > stride:
+        raise ValueError("Length {} exceeds row size {}".format(max(lengths), stride))
+    rows = [
+        buf[i * stride:i * stride + length]
+        for i, length in enumerate(lengths)
     ]
+    if encoding is not None:
+        rows = [row.decode(encoding) for row in rows]
+    if as_numpy:
+        ret = np.empty(len(rows), dtype=object)
+        ret[:] = rows
+        return ret
+    return rows
 
 
 def decode_bytesio(data, length):
@@ -76,52 +115,231 @@ def write_feature_tensor(record, vector, key):
     if isinstance(vector, str):
         vector = vector.encode('utf-8')
 
-    if isinstance(vector, bytes):
+    # Repeated fields extend much faster from lists than from NumPy arrays
+    if isinstance(vector, (bytes, bytearray, memoryview)):
         record.features[key].int32_tensor.values.extend(
-            encode_binary(vector)
+            encode_binary(vector).tolist()
         )
         record.features[LENGTH_FEATURE.format(key)].int32_tensor.values.extend(
-            [len(vector)]
+            [memoryview(vector).nbytes]
         )
     elif vector.dtype == np.int32:
-        record.features[key].int32_tensor.values.extend(vector)
+        record.features[key].int32_tensor.values.extend(vector.ravel().tolist())
     elif vector.dtype == np.float64:
-        record.features[key].float64_tensor.values.extend(vector)
+        record.features[key].float64_tensor.values.extend(vector.ravel().tolist())
     elif vector.dtype == np.float32:
-        record.features[key].float32_tensor.values.extend(vector)
+        record.features[key].float32_tensor.values.extend(vector.ravel().tolist())
     else:
         raise ValueError("Unhandled type {}".format(vector.dtype))
 
 
-def write_record(file, features=None, metadata=None):
-    record = Record()
-    record.Clear()
+def encode_varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def encode_varints(values):
+    """
+    Encode int32 values as packed protobuf varints with NumPy.
+
+    Negative values are sign-extended to 64 bits and take 10 bytes, as protobuf does.
+    """
+    v = np.asarray(values, dtype=np.int32).ravel()
+    if not v.size:
+        return b''
+    u = v.view(np.uint32)
+    if (u < 0x80).all():
+        return u.astype(np.uint8).tobytes()
+    negative = v < 0
+    lengths = 1 + (u >= 1 << 7).astype(np.int64) + (u >= 1 << 14) + (u >= 1 << 21) + (u >= 1 << 28)
+    lengths[negative] = 10
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    # Bytes 5 to 8 of negative values are all ones
+    out = np.full(int(ends[-1]), 0xFF, dtype=np.uint8)
+    for k in range(5):
+        group = ((u >> (7 * k)) & 0x7F).astype(np.uint8)
+        group |= (lengths > k + 1).astype(np.uint8) << 7
+        if k == 4:
+            group[negative] |= 0x70
+        if k == 0:
+            out[starts] = group
+        else:
+            written = lengths > k
+            out[starts[written] + k] = group[written]
+    out[ends[negative] - 1] = 0x01
+    return out.tobytes()
+
+
+def length_delimited(field, length):
+    return encode_varint(field << 3 | WIRE_LENGTH) + encode_varint(length)
+
+
+def encode_feature(key, vector):
+    """
+    Serialize one entry of ``Record.features``.
+
+    Equivalent to ``write_feature_tensor`` followed by serialization, but
+    tensors are encoded with NumPy instead of element by element.
+    Returns a list of byte strings to concatenate.
+    """
+    vector = np.asarray(vector)
+    if vector.dtype == np.int32:
+        field = VALUE_INT32
+        data = encode_varints(vector)
+    elif vector.dtype == np.float64:
+        field = VALUE_FLOAT64
+        data = vector.astype('<f8', copy=False).tobytes()
+    elif vector.dtype == np.float32:
+        field = VALUE_FLOAT32
+        data = vector.astype('<f4', copy=False).tobytes()
+    else:
+        raise ValueError("Unhandled type {}".format(vector.dtype))
+    key = key.encode('utf-8')
+    parts = [data]
+    # Empty packed fields are omitted
+    if data:
+        parts.insert(0, length_delimited(TENSOR_VALUES, len(data)))
+    tensor_length = sum(len(p) for p in parts)
+    parts.insert(0, length_delimited(field, tensor_length))
+    value_length = sum(len(p) for p in parts)
+    parts.insert(0, length_delimited(2, value_length))
+    parts.insert(0, length_delimited(1, len(key)) + key)
+    entry_length = sum(len(p) for p in parts)
+    parts.insert(0, length_delimited(RECORD_FEATURES, entry_length))
+    return parts
+
+
+def encode_record(record, features=None, metadata=None):
     """
-    print(record)
-    print(dir(record))
-    print(record.features)
-    print("data: {}, {}".format(type(data), len(data)))
-    print(dir(record.features["values"].bytes.value))
+    Serialize a record with ``features`` and ``metadata`` (see ``write_feature_tensor`` for value types).
+
+    ``record`` is cleared and reused. Small tensors are set on ``record``;
+    tensors of at least ``LARGE_TENSOR`` values are encoded with NumPy by
+    ``encode_feature`` and appended to the serialized record, which parses the
+    same as setting them on ``record``.
     """
+    record.Clear()
+    parts = []
     if features:
         for k, v in features.items():
-            write_feature_tensor(
-                record,
-                v,
-                k
-            )
+            if isinstance(v, str):
+                v = v.encode('utf-8')
+            if isinstance(v, (bytes, bytearray, memoryview)):
+                data = encode_binary(v)
+                if data.size >= LARGE_TENSOR:
+                    parts.extend(encode_feature(k, data))
+                    record.features[LENGTH_FEATURE.format(k)].int32_tensor.values.append(
+                        memoryview(v).nbytes)
+                    continue
+            elif np.size(v) >= LARGE_TENSOR:
+                parts.extend(encode_feature(k, v))
+                continue
+            write_feature_tensor(record, v, k)
     if metadata:
         if not isinstance(metadata, str):
             metadata = json.dumps(metadata)
         record.metadata = metadata
-    # print(record.metadata)
-    # print(dir(record.metadata))
-    # record.metadata.val
+    parts.insert(0, record.SerializeToString())
+    return b''.join(parts)
+
+
+def write_record(file, features=None, metadata=None, record=None):
+    """
+    Write one RecordIO-protobuf record. Pass ``record`` to reuse a ``Record``.
+
+    ``RecordWriter`` writes the same bytes and counts the records written.
+    """
+    if record is None:
+        record = Record()
     _write_recordio(
-        file, record.SerializeToString()
+        file, encode_record(record, features=features, metadata=metadata)
     )
 
 
+class RecordWriter(object):
+    """
+    RecordIO-protobuf writer for a file of many records.
+
+    Each record is encoded with ``encode_record`` like ``write_record``, reusing
+    one ``Record``, and framed records are collected in memory until
+    ``buffer_size`` bytes are pending, then written in one call. Encoding
+    dominates the cost, so this is no faster than calling ``write_record`` on a
+    buffered file; it keeps the record and byte counts and closes a file it opened.
+    Use as a context manager or call ``close`` to write the remaining records.
+
+    Args:
+        file: path or binary file object (a path is opened and closed by the writer)
+        buffer_size: bytes buffered between writes
+    """
+
+    def __init__(self, file, buffer_size=DEFAULT_WRITE_BUFFER_SIZE):
+        if isinstance(file, str):
+            self.file = open(file, 'wb')
+            self.owns_file = True
+        else:
+            self.file = file
+            self.owns_file = False
+        self.buffer_size = buffer_size
+        self.record = Record()
+        self.buffer = bytearray()
+        self.records = 0
+        self.bytes = 0
+
+    def write(self, features=None, metadata=None):
+        """
+        Write one record (see ``write_record``)
+        """
+        data = encode_record(self.record, features=features, metadata=metadata)
+        length = len(data)
+        pad = padding(length)
+        self.buffer += frame_header(length)
+        self.buffer += data
+        if pad:
+            self.buffer += PADDING[:pad]
+        self.records += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_batch(self, features, metadata=None):
+        """
+        Write one record per row of a batch.
+
+        Args:
+            features: dict of feature name to a ``(batch, ...)`` array or a list of values
+            metadata: optional list with the metadata of each row
+        """
+        keys = list(features.keys())
+        rows = len(features[keys[0]]) if keys else len(metadata)
+        for i in range(rows):
+            self.write(
+                features={k: features[k][i] for k in keys},
+                metadata=metadata[i] if metadata is not None else None
+            )
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.bytes += len(self.buffer)
+            # The file may hold on to the written buffer
+            self.buffer = bytearray()
+
+    def close(self):
+        self.flush()
+        if self.owns_file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
 if __name__ == '__main__':
     s = "hello world"
     l = len(s)
@@ -0,0 +1,329 @@
+"""
+Pure Python/NumPy reader for RecordIO-protobuf streams.
+
+Parses the wire format of ``sagemaker.amazon.record_pb2.Record`` directly,
+without ``mlio`` or the ``protobuf`` runtime. Packed float tensors become
+``np.frombuffer`` views of the record and packed int32 tensors are decoded
+with vectorized varint arithmetic, once per batch. Records are grouped into batches of
+``(batch, ...)`` arrays like ``mlio.RecordIOProtobufReader``; features whose
+length differs between records are zero-padded to the longest in the batch.
+"""
+import numpy as np
+from aws_sagemaker_remote.util.recordio import iterate_records, DEFAULT_READ_BUFFER_SIZE
+
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH = 2
+WIRE_FIXED32 = 5
+
+# Field numbers of record.proto
+RECORD_FEATURES = 1
+RECORD_LABEL = 2
+VALUE_FLOAT32 = 2
+VALUE_FLOAT64 = 3
+VALUE_INT32 = 7
+VALUE_BYTES = 9
+TENSOR_VALUES = 1
+TENSOR_KEYS = 2
+TENSOR_SHAPE = 3
+
+TENSOR_DTYPES = {
+    VALUE_FLOAT32: np.dtype('<f4'),
+    VALUE_FLOAT64: np.dtype('<f8'),
+    VALUE_INT32: np.dtype(np.int32)
+}
+
+
+def read_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def iterate_fields(buf, start=0, end=None):
+    """
+    Yield ``(field number, wire type, value)`` for each field of a message.
+
+    Length-delimited values are returned as ``(start, end)`` offsets into ``buf``.
+    """
+    pos = start
+    end = len(buf) if end is None else end
+    while pos < end:
+        tag, pos = read_varint(buf, pos)
+        field, wire = tag >> 3, tag & 7
+        if wire == WIRE_VARINT:
+            value, pos = read_varint(buf, pos)
+        elif wire == WIRE_LENGTH:
+            length, pos = read_varint(buf, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire == WIRE_FIXED32:
+            value = (pos, pos + 4)
+            pos += 4
+        elif wire == WIRE_FIXED64:
+            value = (pos, pos + 8)
+            pos += 8
+        else:
+            raise ValueError("Unsupported protobuf wire type {}".format(wire))
+        yield field, wire, value
+    if pos != end:
+        raise ValueError("Truncated protobuf message")
+
+
+def decode_varints(data, dtype=np.uint64):
+    """
+    Decode a packed run of varints with NumPy, without a Python loop per value
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not data.size:
+        return np.zeros(0, dtype=dtype)
+    continued = data >= 0x80
+    if not continued.any():
+        return data.astype(dtype)
+    if continued[-1]:
+        raise ValueError("Truncated packed varints")
+    ends = np.flatnonzero(~continued)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    width = int(lengths.max())
+    # Gather the bytes of every varint into one zero-padded row per value
+    offsets = np.arange(width)
+    index = np.minimum(starts[:, None] + offsets, data.size - 1)
+    groups = (data[index] & 0x7F).astype(np.uint64)
+    groups[offsets >= lengths[:, None]] = 0
+    values = np.bitwise_or.reduce(
+        groups << (np.uint64(7) * offsets.astype(np.uint64)), axis=1)
+    return values.astype(dtype)
+
+
+def decode_int32(data):
+    # Negative int32 values are sign-extended to 64 bits on the wire
+    return (decode_varints(data) & np.uint64(0xFFFFFFFF)).astype(np.uint32).view(np.int32)
+
+
+class PackedInt32(object):
+    """
+    Packed int32 varints whose decoding is deferred so a whole batch is decoded at once
+    """
+
+    def __init__(self, data, shape=None):
+        self.data = data
+        self.shape = shape
+
+    def decode(self):
+        values = decode_int32(self.data)
+        if self.shape:
+            values = values.reshape(self.shape)
+        return values
+
+
+def decode_packed_int32(tensors):
+    """
+    Decode a list of ``PackedInt32`` with one vectorized pass over their concatenated bytes
+    """
+    data = b''.join(t.data for t in tensors)
+    values = decode_int32(data)
+    terminal = np.zeros(len(data) + 1, dtype=np.int64)
+    terminal[1:] = np.cumsum(np.frombuffer(data, dtype=np.uint8) < 0x80)
+    ends = np.cumsum([len(t.data) for t in tensors])
+    counts = np.diff(terminal[np.concatenate([[0], ends])])
+    if not any(t.shape for t in tensors) and (counts == counts[0]).all():
+        return values.reshape(len(tensors), int(counts[0]))
+    arrays = np.split(values, np.cumsum(counts)[:-1])
+    return stack_feature([
+        a.reshape(t.shape) if t.shape else a for a, t in zip(arrays, tensors)
+    ])
+
+
+def decode_values(buf, value_type, parts, lazy=False):
+    dtype = TENSOR_DTYPES[value_type]
+    if len(parts) == 1 and parts[0][0] == WIRE_LENGTH:
+        start, end = parts[0][1]
+        if value_type == VALUE_INT32:
+            if lazy:
+                return PackedInt32(bytes(buf[start:end]))
+            return decode_int32(buf[start:end])
+        return np.frombuffer(buf, dtype=dtype, count=(end - start) // dtype.itemsize, offset=start)
+    values = []
+    for wire, value in parts:
+        if wire == WIRE_LENGTH:
+            start, end = value
+            if value_type == VALUE_INT32:
+                values.extend(decode_int32(buf[start:end]).tolist())
+            else:
+                values.extend(np.frombuffer(buf[start:end], dtype=dtype).tolist())
+        elif wire == WIRE_VARINT:
+            values.append(np.uint64(value).astype(np.uint32).view(np.int32).item())
+        else:
+            start, end = value
+            values.append(np.frombuffer(buf[start:end], dtype=dtype)[0])
+    return np.array(values, dtype=dtype)
+
+
+def decode_uint64s(buf, parts):
+    values = []
+    for wire, value in parts:
+        if wire == WIRE_LENGTH:
+            values.extend(decode_varints(buf[value[0]:value[1]]).tolist())
+        else:
+            values.append(value)
+    return values
+
+
+def decode_tensor(buf, value_type, start, end, lazy=False):
+    fields = {TENSOR_VALUES: [], TENSOR_KEYS: [], TENSOR_SHAPE: []}
+    for field, wire, value in iterate_fields(buf, start, end):
+        if field in fields:
+            fields[field].append((wire, value))
+    keys = decode_uint64s(buf, fields[TENSOR_KEYS])
+    shape = decode_uint64s(buf, fields[TENSOR_SHAPE])
+    values = decode_values(buf, value_type, fields[TENSOR_VALUES], lazy=lazy and not keys)
+    if isinstance(values, PackedInt32):
+        values.shape = [int(s) for s in shape]
+        return values
+    if keys:
+        if not shape:
+            raise ValueError("Sparse tensor without shape")
+        dense = np.zeros(int(np.prod(shape)), dtype=values.dtype)
+        dense[np.array(keys, dtype=np.int64)] = values
+        values = dense
+    if shape:
+        values = values.reshape([int(s) for s in shape])
+    return values
+
+
+def decode_value(buf, start, end, lazy=False):
+    for field, wire, value in iterate_fields(buf, start, end):
+        if field in TENSOR_DTYPES:
+            return decode_tensor(buf, field, *value, lazy=lazy)
+        elif field == VALUE_BYTES:
+            return np.array([
+                bytes(buf[v[0]:v[1]])
+                for f, w, v in iterate_fields(buf, *value) if f == 1
+            ], dtype=object)
+    raise ValueError("Empty protobuf Value")
+
+
+def parse_record(buf, lazy=False):
+    """
+    Parse a serialized ``Record`` into a dict of NumPy arrays.
+
+    Features and labels are returned in the same dict. Arrays may be views of
+    ``buf``. With ``lazy=True`` dense int32 tensors are returned as ``PackedInt32``.
+    """
+    features = {}
+    for field, wire, value in iterate_fields(buf):
+        if field in (RECORD_FEATURES, RECORD_LABEL):
+            key = None
+            data = None
+            for f, w, v in iterate_fields(buf, *value):
+                if f == 1:
+                    key = bytes(buf[v[0]:v[1]]).decode('utf-8')
+                elif f == 2:
+                    data = v
+            if key is not None and data is not None:
+                features[key] = decode_value(buf, *data, lazy=lazy)
+    return features
+
+
+def stack_feature(arrays):
+    """
+    Stack arrays into one ``(batch, ...)`` array, zero-padding to the largest shape
+    """
+    shape = arrays[0].shape
+    if all(a.shape == shape for a in arrays):
+        return np.stack(arrays)
+    ndim = max(a.ndim for a in arrays)
+    arrays = [a.reshape(a.shape + (1,) * (ndim - a.ndim)) for a in arrays]
+    shape = tuple(max(dims) for dims in zip(*[a.shape for a in arrays]))
+    batch = np.zeros((len(arrays),) + shape, dtype=arrays[0].dtype)
+    for i, a in enumerate(arrays):
+        batch[(i,) + tuple(slice(0, d) for d in a.shape)] = a
+    return batch
+
+
+def stack_values(values):
+    if all(isinstance(v, PackedInt32) for v in values):
+        return decode_packed_int32(values)
+    return stack_feature([
+        v.decode() if isinstance(v, PackedInt32) else v for v in values
+    ])
+
+
+def stack_records(records, features=None):
+    keys = features or list(records[0].keys())
+    return {
+        k: stack_values([r[k] for r in records]) for k in keys
+    }
+
+
+def iterate_protobuf_records(stream, buffer_size=DEFAULT_READ_BUFFER_SIZE, lazy=False):
+    """
+    Yield one dict of arrays per record. Each record is copied once and arrays are views of the copy.
+    """
+    for record in iterate_records(stream, buffer_size=buffer_size):
+        yield parse_record(bytearray(record), lazy=lazy)
+
+
+def iterate_protobuf_batches(
+    stream, batch_size=1, features=None, drop_last=False,
+    buffer_size=DEFAULT_READ_BUFFER_SIZE
+):
+    """
+    Yield dicts of ``(batch, ...)`` arrays from a RecordIO-protobuf stream.
+
+    Args:
+        stream: file object with ``readinto`` or an ``mlio`` input stream
+        batch_size: records per batch
+        features: feature names to keep (default all)
+        drop_last: drop the final batch if it is smaller than ``batch_size``
+        buffer_size: RecordIO read buffer size
+    """
+    batch = []
+    for record in iterate_protobuf_records(stream, buffer_size=buffer_size, lazy=True):
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield stack_records(batch, features=features)
+            batch = []
+    if batch and not drop_last:
+        yield stack_records(batch, features=features)
+
+
+class ProtobufPipeReader(object):
+    """
+    Stand-in for ``mlio.RecordIOProtobufReader`` over ``mlio.SageMakerPipe``.
+
+    Iterating reads the FIFO ``{path}_{fifo_id}``. ``reset`` moves on to the next FIFO,
+    like the mlio pipe does.
+    """
+
+    def __init__(self, path, fifo_id=0, batch_size=1, features=None, drop_last=False,
+                 buffer_size=DEFAULT_READ_BUFFER_SIZE):
+        self.path = path
+        self.fifo_id = fifo_id
+        self.batch_size = batch_size
+        self.features = features
+        self.drop_last = drop_last
+        self.buffer_size = buffer_size
+
+    def __iter__(self):
+        with open("{}_{}".format(self.path, self.fifo_id), 'rb', buffering=0) as f:
+            for batch in iterate_protobuf_batches(
+                f,
+                batch_size=self.batch_size,
+                features=self.features,
+                drop_last=self.drop_last,
+                buffer_size=self.buffer_size
+            ):
+                yield batch
+
+    def reset(self):
+        self.fifo_id += 1
@@ -0,0 +1,118 @@
+"""
+RecordIO framing used by SageMaker Pipe mode.
+
+Each record is a 4-byte magic number, a 4-byte little-endian length, the
+payload, and zero padding up to a multiple of 4 bytes.
+"""
+import json
+import struct
+
+MAGIC = 0xCED7230A
+HEADER = struct.Struct('<II')
+HEADER_SIZE = HEADER.size
+PADDING = b'\x00\x00\x00'
+DEFAULT_READ_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def padding(length):
+    """
+    Number of zero bytes that follow a payload of ``length`` bytes
+    """
+    return -length % 4
+
+
+def frame_header(length):
+    return HEADER.pack(MAGIC, length)
+
+
+def write_recordio(f, data):
+    """
+    Write ``data`` to file ``f`` as one RecordIO record and return the bytes written
+    """
+    length = len(data)
+    f.write(frame_header(length))
+    f.write(data)
+    pad = padding(length)
+    if pad:
+        f.write(PADDING[:pad])
+    return HEADER_SIZE + length + pad
+
+
+def encode_attribute(value):
+    """
+    Encode a manifest attribute value as a record payload.
+
+    Strings are written as UTF-8 and other values as JSON.
+    """
+    if isinstance(value, bytes):
+        return value
+    elif isinstance(value, str):
+        return value.encode('utf-8')
+    else:
+        return json.dumps(value).encode('utf-8')
+
+
+def readinto_function(stream):
+    """
+    Function that fills a writable buffer from ``stream`` and returns the bytes read.
+
+    File objects provide ``readinto``. ``mlio`` streams fill the buffer passed to ``read``.
+    """
+    if hasattr(stream, 'readinto'):
+        return stream.readinto
+    return stream.read
+
+
+def iterate_records(stream, buffer_size=DEFAULT_READ_BUFFER_SIZE):
+    """
+    Yield the payload of each RecordIO record in ``stream`` as a ``memoryview``.
+
+    Records are parsed from large reads into one reusable buffer that grows
+    only for records larger than the buffer. Each view is only valid until
+    the next record is requested; copy it with ``bytes(view)`` to keep it.
+
+    Args:
+        stream: file object with ``readinto`` or an ``mlio`` input stream
+        buffer_size: size of the read buffer in bytes
+    """
+    readinto = readinto_function(stream)
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    start = 0
+    end = 0
+
+    def fill(needed):
+        # Read until at least ``needed`` bytes are buffered after ``start``
+        nonlocal buf, view, start, end
+        if needed > len(buf):
+            grown = bytearray(max(needed, 2 * len(buf)))
+            grown[:end - start] = view[start:end]
+            buf, view = grown, memoryview(grown)
+            start, end = 0, end - start
+        elif start + needed > len(buf):
+            view[:end - start] = view[start:end]
+            start, end = 0, end - start
+        while end - start < needed:
+            read = readinto(view[end:])
+            if not read:
+                return False
+            end += read
+        return True
+
+    while True:
+        if end - start < HEADER_SIZE and not fill(HEADER_SIZE):
+            if end == start:
+                return
+            raise ValueError("Truncated RecordIO header: got {} of {} bytes".format(
+                end - start, HEADER_SIZE))
+        magic, length = HEADER.unpack_from(buf, start)
+        if magic != MAGIC:
+            raise ValueError("Expected magic {} got {}".format(
+                hex(MAGIC), hex(magic)))
+        total = HEADER_SIZE + length + padding(length)
+        if end - start < total and not fill(total):
+            raise ValueError("Truncated RecordIO record: got {} of {} bytes".format(
+                end - start, total))
+        offset = start + HEADER_SIZE
+        start += total
+        yield view[offset:offset + length]
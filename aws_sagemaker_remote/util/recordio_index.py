@@ -0,0 +1,220 @@
+"""
+Offset index files and random access to RecordIO shards.
+
+The index of ``shard.rec`` is the sidecar file ``shard.rec.idx``: an 8-byte
+magic, the little-endian ``uint64`` record count, then the ``uint64`` payload
+offset of every record followed by the ``uint64`` payload length of every
+record. ``build_index`` creates it with a single scan over the record headers
+of a memory-mapped shard, skipping the payloads.
+
+``RecordIODataset`` memory-maps shards and returns records by index as
+``memoryview`` slices of the map, so File mode training can sample records in
+any order without reading shards sequentially.
+"""
+import bisect
+import mmap
+import os
+import numpy as np
+from aws_sagemaker_remote.util.recordio import HEADER, HEADER_SIZE, MAGIC, padding
+try:
+    from torch.utils.data import Dataset
+except ImportError:
+    Dataset = object
+
+INDEX_MAGIC = b'RECIDX01'
+INDEX_SUFFIX = '.idx'
+INDEX_DTYPE = np.dtype('<u8')
+
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+
+def scan_offsets(path):
+    """
+    Scan the record headers of a RecordIO file.
+
+    Returns:
+        ``(offsets, lengths)`` arrays of the payload offset and length of each record
+    """
+    offsets = []
+    lengths = []
+    size = os.path.getsize(path)
+    if size == 0:
+        return np.zeros(0, dtype=INDEX_DTYPE), np.zeros(0, dtype=INDEX_DTYPE)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        unpack = HEADER.unpack_from
+        pos = 0
+        while pos < size:
+            if pos + HEADER_SIZE > size:
+                raise ValueError("Truncated RecordIO header at offset {} of [{}]".format(pos, path))
+            magic, length = unpack(m, pos)
+            if magic != MAGIC:
+                raise ValueError("Expected magic {} got {} at offset {} of [{}]".format(
+                    hex(MAGIC), hex(magic), pos, path))
+            offsets.append(pos + HEADER_SIZE)
+            lengths.append(length)
+            pos += HEADER_SIZE + length + padding(length)
+        if pos != size:
+            raise ValueError("Truncated RecordIO record at offset {} of [{}]".format(
+                offsets[-1] - HEADER_SIZE, path))
+    return np.array(offsets, dtype=INDEX_DTYPE), np.array(lengths, dtype=INDEX_DTYPE)
+
+
+def encode_index(offsets, lengths):
+    """
+    Index file contents for ``offsets`` and ``lengths``
+    """
+    if len(offsets) != len(lengths):
+        raise ValueError("Index has {} offsets and {} lengths".format(len(offsets), len(lengths)))
+    return b''.join([
+        INDEX_MAGIC,
+        np.array([len(offsets)], dtype=INDEX_DTYPE).tobytes(),
+        np.asarray(offsets, dtype=INDEX_DTYPE).tobytes(),
+        np.asarray(lengths, dtype=INDEX_DTYPE).tobytes()
+    ])
+
+
+def write_index(path, offsets, lengths):
+    """
+    Write an index file of ``offsets`` and ``lengths``
+    """
+    data = encode_index(offsets, lengths)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def read_index(path):
+    """
+    Read an index file
+
+    Returns:
+        ``(offsets, lengths)`` arrays
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(INDEX_MAGIC))
+        if magic != INDEX_MAGIC:
+            raise ValueError("[{}] is not a RecordIO index".format(path))
+        count = int(np.frombuffer(f.read(INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)[0])
+        data = np.fromfile(f, dtype=INDEX_DTYPE, count=2 * count)
+    if data.size != 2 * count:
+        raise ValueError("Truncated RecordIO index [{}]".format(path))
+    return data[:count], data[count:]
+
+
+def build_index(path, index=None):
+    """
+    Scan ``path`` and write its index (default the sidecar ``{path}.idx``)
+
+    Returns:
+        ``(offsets, lengths)`` arrays
+    """
+    offsets, lengths = scan_offsets(path)
+    write_index(index or index_path(path), offsets, lengths)
+    return offsets, lengths
+
+
+def load_index(path, build=True):
+    """
+    Read the sidecar index of ``path``.
+
+    A missing index, or one older than the shard, is built if ``build`` is set.
+    """
+    index = index_path(path)
+    if os.path.exists(index) and os.path.getmtime(index) >= os.path.getmtime(path):
+        return read_index(index)
+    if not build:
+        raise FileNotFoundError("No up-to-date index [{}] for [{}]".format(index, path))
+    return build_index(path, index=index)
+
+
+class RecordIODataset(Dataset):
+    """
+    Map-style dataset over memory-mapped RecordIO shards.
+
+    Items are ``memoryview`` slices of the memory map and are only valid while
+    the dataset is open; copy them with ``bytes(item)`` to keep them. With
+    ``size > 1`` consecutive records are grouped into lists, like ``PipeDataset``.
+    Parse RecordIO-protobuf records with ``transform=util.protobuf_reader.parse_record``.
+
+    Shards are mapped lazily in each process, so the dataset can be used with
+    DataLoader workers.
+
+    Args:
+        paths: shard path or list of shard paths
+        size: records per example
+        transform: function applied to each example
+        build_index: build missing or outdated sidecar indices
+    """
+
+    def __init__(self, paths, size=1, transform=None, build_index=True):
+        super(RecordIODataset, self).__init__()
+        if isinstance(paths, str):
+            paths = [paths]
+        self.paths = list(paths)
+        self.size = size
+        self.transform = transform
+        self.offsets = []
+        self.lengths = []
+        self.ends = []
+        total = 0
+        for path in self.paths:
+            offsets, lengths = load_index(path, build=build_index)
+            if len(offsets) % size:
+                raise ValueError("[{}] has {} records, not a multiple of {}".format(
+                    path, len(offsets), size))
+            self.offsets.append(offsets)
+            self.lengths.append(lengths)
+            total += len(offsets) // size
+            self.ends.append(total)
+        self.maps = {}
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    def shard(self, i):
+        if i not in self.maps:
+            with open(self.paths[i], 'rb') as f:
+                if self.lengths[i].size:
+                    self.maps[i] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    self.maps[i] = b''
+        return self.maps[i]
+
+    def record(self, shard, i):
+        """
+        Record ``i`` of shard ``shard`` as a ``memoryview``
+        """
+        offset = int(self.offsets[shard][i])
+        return memoryview(self.shard(shard))[offset:offset + int(self.lengths[shard][i])]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RecordIODataset index {} out of range".format(index))
+        shard = bisect.bisect_right(self.ends, index)
+        i = index - (self.ends[shard - 1] if shard else 0)
+        if self.size == 1:
+            example = self.record(shard, i)
+        else:
+            example = [self.record(shard, i * self.size + j) for j in range(self.size)]
+        if self.transform is not None:
+            example = self.transform(example)
+        return example
+
+    def close(self):
+        """
+        Unmap all shards. Fails while items returned by the dataset are still referenced.
+        """
+        for m in self.maps.values():
+            if isinstance(m, mmap.mmap):
+                m.close()
+        self.maps = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['maps'] = {}
+        return state
@@ -0,0 +1,215 @@
+"""
+Write RecordIO shards straight to S3.
+
+``S3ShardWriter`` frames records like ``write_record`` and streams each shard
+into a ``MultipartUploadWriter``, so parts are uploaded while the script keeps
+producing records. When a shard reaches its size limit the writer moves on to
+the next shard and the finished one completes its upload in the background.
+Nothing is staged on the local volume, unlike writing to a processing output
+that is uploaded at ``EndOfJob``.
+"""
+import json
+from aws_sagemaker_remote.s3 import parse_s3
+from aws_sagemaker_remote.util.download import MB
+from aws_sagemaker_remote.util.multipart import MultipartUploadWriter, DEFAULT_UPLOAD_PART_SIZE, DEFAULT_UPLOAD_WORKERS
+from aws_sagemaker_remote.util.protobuf import Record, encode_record
+from aws_sagemaker_remote.util.recordio import frame_header, padding, PADDING, HEADER_SIZE
+from aws_sagemaker_remote.util.recordio_index import encode_index, INDEX_SUFFIX
+from aws_sagemaker_remote.util.shards import manifest_json, SHARD_FORMATS, SHARD_SUFFIXES, DEFAULT_SHARD_MB
+from aws_sagemaker_remote.util.threads import BoundedExecutor
+
+DEFAULT_MAX_CLOSING = 2
+
+
+class S3Shard(object):
+    """
+    One shard being uploaded
+    """
+
+    def __init__(self, s3, Bucket, Key, part_size, workers):
+        self.s3 = s3
+        self.Bucket = Bucket
+        self.Key = Key
+        self.writer = MultipartUploadWriter(
+            s3=s3, Bucket=Bucket, Key=Key, part_size=part_size, workers=workers)
+        self.offsets = []
+        self.lengths = []
+        self.bytes = 0
+        self.uploaded = False
+
+    def write(self, data):
+        length = len(data)
+        pad = padding(length)
+        self.offsets.append(self.bytes + HEADER_SIZE)
+        self.lengths.append(length)
+        self.writer.write(frame_header(length))
+        self.writer.write(data)
+        if pad:
+            self.writer.write(PADDING[:pad])
+        self.bytes += HEADER_SIZE + length + pad
+
+    def finish(self, index):
+        self.writer.close()
+        self.uploaded = True
+        if index:
+            self.s3.put_object(
+                Bucket=self.Bucket,
+                Key=self.Key + INDEX_SUFFIX,
+                Body=encode_index(self.offsets, self.lengths)
+            )
+
+    def abort(self):
+        """
+        Abort the multipart upload unless it completed
+        """
+        if not self.uploaded:
+            self.writer.abort()
+
+
+class S3ShardWriter(object):
+    """
+    Write RecordIO records to shards ``{url}/{name}-{index:05d}{suffix}`` on S3.
+
+    Use as a context manager, or call ``close`` to finish the last shard and
+    wait for all uploads. An error in a background upload is raised by the next
+    write or by ``close``. If the writer exits with an exception or an upload
+    fails, the multipart uploads of every shard that did not complete are
+    aborted, including shards whose background upload was cancelled.
+
+    Args:
+        s3: S3 client
+        url: S3 prefix of the shards (``s3://bucket/prefix``)
+        name: shard name prefix
+        format: ``recordio`` or ``protobuf``, only used for the shard suffix
+        shard_mb: start a new shard once a shard reaches this many MB (0 for no limit)
+        shard_records: start a new shard after this many records (0 for no limit)
+        manifest: write the ``ManifestFile`` manifest ``{url}-manifest.json`` on close
+        index: upload a ``.idx`` offset index next to each shard
+        part_size: multipart upload part size
+        workers: concurrent part uploads per shard
+        max_closing: finished shards that may still be uploading before writes block
+    """
+
+    def __init__(
+        self, s3, url, name='shard', format='recordio', shard_mb=DEFAULT_SHARD_MB, shard_records=0,
+        manifest=True, index=False, part_size=DEFAULT_UPLOAD_PART_SIZE, workers=DEFAULT_UPLOAD_WORKERS,
+        max_closing=DEFAULT_MAX_CLOSING
+    ):
+        if format not in SHARD_FORMATS:
+            raise ValueError("Unknown shard format [{}] (expected one of {})".format(
+                format, SHARD_FORMATS))
+        if not shard_mb and not shard_records:
+            raise ValueError("Shards require a target size in MB or records")
+        url = parse_s3(url.rstrip('/'))
+        if not url['Key']:
+            raise ValueError("S3ShardWriter requires a prefix below the bucket")
+        self.s3 = s3
+        self.Bucket = url['Bucket']
+        self.Prefix = url['Key']
+        self.name = name
+        self.suffix = SHARD_SUFFIXES[format]
+        self.shard_bytes = shard_mb * MB if shard_mb else None
+        self.shard_records = shard_records
+        self.manifest = manifest
+        self.index = index
+        self.part_size = part_size
+        self.workers = workers
+        self.closer = BoundedExecutor(1, max_pending=max_closing)
+        self.record = Record()
+        self.shard = None
+        # Shards whose upload may not have completed
+        self.shards = []
+        self.keys = []
+        self.records = 0
+        self.bytes = 0
+        self.closed = False
+
+    def shard_key(self, index):
+        return "{}/{}-{:05d}{}".format(self.Prefix, self.name, index, self.suffix)
+
+    def write(self, data):
+        """
+        Write ``data`` as one RecordIO record
+        """
+        if self.closed:
+            raise ValueError("write to closed S3ShardWriter")
+        self.closer.check()
+        if self.shard is None:
+            key = self.shard_key(len(self.keys))
+            self.keys.append(key)
+            self.shard = S3Shard(
+                s3=self.s3, Bucket=self.Bucket, Key=key,
+                part_size=self.part_size, workers=self.workers)
+            self.shards.append(self.shard)
+        self.shard.write(data)
+        self.records += 1
+        if (
+            (self.shard_bytes is not None and self.shard.bytes >= self.shard_bytes) or
+            (self.shard_records and len(self.shard.lengths) >= self.shard_records)
+        ):
+            self.finish_shard()
+
+    def write_record(self, features=None, metadata=None):
+        """
+        Write one RecordIO-protobuf record (see ``util.protobuf.write_record``)
+        """
+        self.write(encode_record(self.record, features=features, metadata=metadata))
+
+    def finish_shard(self):
+        shard = self.shard
+        self.shard = None
+        self.bytes += shard.bytes
+        self.shards = [s for s in self.shards if not s.uploaded]
+        self.closer.submit(shard.finish, self.index)
+
+    def manifest_key(self):
+        return self.Prefix + '-manifest.json'
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.shard is not None:
+            self.finish_shard()
+        try:
+            self.closer.close()
+        except BaseException:
+            self.abort_shards()
+            raise
+        if self.manifest:
+            manifest = manifest_json(
+                [key[len(self.Prefix) + 1:] for key in self.keys],
+                prefix="s3://{}/{}/".format(self.Bucket, self.Prefix))
+            self.s3.put_object(
+                Bucket=self.Bucket,
+                Key=self.manifest_key(),
+                Body=json.dumps(manifest, indent=1).encode('utf-8'),
+                ContentType='application/json'
+            )
+        print("Wrote {} records ({:.1f} MB) to {} shards at s3://{}/{}".format(
+            self.records, self.bytes / MB, len(self.keys), self.Bucket, self.Prefix))
+
+    def abort_shards(self):
+        for shard in self.shards:
+            try:
+                shard.abort()
+            except Exception as e:
+                print("Failed to abort upload of shard [s3://{}/{}]: {}".format(
+                    shard.Bucket, shard.Key, e))
+        self.shards = []
+
+    def abort(self):
+        self.closed = True
+        self.shard = None
+        # Wait for running uploads, then abort the shards that did not complete
+        self.closer.shutdown(cancel=True)
+        self.abort_shards()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
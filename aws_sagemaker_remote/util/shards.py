@@ -0,0 +1,249 @@
+"""
+Convert a folder of samples into RecordIO shards for Pipe mode.
+
+Files are grouped into examples by their path without extension, so
+``a/001.wav`` and ``a/001.txt`` form the example ``a/001``. Examples are
+assigned in key order (or a seeded shuffle) to shards of a target size in
+megabytes and/or records, and shards are written in parallel processes.
+
+Formats:
+
+* ``recordio``: one RecordIO record per file, grouped per example in the
+  order of ``extensions``. Read with ``RawPipeIterator(size=len(extensions))``.
+* ``protobuf``: one RecordIO-protobuf record per example with a bytes feature
+  per extension (see ``util.protobuf.RecordWriter``) and the example key as metadata.
+
+Shards are named ``{name}-{index:05d}{suffix}`` and listed in a manifest that
+can be used as a ``ManifestFile`` channel once the shards are uploaded under
+``manifest_prefix``. With ``index=True`` each shard also gets a ``.idx``
+offset index for random access with ``util.recordio_index.RecordIODataset``.
+"""
+import json
+import os
+import random
+import warnings
+from aws_sagemaker_remote.mpworkers import run_workers
+from aws_sagemaker_remote.util.download import MB
+from aws_sagemaker_remote.util.recordio import write_recordio, padding, HEADER_SIZE
+from aws_sagemaker_remote.util.protobuf import RecordWriter
+from aws_sagemaker_remote.util.recordio_index import build_index
+
+SHARD_FORMATS = ['recordio', 'protobuf']
+SHARD_SUFFIXES = {'recordio': '.rec', 'protobuf': '.pbr'}
+DEFAULT_SHARD_MB = 128
+DEFAULT_FEATURE = 'data'
+
+
+def normalize_extension(extension):
+    if extension and not extension.startswith('.'):
+        extension = '.' + extension
+    return extension
+
+
+def feature_name(extension):
+    """
+    Protobuf feature name of files with ``extension``
+    """
+    return extension.lstrip('.') or DEFAULT_FEATURE
+
+
+def group_samples(input, extensions=None):
+    """
+    Group the files under ``input`` into examples.
+
+    Args:
+        input: input directory
+        extensions: extensions of the files of each example, in record order.
+            Examples missing any of them are skipped with a warning.
+            If empty, every file is an example of one record.
+
+    Returns:
+        list of ``(key, [file paths])`` sorted by key
+    """
+    input = os.path.abspath(input)
+    extensions = [normalize_extension(e) for e in (extensions or [])]
+    groups = {}
+    for root, dirs, names in os.walk(input):
+        dirs.sort()
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, input).replace(os.sep, '/')
+            if extensions:
+                key, extension = os.path.splitext(relative)
+                if extension not in extensions:
+                    continue
+            else:
+                key, extension = relative, ''
+            groups.setdefault(key, {})[extension] = path
+    examples = []
+    skipped = 0
+    for key in sorted(groups.keys()):
+        files = groups[key]
+        if extensions:
+            if len(files) < len(extensions):
+                skipped += 1
+                continue
+            examples.append((key, [files[e] for e in extensions]))
+        else:
+            examples.append((key, [files['']]))
+    if skipped:
+        warnings.warn("Skipped {} examples missing one of the extensions {}".format(
+            skipped, extensions))
+    return examples
+
+
+def record_size(length):
+    return HEADER_SIZE + length + padding(length)
+
+
+def plan_shards(examples, output, name='shard', format='recordio', shard_mb=DEFAULT_SHARD_MB, shard_records=0):
+    """
+    Assign examples to shards in order.
+
+    A shard is closed before it would exceed ``shard_mb`` megabytes of input
+    files, or once it holds ``shard_records`` examples (0 for no limit).
+    An example larger than ``shard_mb`` gets a shard of its own.
+
+    Returns:
+        list of shard dicts with ``index``, ``path`` and ``examples``
+    """
+    if not shard_mb and not shard_records:
+        raise ValueError("Shards require a target size in MB or records")
+    limit = shard_mb * MB if shard_mb else None
+    shards = []
+    current = []
+    size = 0
+    for key, files in examples:
+        example_size = sum(record_size(os.path.getsize(f)) for f in files)
+        if current and (
+            (limit is not None and size + example_size > limit) or
+            (shard_records and len(current) >= shard_records)
+        ):
+            shards.append(current)
+            current = []
+            size = 0
+        current.append((key, files))
+        size += example_size
+    if current:
+        shards.append(current)
+    return [
+        {
+            'index': i,
+            'path': os.path.join(output, "{}-{:05d}{}".format(name, i, SHARD_SUFFIXES[format])),
+            'examples': shard
+        }
+        for i, shard in enumerate(shards)
+    ]
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def write_shard(shard, format, extensions, index=False):
+    """
+    Write one shard. Runs in a worker process.
+
+    The shard is written to a temporary file that is renamed when complete,
+    so a shard that exists is always whole.
+    """
+    tmp = shard['path'] + '.tmp'
+    if format == 'protobuf':
+        names = [feature_name(normalize_extension(e)) for e in (extensions or [''])]
+        with RecordWriter(tmp) as writer:
+            for key, files in shard['examples']:
+                writer.write(
+                    features={n: read_file(f) for n, f in zip(names, files)},
+                    metadata={'key': key}
+                )
+    else:
+        with open(tmp, 'wb') as f:
+            for key, files in shard['examples']:
+                for path in files:
+                    write_recordio(f, read_file(path))
+    os.replace(tmp, shard['path'])
+    if index:
+        build_index(shard['path'])
+
+
+def manifest_json(names, prefix):
+    """
+    ``ManifestFile`` manifest listing object ``names`` relative to ``prefix``
+    """
+    if not prefix.endswith('/'):
+        prefix += '/'
+    return [{'prefix': prefix}] + list(names)
+
+
+def write_manifest(path, shards, prefix):
+    """
+    Write a ``ManifestFile`` manifest listing ``shards`` relative to ``prefix``
+    """
+    manifest = manifest_json(
+        [os.path.basename(shard['path']) for shard in shards], prefix=prefix)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+
+def write_shards(
+    input, output, extensions=None, format='recordio', shard_mb=DEFAULT_SHARD_MB, shard_records=0,
+    name='shard', manifest=None, manifest_prefix=None, workers=None, shuffle_seed=None, index=False
+):
+    """
+    Convert the samples under ``input`` into RecordIO shards in ``output``.
+
+    Args:
+        input: input directory
+        output: output directory for shards
+        extensions: extensions of the files of each example, in record order (see ``group_samples``)
+        format: ``recordio`` or ``protobuf``
+        shard_mb: target shard size in MB of input files (0 for no limit)
+        shard_records: target examples per shard (0 for no limit)
+        name: shard file name prefix
+        manifest: manifest path (default ``{output}-manifest.json``)
+        manifest_prefix: prefix of the shards in the manifest, usually the S3 URI
+            the output directory is uploaded to (default the local output directory)
+        workers: number of processes (default the number of CPUs)
+        shuffle_seed: shuffle examples across shards with this seed (``None`` to keep key order)
+        index: write a ``.idx`` offset index next to each shard
+
+    Returns:
+        list of shard dicts with ``path``, ``examples`` and ``bytes``
+    """
+    if format not in SHARD_FORMATS:
+        raise ValueError("Unknown shard format [{}] (expected one of {})".format(
+            format, SHARD_FORMATS))
+    examples = group_samples(input, extensions=extensions)
+    if not examples:
+        raise ValueError("No examples found in [{}]".format(input))
+    if shuffle_seed is not None:
+        random.Random(shuffle_seed).shuffle(examples)
+    output = os.path.abspath(output)
+    os.makedirs(output, exist_ok=True)
+    shards = plan_shards(
+        examples, output=output, name=name, format=format,
+        shard_mb=shard_mb, shard_records=shard_records)
+    for shard in shards:
+        if os.path.exists(shard['path']):
+            os.remove(shard['path'])
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+    print("Writing {} examples to {} shards with {} workers".format(
+        len(examples), len(shards), workers))
+    run_workers(workers, write_shard, shards, format, extensions, index)
+    missing = [shard['path'] for shard in shards if not os.path.exists(shard['path'])]
+    if missing:
+        raise RuntimeError("Failed to write shards: {}".format(missing))
+    manifest = manifest or output + '-manifest.json'
+    if manifest_prefix is None:
+        manifest_prefix = output
+    write_manifest(manifest, shards, prefix=manifest_prefix)
+    print("Wrote manifest [{}] with prefix [{}]".format(manifest, manifest_prefix))
+    return [
+        {
+            'path': shard['path'],
+            'examples': len(shard['examples']),
+            'bytes': os.path.getsize(shard['path'])
+        }
+        for shard in shards
+    ]
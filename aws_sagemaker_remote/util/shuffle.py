@@ -0,0 +1,98 @@
+"""
+Bounded shuffle buffer for streams of records.
+
+Pipe mode ``ShuffleConfig`` only shuffles the order of S3 objects, so records
+inside a large RecordIO shard always arrive in the same order. A shuffle
+buffer holds a bounded number of records (or bytes) and emits a random one
+each time a new record arrives, giving record-level randomness without
+loading whole shards into memory.
+
+Buffered items are held across iterations, so do not shuffle items that
+share a reused buffer (such as the memoryviews of ``iterate_records``).
+"""
+import io
+import random
+try:
+    from torch.utils.data import get_worker_info
+except ImportError:
+    def get_worker_info():
+        return None
+
+DEFAULT_SHUFFLE_BUFFER = 10000
+
+
+def item_size(item):
+    """
+    Approximate size of a record in bytes, used for ``buffer_bytes``
+    """
+    if isinstance(item, (bytes, bytearray)):
+        return len(item)
+    elif isinstance(item, memoryview):
+        return item.nbytes
+    elif isinstance(item, io.BytesIO):
+        return item.getbuffer().nbytes
+    elif isinstance(item, str):
+        return len(item)
+    elif isinstance(item, dict):
+        return sum(item_size(v) for v in item.values())
+    elif isinstance(item, (list, tuple)):
+        return sum(item_size(v) for v in item)
+    elif hasattr(item, 'nbytes'):
+        return int(item.nbytes)
+    elif hasattr(item, 'element_size'):
+        return item.element_size() * item.nelement()
+    else:
+        return 0
+
+
+def epoch_seed(seed, epoch, worker=None):
+    """
+    Seed for ``epoch``, or ``None`` for an unseeded shuffle.
+
+    ``worker`` is mixed into the seed so parallel readers shuffle differently.
+    It defaults to the id of the current DataLoader worker (0 outside workers),
+    which keeps the seed ``seed + epoch`` in the main process.
+    """
+    if seed is None:
+        return None
+    if worker is None:
+        info = get_worker_info()
+        worker = 0 if info is None else info.id
+    return seed + epoch + (worker << 32)
+
+
+def shuffle_iterable(
+    iterable, buffer_size=DEFAULT_SHUFFLE_BUFFER, buffer_bytes=None, seed=None, size=item_size
+):
+    """
+    Shuffle ``iterable`` through a bounded buffer.
+
+    Args:
+        iterable: records to shuffle
+        buffer_size: maximum number of buffered records (``None`` for no limit)
+        buffer_bytes: maximum buffered bytes as measured by ``size`` (``None`` for no limit)
+        seed: random seed (see ``epoch_seed`` for a different order each epoch)
+        size: function returning the size of a record in bytes
+    """
+    if buffer_size is None and buffer_bytes is None:
+        raise ValueError("shuffle_iterable requires buffer_size or buffer_bytes")
+    rng = random.Random(seed)
+    buffer = []
+    used = 0
+    for item in iterable:
+        buffer.append(item)
+        if buffer_bytes is not None:
+            used += size(item)
+        while buffer and (
+            (buffer_size is not None and len(buffer) > buffer_size) or
+            (buffer_bytes is not None and used > buffer_bytes and len(buffer) > 1)
+        ):
+            i = rng.randrange(len(buffer))
+            buffer[i], buffer[-1] = buffer[-1], buffer[i]
+            item = buffer.pop()
+            if buffer_bytes is not None:
+                used -= size(item)
+            yield item
+    rng.shuffle(buffer)
+    for item in buffer:
+        yield item
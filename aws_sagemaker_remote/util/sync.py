@@ -0,0 +1,198 @@
+"""
+Incremental upload of a local file or directory to S3.
+
+The destination prefix is listed once and each local file is compared against
+the existing object. Only new or changed files are uploaded, in parallel.
+
+With ``compare='mtime'`` (the default) no file is read: a file is unchanged
+when its size matches and it was not modified after its object was uploaded.
+With ``compare='md5'`` a file with the same size is compared by its
+ETag-compatible MD5. The ETag of an object encrypted with SSE-KMS or SSE-C is
+not an MD5, so for those objects (detected with ``head_object`` when the ETag
+does not match) the ``mtime`` comparison is used instead.
+"""
+import os
+from boto3.s3.transfer import TransferConfig
+from aws_sagemaker_remote.md5 import calc_etag
+from aws_sagemaker_remote.util.download import TransferStats, MB
+from aws_sagemaker_remote.util.listing import iterate_objects_parallel
+from aws_sagemaker_remote.util.threads import BoundedExecutor
+
+DEFAULT_SYNC_WORKERS = 16
+SYNC_PART_SIZE = 8 * MB
+COMPARE_MODES = ['mtime', 'md5']
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=SYNC_PART_SIZE,
+    multipart_chunksize=SYNC_PART_SIZE,
+    max_concurrency=4
+)
+
+
+def local_files(src):
+    """
+    Yield ``(path, relative key)`` for a file or every file in a directory
+    """
+    if os.path.isfile(src):
+        yield src, os.path.basename(src)
+    else:
+        for root, dirs, files in os.walk(src):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                yield path, os.path.relpath(path, src).replace(os.sep, '/')
+
+
+def etag_part_sizes(size, parts):
+    """
+    Candidate part sizes that split ``size`` bytes into ``parts`` parts, preferring common defaults
+    """
+    candidates = [SYNC_PART_SIZE, 5 * MB, 16 * MB, 32 * MB, 64 * MB, 100 * MB]
+    return [
+        c for c in candidates
+        if -(-size // c) == parts
+    ]
+
+
+def etag_matches(path, size, etag):
+    """
+    Check whether local file ``path`` of ``size`` bytes has S3 ETag ``etag``
+    """
+    if '-' in etag:
+        parts = int(etag.split('-')[1])
+        return any(
+            calc_etag(path, part_size) == etag
+            for part_size in etag_part_sizes(size, parts)
+        )
+    else:
+        return calc_etag(path) == etag
+
+
+def is_encrypted(s3, Bucket, Key):
+    """
+    Check whether an object uses SSE-KMS or SSE-C, whose ETags are not MD5s
+    """
+    head = s3.head_object(Bucket=Bucket, Key=Key)
+    return (
+        head.get('ServerSideEncryption') == 'aws:kms' or
+        bool(head.get('SSECustomerAlgorithm'))
+    )
+
+
+def is_unchanged(path, obj, compare='mtime', s3=None, Bucket=None):
+    """
+    Check whether local file ``path`` matches S3 listing entry ``obj``
+
+    Args:
+        path: local file
+        obj: listing entry with ``Key``, ``Size``, ``ETag`` and ``LastModified`` (or ``None``)
+        compare: ``mtime`` to compare the size and modification time without
+            hashing the file, or ``md5`` to compare the size and ETag
+        s3: S3 client used to check the encryption of objects whose ETag does not match
+        Bucket: bucket of ``obj``
+    """
+    if compare not in COMPARE_MODES:
+        raise ValueError("Unknown compare mode [{}] (expected one of {})".format(
+            compare, COMPARE_MODES))
+    if obj is None:
+        return False
+    stat = os.stat(path)
+    if stat.st_size != obj['Size']:
+        return False
+    older = stat.st_mtime <= obj['LastModified'].timestamp()
+    if compare == 'mtime':
+        return older
+    if etag_matches(path, stat.st_size, obj['ETag'].strip('"')):
+        return True
+    if s3 is not None and is_encrypted(s3, Bucket=Bucket, Key=obj['Key']):
+        return older
+    return False
+
+
+def sync_one(s3, path, Bucket, Key, obj, compare, uploaded, skipped):
+    size = os.path.getsize(path)
+    if is_unchanged(path, obj, compare=compare, s3=s3, Bucket=Bucket):
+        skipped.add(files=1, bytes=size)
+    else:
+        s3.upload_file(path, Bucket, Key, Config=TRANSFER_CONFIG)
+        uploaded.add(files=1, bytes=size)
+
+
+def sync_upload(
+    s3, src, Bucket, Key, workers=DEFAULT_SYNC_WORKERS, compare='mtime', verbose=True
+):
+    """
+    Upload new or changed files from ``src`` to ``s3://Bucket/Key``
+
+    Args:
+        s3: boto3 S3 client
+        src: local file or directory
+        Bucket: destination bucket
+        Key: destination prefix (a directory is uploaded under it, a file to ``Key/basename``)
+        workers: number of concurrent uploads
+        compare: ``mtime`` or ``md5`` (see ``is_unchanged``)
+        verbose: print a summary when finished
+
+    Returns:
+        tuple of TransferStats (uploaded, skipped)
+    """
+    if compare not in COMPARE_MODES:
+        raise ValueError("Unknown compare mode [{}] (expected one of {})".format(
+            compare, COMPARE_MODES))
+    prefix = Key.strip('/')
+    if prefix:
+        prefix += '/'
+    existing = {
+        obj['Key']: obj
+        for obj in iterate_objects_parallel(s3=s3, bucket=Bucket, prefix=prefix)
+    }
+    uploaded = TransferStats('Uploaded')
+    skipped = TransferStats('Skipped')
+    with BoundedExecutor(workers) as executor:
+        for path, rel in local_files(src):
+            key = prefix + rel
+            executor.submit(
+                sync_one,
+                s3=s3,
+                path=path,
+                Bucket=Bucket,
+                Key=key,
+                obj=existing.get(key),
+                compare=compare,
+                uploaded=uploaded,
+                skipped=skipped
+            )
+    uploaded.finish()
+    skipped.finish()
+    if verbose:
+        print("{}, skipped {} unchanged files ({:.1f} MB)".format(
+            uploaded, skipped.files, skipped.bytes / MB))
+    return uploaded, skipped
+
+
+def sync_file(s3, path, Bucket, Key, compare='mtime', verbose=True):
+    """
+    Upload local file ``path`` to exactly ``s3://Bucket/Key`` unless the object is unchanged
+    """
+    response = s3.list_objects_v2(Bucket=Bucket, Prefix=Key, MaxKeys=1)
+    obj = next(
+        (c for c in response.get('Contents', []) if c['Key'] == Key),
+        None
+    )
+    uploaded = TransferStats('Uploaded')
+    skipped = TransferStats('Skipped')
+    sync_one(
+        s3=s3,
+        path=path,
+        Bucket=Bucket,
+        Key=Key,
+        obj=obj,
+        compare=compare,
+        uploaded=uploaded,
+        skipped=skipped
+    )
+    uploaded.finish()
+    skipped.finish()
+    if verbose:
+        print("{}, skipped {} unchanged files ({:.1f} MB)".format(
+            uploaded, skipped.files, skipped.bytes / MB))
+    return uploaded, skipped
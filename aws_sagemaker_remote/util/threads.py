@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BoundedExecutor(object):
+    """
+    Thread pool that blocks ``submit`` once ``max_pending`` tasks are queued or running.
+
+    Keeps memory flat when feeding a pool from a very large generator. The first
+    exception raised by any task is re-raised by the next ``submit`` and when the
+    executor is closed, and remaining queued tasks are cancelled.
+    """
+
+    def __init__(self, workers, max_pending=None):
+        assert workers > 0
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        assert self.max_pending > 0
+        self.executor = ThreadPoolExecutor(workers)
+        self.semaphore = threading.BoundedSemaphore(self.max_pending)
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.error = None
+
+    def _done(self, future):
+        with self.lock:
+            self.pending.discard(future)
+            if (
+                self.error is None and
+                not future.cancelled() and
+                future.exception() is not None
+            ):
+                self.error = future.exception()
+        self.semaphore.release()
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, fn, *args, **kwargs):
+        self.check()
+        self.semaphore.acquire()
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def cancel(self):
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.cancel()
+
+    def shutdown(self, cancel=False):
+        """
+        Wait for running tasks to finish, first cancelling queued tasks if ``cancel``.
+        Does not raise task exceptions (see ``close``).
+        """
+        if cancel:
+            self.cancel()
+        self.executor.shutdown(wait=True)
+
+    def close(self):
+        self.shutdown(cancel=self.error is not None)
+        self.check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.shutdown(cancel=True)
+        else:
+            self.close()
+
+
+_END = object()
+
+
+class PrefetchIterator(object):
+    """
+    Iterate ``iterable`` on a background thread, buffering up to ``depth`` items.
+
+    Exceptions raised by the iterable are re-raised in the consumer. The time the
+    consumer spends waiting for items is recorded in ``stall_time`` so a slow
+    input pipeline shows up next to the training step time.
+
+    Args:
+        iterable: iterable to read in the background
+        depth: maximum number of items buffered ahead of the consumer
+        name: name used in the summary
+        verbose: print a summary when the iterable is exhausted
+    """
+
+    def __init__(self, iterable, depth, name=None, verbose=False):
+        assert depth > 0
+        self.iterable = iterable
+        self.depth = depth
+        self.name = name or 'Prefetch'
+        self.verbose = verbose
+        self.items = queue.Queue(maxsize=depth)
+        self.stop = threading.Event()
+        self.thread = None
+        self.count = 0
+        self.stalls = 0
+        self.stall_time = 0.0
+        self.start_time = None
+        self.elapsed = 0.0
+
+    def put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer(self):
+        try:
+            for item in self.iterable:
+                if not self.put((item, None)):
+                    return
+            self.put((_END, None))
+        except BaseException as e:
+            self.put((_END, e))
+
+    def start(self):
+        if self.thread is None:
+            self.start_time = time.perf_counter()
+            self.thread = threading.Thread(target=self.producer, daemon=True)
+            self.thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.start()
+        if self.stop.is_set():
+            raise StopIteration
+        start = time.perf_counter()
+        if self.items.empty():
+            self.stalls += 1
+        item, error = self.items.get()
+        self.stall_time += time.perf_counter() - start
+        if item is _END:
+            self.close()
+            if self.verbose:
+                print(self)
+            if error is not None:
+                raise error
+            raise StopIteration
+        self.count += 1
+        return item
+
+    def total_time(self):
+        if self.elapsed or self.start_time is None:
+            return self.elapsed
+        return time.perf_counter() - self.start_time
+
+    @property
+    def stall_fraction(self):
+        total = self.total_time()
+        return self.stall_time / total if total > 0 else 0.0
+
+    def close(self):
+        if not self.stop.is_set():
+            self.stop.set()
+            if self.start_time is not None:
+                self.elapsed = time.perf_counter() - self.start_time
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def __str__(self):
+        return "{}: {} items, waited {:.2f}s in {} stalls ({:.1%} of {:.2f}s)".format(
+            self.name, self.count, self.stall_time, self.stalls,
+            self.stall_fraction, self.total_time())
+
+
+def prefetch_iterable(iterable, depth):
+    """
+    Iterate ``iterable`` on a background thread, buffering up to ``depth`` items.
+
+    Exceptions raised by the iterable are re-raised in the consumer.
+    """
+    with PrefetchIterator(iterable, depth) as items:
+        for item in items:
+            yield item
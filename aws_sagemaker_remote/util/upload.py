@@ -4,13 +4,37 @@ import click
 import re
 from sagemaker.s3 import S3Uploader
 import tarfile
-from sagemaker.utils import _tmpdir
-import boto3
 from urllib.parse import urlparse
 
 from aws_sagemaker_remote.util.cli_argument import cli_argument
+from aws_sagemaker_remote.session import s3_client
+from aws_sagemaker_remote.util.sync import sync_upload, sync_file, DEFAULT_SYNC_WORKERS
+from aws_sagemaker_remote.util.multipart import MultipartUploadWriter
+from aws_sagemaker_remote.util.parallel_gzip import ParallelGzipWriter, DEFAULT_COMPRESSION_LEVEL
 
-def upload(src, dst, gz, session: sagemaker.Session, root='.'):
+
+def upload_tar_gz(
+    s3, src, Bucket, Key, root='.', workers=DEFAULT_SYNC_WORKERS, level=DEFAULT_COMPRESSION_LEVEL
+):
+    """
+    Stream directory ``src`` as a tar.gz straight into an S3 multipart upload.
+
+    Tar creation, block-parallel gzip compression and part uploads all
+    overlap and no temporary archive is written to disk.
+    """
+    with MultipartUploadWriter(
+        s3=s3, Bucket=Bucket, Key=Key, workers=workers, verbose=True,
+        ContentType='application/gzip'
+    ) as upload_stream:
+        with ParallelGzipWriter(upload_stream, level=level) as gz_stream:
+            with tarfile.open(fileobj=gz_stream, mode='w|') as arc:
+                arc.add(name=src, arcname=root, recursive=True)
+
+
+def upload(
+    src, dst, gz, session: sagemaker.Session, root='.',
+    sync=False, compare='mtime', workers=DEFAULT_SYNC_WORKERS, gz_level=DEFAULT_COMPRESSION_LEVEL
+):
     dst = cli_argument(dst, session=session)
     if not os.path.exists(src):
         raise click.UsageError("Source must exist")
@@ -29,21 +53,34 @@ def upload(src, dst, gz, session: sagemaker.Session, root='.'):
         if gz:
             raise click.UsageError(
                 "Option gz is only valid for source directories")
-        s3 = session.boto_session.client('s3')
-        s3.upload_file(src, bucket, key)
+        s3 = s3_client(session)
+        if sync:
+            sync_file(s3=s3, path=src, Bucket=bucket, Key=key, compare=compare)
+        else:
+            s3.upload_file(src, bucket, key)
     elif os.path.isdir(src):
         if gz:
             if not re.match(".*\\.(tar\\.gz||tgz)$", dst, re.IGNORECASE):
                 raise click.UsageError(
                     "Destination should end in .tar.gz or tgz")
-            s3_dst = os.path.dirname(dst)
-            file_name = os.path.basename(dst)
-            with _tmpdir() as tmp:
-                p = os.path.join(tmp, file_name)
-                with tarfile.open(p, 'w:gz') as arc:
-                    arc.add(name=src, arcname=root, recursive=True)
-                s3 = session.boto_session.client('s3')
-                s3.upload_file(p, bucket, key)
+            upload_tar_gz(
+                s3=s3_client(session, workers=workers),
+                src=src,
+                Bucket=bucket,
+                Key=key,
+                root=root,
+                workers=workers,
+                level=gz_level
+            )
+        elif sync:
+            sync_upload(
+                s3=s3_client(session, workers=workers),
+                src=src,
+                Bucket=bucket,
+                Key=key,
+                workers=workers,
+                compare=compare
+            )
         else:
             S3Uploader.upload(
                 local_path=src,
@@ -0,0 +1,198 @@
+"""
+In-memory S3 client implementing the subset of the boto3 API used by the S3 utilities
+"""
+import base64
+import bisect
+import hashlib
+import io
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl
+
+
+class FakeS3Error(Exception):
+    pass
+
+
+class FakeBody(io.BytesIO):
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class FakeObject(object):
+    def __init__(self, data, **headers):
+        self.data = data
+        self.headers = headers
+        self.ETag = '"{}"'.format(hashlib.md5(data).hexdigest())
+        self.LastModified = time.time()
+
+
+class FakeS3(object):
+    """
+    Objects are stored in ``objects[(Bucket, Key)]``. ``calls`` counts requests per operation.
+    Set ``fail[(operation, Key)] = exception`` to make a request fail.
+    Every request takes ``delay`` seconds.
+    """
+
+    def __init__(self, objects=None, Bucket='bucket', delay=0):
+        self.delay = delay
+        self.objects = {}
+        self.uploads = {}
+        self.fail = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        for key, data in (objects or {}).items():
+            self.objects[(Bucket, key)] = FakeObject(data)
+
+    def call(self, operation, Key=None):
+        with self.lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        time.sleep(self.delay)
+        error = self.fail.get((operation, Key))
+        if error is not None:
+            raise error
+
+    def keys(self, Bucket='bucket'):
+        return sorted(k for b, k in self.objects if b == Bucket)
+
+    def data(self, Key, Bucket='bucket'):
+        return self.objects[(Bucket, Key)].data
+
+    def get(self, Bucket, Key):
+        try:
+            return self.objects[(Bucket, Key)]
+        except KeyError:
+            raise FakeS3Error("NoSuchKey: {}".format(Key))
+
+    def list_objects_v2(
+        self, Bucket, Prefix='', MaxKeys=1000, Delimiter=None, StartAfter=None,
+        ContinuationToken=None
+    ):
+        self.call('list_objects_v2', Prefix)
+        keys = self.keys(Bucket)
+        start = ContinuationToken or StartAfter
+        i = bisect.bisect_right(keys, start) if start else bisect.bisect_left(keys, Prefix)
+        contents = []
+        commons = []
+        while i < len(keys) and keys[i].startswith(Prefix):
+            if len(contents) + len(commons) >= MaxKeys:
+                break
+            key = keys[i]
+            if Delimiter and Delimiter in key[len(Prefix):]:
+                rest = key[len(Prefix):]
+                common = Prefix + rest[:rest.index(Delimiter) + 1]
+                commons.append({'Prefix': common})
+                while i < len(keys) and keys[i].startswith(common):
+                    i += 1
+                last = keys[i - 1]
+                continue
+            obj = self.objects[(Bucket, key)]
+            contents.append({
+                'Key': key, 'Size': len(obj.data), 'ETag': obj.ETag,
+                'LastModified': datetime.fromtimestamp(obj.LastModified, timezone.utc)
+            })
+            last = key
+            i += 1
+        truncated = i < len(keys) and keys[i].startswith(Prefix)
+        response = {'IsTruncated': truncated, 'KeyCount': len(contents) + len(commons)}
+        if contents:
+            response['Contents'] = contents
+        if commons:
+            response['CommonPrefixes'] = commons
+        if truncated:
+            response['NextContinuationToken'] = last
+        return response
+
+    def head_object(self, Bucket, Key):
+        self.call('head_object', Key)
+        obj = self.get(Bucket, Key)
+        headers = {k: v for k, v in obj.headers.items() if k != 'Tagging'}
+        return dict(headers, ContentLength=len(obj.data), ETag=obj.ETag)
+
+    def get_object_tagging(self, Bucket, Key):
+        self.call('get_object_tagging', Key)
+        tags = parse_qsl(self.get(Bucket, Key).headers.get('Tagging', ''))
+        return {'TagSet': [{'Key': k, 'Value': v} for k, v in tags]}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.call('get_object', Key)
+        data = self.get(Bucket, Key).data
+        if Range:
+            start, end = Range[len('bytes='):].split('-')
+            data = data[int(start):int(end) + 1]
+        return {'Body': FakeBody(data), 'ContentLength': len(data)}
+
+    def put_object(self, Bucket, Key, Body, **headers):
+        self.call('put_object', Key)
+        if hasattr(Body, 'read'):
+            Body = Body.read()
+        self.objects[(Bucket, Key)] = FakeObject(bytes(Body), **headers)
+        return {}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        self.call('upload_file', Key)
+        with open(Filename, 'rb') as f:
+            self.objects[(Bucket, Key)] = FakeObject(f.read(), **(ExtraArgs or {}))
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective='COPY', **headers):
+        self.call('copy_object', Key)
+        source = self.get(CopySource['Bucket'], CopySource['Key'])
+        if MetadataDirective == 'COPY':
+            headers = dict(source.headers)
+        self.objects[(Bucket, Key)] = FakeObject(source.data, **headers)
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key, **headers):
+        self.call('create_multipart_upload', Key)
+        upload_id = 'upload-{}'.format(next(self.ids))
+        with self.lock:
+            self.uploads[upload_id] = {'Bucket': Bucket, 'Key': Key, 'parts': {}, 'headers': headers}
+        return {'UploadId': upload_id}
+
+    def get_upload(self, UploadId):
+        try:
+            return self.uploads[UploadId]
+        except KeyError:
+            raise FakeS3Error("NoSuchUpload: {}".format(UploadId))
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, ContentMD5=None):
+        self.call('upload_part', Key)
+        if hasattr(Body, 'read'):
+            Body = Body.read()
+        data = bytes(Body)
+        if ContentMD5 is not None and ContentMD5 != base64.b64encode(hashlib.md5(data).digest()).decode():
+            raise FakeS3Error("BadDigest")
+        self.get_upload(UploadId)['parts'][PartNumber] = data
+        return {'ETag': '"{}"'.format(hashlib.md5(data).hexdigest())}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange=None):
+        self.call('upload_part_copy', Key)
+        data = self.get(CopySource['Bucket'], CopySource['Key']).data
+        if CopySourceRange:
+            start, end = CopySourceRange[len('bytes='):].split('-')
+            data = data[int(start):int(end) + 1]
+        self.get_upload(UploadId)['parts'][PartNumber] = data
+        return {'CopyPartResult': {'ETag': '"{}"'.format(hashlib.md5(data).hexdigest())}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.call('complete_multipart_upload', Key)
+        upload = self.get_upload(UploadId)
+        numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        if numbers != sorted(numbers) or set(numbers) != set(upload['parts']):
+            raise FakeS3Error("InvalidPart: {}".format(numbers))
+        data = b''.join(upload['parts'][n] for n in numbers)
+        self.objects[(Bucket, Key)] = FakeObject(data, **upload['headers'])
+        del self.uploads[UploadId]
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.call('abort_multipart_upload', Key)
+        self.uploads.pop(UploadId, None)
+        return {}
@@ -0,0 +1,49 @@
+import io
+import threading
+import pytest
+from fake_s3 import FakeS3, FakeS3Error
+
+pytest.importorskip('boto3')
+pytest.importorskip('sagemaker')
+from aws_sagemaker_remote.util.concat import concat_lines  # noqa: E402
+from aws_sagemaker_remote.util.recordio import iterate_records  # noqa: E402
+
+
+def objects(count, size=100):
+    return {'k{}'.format(i): bytes([i]) * size for i in range(count)}
+
+
+def lines(count):
+    return [{'file-ref': 's3://bucket/k{}'.format(i)} for i in range(count)]
+
+
+@pytest.mark.parametrize('format', ['raw', 'recordio'])
+def test_concat_order(format):
+    data = objects(50)
+    s3 = FakeS3(data, delay=0.001)
+    fo = io.BytesIO()
+    stats = concat_lines(fo, s3, lines(50), workers=4, max_buffer=250, format=format)
+    assert stats.files == 50
+    expected = [data['k{}'.format(i)] for i in range(50)]
+    if format == 'raw':
+        assert fo.getvalue() == b''.join(expected)
+    else:
+        fo.seek(0)
+        assert [bytes(r) for r in iterate_records(fo)] == expected
+
+
+def test_concat_failure():
+    s3 = FakeS3(objects(50), delay=0.001)
+    s3.fail[('get_object', 'k3')] = FakeS3Error('GET failed')
+    errors = []
+
+    def run():
+        try:
+            concat_lines(io.BytesIO(), s3, lines(50), workers=4, max_buffer=250)
+        except Exception as e:
+            errors.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "concat_lines deadlocked after a failed fetch"
+    assert len(errors) == 1 and isinstance(errors[0], FakeS3Error)
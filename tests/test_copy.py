@@ -0,0 +1,55 @@
+from aws_sagemaker_remote.util.copy import copy_objects
+from fake_s3 import FakeS3, FakeObject, FakeS3Error
+import pytest
+
+HEADERS = {
+    'ContentType': 'audio/wav',
+    'CacheControl': 'max-age=60',
+    'ContentEncoding': 'gzip',
+    'ContentDisposition': 'attachment',
+    'Metadata': {'source': 'test'},
+    'ServerSideEncryption': 'aws:kms',
+    'SSEKMSKeyId': 'key-id',
+    'StorageClass': 'STANDARD_IA',
+    'Tagging': 'team=audio&stage=raw'
+}
+
+
+def copies(s3, keys):
+    return [
+        {
+            'SrcBucket': 'bucket', 'SrcKey': key, 'Bucket': 'bucket',
+            'Key': 'copy/' + key, 'Size': len(s3.data(key))
+        }
+        for key in keys
+    ]
+
+
+@pytest.mark.parametrize('threshold', [1000, 10])
+def test_copy_headers(threshold):
+    s3 = FakeS3()
+    s3.objects[('bucket', 'a')] = FakeObject(bytes(range(100)), **HEADERS)
+    copy_objects(s3, copies(s3, ['a']), workers=4, part_size=7, threshold=threshold, verbose=False)
+    copied = s3.objects[('bucket', 'copy/a')]
+    assert copied.data == bytes(range(100))
+    assert copied.headers == HEADERS
+    assert s3.calls.get('upload_part_copy', 0) == (15 if threshold < 100 else 0)
+
+
+def test_abort_on_failure():
+    # Parts of the other objects are still queued when k3 fails and get cancelled
+    s3 = FakeS3({'k{}'.format(i): bytes(100) for i in range(8)}, delay=0.01)
+    s3.fail[('upload_part_copy', 'copy/k3')] = FakeS3Error('part failed')
+    with pytest.raises(FakeS3Error):
+        copy_objects(s3, copies(s3, s3.keys()), workers=4, part_size=10, threshold=10, verbose=False)
+    assert s3.uploads == {}
+    assert s3.calls['abort_multipart_upload'] >= 1
+
+
+def test_abort_on_complete_failure():
+    s3 = FakeS3({'a': bytes(100)})
+    s3.fail[('complete_multipart_upload', 'copy/a')] = FakeS3Error('complete failed')
+    with pytest.raises(FakeS3Error):
+        copy_objects(s3, copies(s3, ['a']), workers=2, part_size=10, threshold=10, verbose=False)
+    assert s3.uploads == {}
+    assert ('bucket', 'copy/a') not in s3.objects
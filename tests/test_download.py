@@ -0,0 +1,82 @@
+import os
+import pytest
+from fake_s3 import FakeS3, FakeS3Error
+
+pytest.importorskip('boto3')
+pytest.importorskip('sagemaker')
+from aws_sagemaker_remote import s3 as s3_module  # noqa: E402
+from aws_sagemaker_remote.util.download import download_objects  # noqa: E402
+
+DATA = bytes(range(256)) * 40
+
+
+class FailingRangeS3(FakeS3):
+    """
+    Fails the ranged GET starting at ``fail_start``
+    """
+
+    def __init__(self, fail_start, **kwargs):
+        super(FailingRangeS3, self).__init__(**kwargs)
+        self.fail_start = fail_start
+
+    def get_object(self, Bucket, Key, Range=None):
+        if Range and Range.startswith('bytes={}-'.format(self.fail_start)):
+            self.call('get_object', Key)
+            raise FakeS3Error("SlowDown")
+        return super(FailingRangeS3, self).get_object(Bucket, Key, Range=Range)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('part_size', [0, 1000, len(DATA), 1 << 20])
+def test_download_file(tmp_path, part_size):
+    s3 = FakeS3({'data/file.bin': DATA})
+    filename = str(tmp_path / 'out' / 'file.bin')
+    stats = s3_module.download_file(
+        Filename=filename, s3=s3, Bucket='bucket', Key='data/file.bin',
+        workers=4, part_size=part_size)
+    assert read(filename) == DATA
+    assert stats.files == 1
+    assert stats.bytes == len(DATA)
+    ranged = part_size and len(DATA) > part_size
+    assert s3.calls['get_object'] == (-(-len(DATA) // part_size) if ranged else 1)
+    assert s3.calls['head_object'] == 1
+    assert os.listdir(str(tmp_path / 'out')) == ['file.bin']
+
+
+def test_download_folder(tmp_path, monkeypatch):
+    s3 = FakeS3({
+        'data/a.bin': DATA[:10],
+        'data/sub/b.bin': DATA,
+        'data/sub/deeper/c.bin': DATA[:3000],
+        'data/empty/': b'',
+        'data.bin': b'sibling file',
+        'datasets/d.bin': b'sibling folder',
+    })
+    monkeypatch.setattr(s3_module, 's3_client', lambda session, workers=None: s3)
+    dest = str(tmp_path / 'dest')
+    stats = s3_module.download_folder(
+        Filename=dest, Bucket='bucket', Key='data', session=None, part_size=1000)
+    files = sorted(
+        os.path.relpath(os.path.join(root, name), dest).replace(os.sep, '/')
+        for root, dirs, names in os.walk(dest) for name in names)
+    assert files == ['a.bin', 'sub/b.bin', 'sub/deeper/c.bin']
+    assert read(os.path.join(dest, 'sub', 'b.bin')) == DATA
+    assert read(os.path.join(dest, 'sub', 'deeper', 'c.bin')) == DATA[:3000]
+    assert stats.files == 3
+
+
+def test_download_failed_range(tmp_path):
+    s3 = FailingRangeS3(fail_start=3000, objects={'big.bin': DATA, 'small.bin': DATA[:10]})
+    objects = [
+        {'Bucket': 'bucket', 'Key': 'small.bin', 'Filename': str(tmp_path / 'small.bin')},
+        {'Bucket': 'bucket', 'Key': 'big.bin', 'Filename': str(tmp_path / 'big.bin')},
+    ]
+    with pytest.raises(FakeS3Error):
+        download_objects(s3, objects, workers=2, part_size=1000, verbose=False)
+    # Finished downloads are kept and partial files are removed
+    assert sorted(os.listdir(str(tmp_path))) == ['small.bin']
+    assert read(str(tmp_path / 'small.bin')) == DATA[:10]
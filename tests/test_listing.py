@@ -0,0 +1,42 @@
+from aws_sagemaker_remote.util.listing import iterate_objects_parallel, split_points
+from fake_s3 import FakeS3
+import pytest
+import time
+
+
+def list_keys(s3, prefix, workers=8, **kwargs):
+    return [obj['Key'] for obj in iterate_objects_parallel(
+        s3=s3, bucket='bucket', prefix=prefix, workers=workers, MaxKeys=10, **kwargs)]
+
+
+@pytest.mark.parametrize('delimiter', ['/', None])
+def test_mixed_folders_and_files(delimiter):
+    # Folders sort before and between the files, so the first pages only hold common prefixes
+    keys = ['data/a-folder-{:02d}/{:02d}'.format(i, j) for i in range(12) for j in range(i)]
+    keys += ['data/file-{:02d}'.format(i) for i in range(25)]
+    keys += ['data/folder-{}/{:02d}'.format(i, j) for i in range(4) for j in range(i * 7)]
+    keys += ['data/z-file', 'other/file']
+    s3 = FakeS3({key: b'x' for key in keys})
+    listed = list_keys(s3, 'data/', delimiter=delimiter)
+    assert len(listed) == len(keys) - 1
+    assert sorted(listed) == sorted(keys[:-1])
+
+
+def test_numeric_keys():
+    keys = ['part-{:05d}.rec'.format(i) for i in range(2000)]
+    s3 = FakeS3({'data/' + key: b'x' for key in keys}, delay=0.01)
+    start = time.time()
+    listed = list_keys(s3, 'data/', workers=16)
+    elapsed = time.time() - start
+    assert sorted(listed) == ['data/' + key for key in keys]
+    # All keys share the first character, so paging them serially would take 200 * 10ms
+    assert elapsed < 1
+
+
+def test_split_points():
+    points = split_points('data/part-00999', 'data/', 'data/part-02')
+    assert points == ['data/part-01']
+    points = split_points('data/part-00999', 'data/')
+    assert points == sorted(points)
+    assert 'data/part-01' in points and 'data/part-1' in points
+    assert all(point > 'data/part-00999' for point in points)
@@ -1,4 +1,6 @@
-from aws_sagemaker_remote.mpworkers import run_workers
+from aws_sagemaker_remote.mpworkers import run_workers, imap_workers, resolve_backend, WorkerError
+import asyncio
+import pytest
 import time
 
 
@@ -7,11 +9,124 @@ def worker(i):
     return i
 
 
+def square(i, offset=0):
+    return i * i + offset
+
+
+def fail_on_seven(i):
+    if i % 10 == 7:
+        raise ValueError("bad datum {}".format(i))
+    return i
+
+
+def sleep_reverse(i):
+    time.sleep(0.05 * (4 - i))
+    return i
+
+
+async def async_square(i, offset=0):
+    await asyncio.sleep(0.001)
+    if i % 10 == 7 and offset < 0:
+        raise ValueError("bad datum {}".format(i))
+    return i * i + offset
+
+
+async def async_sleep(i):
+    await asyncio.sleep(0.2)
+    return i
+
+
 def test_multiprocessing():
     run_workers(
         8, worker, range(1000)
     )
 
 
+@pytest.mark.parametrize('workers', [1, 4])
+@pytest.mark.parametrize('chunksize', [1, 7])
+def test_results(workers, chunksize):
+    results = run_workers(workers, square, range(100), 1, chunksize=chunksize, return_results=True)
+    assert results == [i * i + 1 for i in range(100)]
+    results = run_workers(
+        workers, square, [(i, 2) for i in range(100)], expand=True,
+        chunksize=chunksize, queue_size=3, return_results=True)
+    assert results == [i * i + 2 for i in range(100)]
+
+
+def test_unordered():
+    results = list(imap_workers(5, sleep_reverse, range(5), ordered=False))
+    assert sorted(results) == list(range(5))
+    assert results != list(range(5))
+    results = run_workers(4, square, range(100), ordered=False, chunksize=3, return_results=True)
+    assert sorted(results) == [i * i for i in range(100)]
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_errors(workers):
+    with pytest.raises(ValueError):
+        run_workers(workers, fail_on_seven, range(100), chunksize=4)
+    results = run_workers(workers, fail_on_seven, range(30), errors='collect', chunksize=4, return_results=True)
+    errors = [r for r in results if isinstance(r, WorkerError)]
+    assert [e.index for e in errors] == [7, 17, 27]
+    assert [e.datum for e in errors] == [7, 17, 27]
+    assert all(isinstance(e.exception, ValueError) for e in errors)
+    assert [r for r in results if not isinstance(r, WorkerError)] == [
+        i for i in range(30) if i % 10 != 7]
+
+
+@pytest.mark.parametrize('backend', ['thread', 'auto'])
+def test_thread_backend(backend):
+    results = run_workers(4, square, range(100), 1, chunksize=3, queue_size=2, backend=backend, return_results=True)
+    assert results == [i * i + 1 for i in range(100)]
+    results = list(imap_workers(5, sleep_reverse, range(5), ordered=False, backend='thread'))
+    assert sorted(results) == list(range(5))
+    assert results != list(range(5))
+    with pytest.raises(ValueError):
+        run_workers(4, fail_on_seven, range(100), backend='thread')
+    results = run_workers(4, fail_on_seven, range(30), errors='collect', backend='thread', return_results=True)
+    assert [r.index for r in results if isinstance(r, WorkerError)] == [7, 17, 27]
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+@pytest.mark.parametrize('ordered', [True, False])
+def test_asyncio_backend(workers, ordered):
+    results = run_workers(
+        workers, async_square, range(100), 1, chunksize=3, ordered=ordered, backend='auto', return_results=True)
+    if not ordered:
+        results = sorted(results)
+    assert results == [i * i + 1 for i in range(100)]
+    with pytest.raises(ValueError):
+        run_workers(workers, async_square, range(100), -1, backend='asyncio')
+    results = run_workers(
+        workers, async_square, [(i, -1) for i in range(30)], expand=True,
+        errors='collect', ordered=ordered, backend='asyncio', return_results=True)
+    assert sorted(r.index for r in results if isinstance(r, WorkerError)) == [7, 17, 27]
+
+
+def test_asyncio_concurrency():
+    start = time.time()
+    results = run_workers(1000, async_sleep, range(2000), backend='asyncio', return_results=True)
+    assert results == list(range(2000))
+    assert time.time() - start < 2
+
+
+def test_resolve_backend():
+    assert resolve_backend('auto', async_square) == 'asyncio'
+    assert resolve_backend('auto', square) == 'process'
+    assert resolve_backend('thread', square) == 'thread'
+    with pytest.raises(ValueError):
+        resolve_backend('asyncio', square)
+    with pytest.raises(ValueError):
+        resolve_backend('process', async_square)
+    with pytest.raises(ValueError):
+        resolve_backend('fibers', square)
+
+
+def test_discard_results():
+    assert run_workers(4, square, range(100), backend='thread') is None
+    results = run_workers(1, fail_on_seven, range(30), errors='collect', return_results=True)
+    assert len(results) == 30
+
+
 if __name__ == '__main__':
     test_multiprocessing()
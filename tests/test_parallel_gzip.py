@@ -0,0 +1,58 @@
+import gzip
+import io
+import os
+import tarfile
+import pytest
+from aws_sagemaker_remote.util.download import MB
+from aws_sagemaker_remote.util.multipart import MultipartUploadWriter
+from aws_sagemaker_remote.util.parallel_gzip import ParallelGzipWriter
+from fake_s3 import FakeS3, FakeS3Error
+
+
+@pytest.mark.parametrize('size', [0, 1000, 100000])
+def test_gzip_members(size):
+    data = os.urandom(size // 2) + bytes(size - size // 2)
+    out = io.BytesIO()
+    with ParallelGzipWriter(out, block_size=4096, workers=4, max_pending=3) as gz:
+        for i in range(0, size, 777):
+            gz.write(data[i:i + 777])
+    assert gzip.decompress(out.getvalue()) == data
+    assert gz.bytes_in == size and gz.bytes_out == len(out.getvalue())
+
+
+def test_gzip_tarfile(tmpdir):
+    for i in range(5):
+        with open(str(tmpdir.join('file{}.bin'.format(i))), 'wb') as f:
+            f.write(os.urandom(3000) * (i + 1))
+    out = io.BytesIO()
+    with ParallelGzipWriter(out, block_size=2048, workers=3) as gz:
+        with tarfile.open(fileobj=gz, mode='w|') as arc:
+            arc.add(name=str(tmpdir), arcname='data', recursive=True)
+    out.seek(0)
+    with tarfile.open(fileobj=out, mode='r:gz') as arc:
+        names = sorted(m.name for m in arc.getmembers() if m.isfile())
+        assert names == ['data/file{}.bin'.format(i) for i in range(5)]
+        with open(str(tmpdir.join('file3.bin')), 'rb') as f:
+            assert arc.extractfile('data/file3.bin').read() == f.read()
+
+
+def test_multipart_upload():
+    s3 = FakeS3()
+    data = os.urandom(MB) * 12
+    with MultipartUploadWriter(s3, 'bucket', 'out.bin', part_size=5 * MB, workers=2) as f:
+        for i in range(0, len(data), MB):
+            f.write(data[i:i + MB])
+    assert s3.data('out.bin') == data
+    assert s3.calls['upload_part'] == 3
+
+
+def test_multipart_abort():
+    s3 = FakeS3()
+    s3.fail[('upload_part', 'out.bin')] = FakeS3Error('part failed')
+    with pytest.raises(FakeS3Error):
+        with MultipartUploadWriter(s3, 'bucket', 'out.bin', part_size=5 * MB, workers=2) as f:
+            for i in range(20):
+                f.write(bytes(MB))
+    assert s3.uploads == {}
+    assert s3.calls['abort_multipart_upload'] == 1
+    assert 'out.bin' not in s3.keys()
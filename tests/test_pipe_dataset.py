@@ -0,0 +1,52 @@
+import multiprocessing
+import pytest
+from test_recordio import encode
+
+pytest.importorskip('numpy')
+pytest.importorskip('sagemaker')
+from aws_sagemaker_remote.util.pipe_dataset import PipeDataset  # noqa: E402
+
+
+def write_pipes(tmp_path, pipes, epochs):
+    paths = {}
+    for pipe in range(pipes):
+        path = str(tmp_path / 'train_repeat_{}'.format(pipe))
+        for epoch in range(epochs):
+            with open("{}_{}".format(path, epoch), 'wb') as f:
+                f.write(encode([
+                    "{}-{}-{}".format(pipe, epoch, i).encode() for i in range(5)]))
+        paths['repeat_{}'.format(pipe)] = path
+    return paths
+
+
+def expected(pipes, epoch):
+    return ["{}-{}-{}".format(pipe, epoch, i).encode()
+            for pipe in range(pipes) for i in range(5)]
+
+
+def collect(dataset, queue):
+    queue.put(list(dataset))
+
+
+def test_pipe_dataset_epochs(tmp_path):
+    dataset = PipeDataset(write_pipes(tmp_path, 2, 3))
+    assert [list(dataset) for _ in range(3)] == [expected(2, e) for e in range(3)]
+
+
+def test_pipe_dataset_set_epoch(tmp_path):
+    dataset = PipeDataset(write_pipes(tmp_path, 2, 3))
+    dataset.set_epoch(1)
+    assert list(dataset) == expected(2, 1)
+    assert list(dataset) == expected(2, 2)
+
+
+def test_pipe_dataset_fresh_workers(tmp_path):
+    # Like non-persistent DataLoader workers, every epoch reads a new copy in a new process
+    dataset = PipeDataset(write_pipes(tmp_path, 2, 3))
+    queue = multiprocessing.Queue()
+    for epoch in range(3):
+        worker = multiprocessing.Process(target=collect, args=(dataset, queue))
+        worker.start()
+        assert queue.get(timeout=30) == expected(2, epoch)
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
@@ -0,0 +1,52 @@
+import os
+import stat
+import pytest
+
+pytest.importorskip('boto3')
+from aws_sagemaker_remote.util.pipe_emulator import PipeEmulator  # noqa: E402
+from aws_sagemaker_remote.util.recordio import iterate_records  # noqa: E402
+
+FILES = {'a.bin': b'first' * 100, 'b.bin': b'second' * 1000, 'sub/c.bin': b'third'}
+
+
+def write_files(directory):
+    for name, data in FILES.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return str(directory)
+
+
+def read_fifo(path):
+    assert stat.S_ISFIFO(os.stat(path).st_mode)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_pipe_emulator_epochs(tmp_path):
+    data = write_files(tmp_path / 'data')
+    emulator = PipeEmulator(directory=str(tmp_path / 'pipes'), epochs=2)
+    path = emulator.add_channel('train', data)
+    assert path == str(tmp_path / 'pipes' / 'train')
+    expected = b''.join(FILES[k] for k in sorted(FILES))
+    with emulator:
+        assert read_fifo(path + '_0') == expected
+        assert read_fifo(path + '_1') == expected
+        emulator.processes[0].join(timeout=30)
+        assert emulator.processes[0].exitcode == 0
+        assert not os.path.exists(path + '_2')
+    assert os.listdir(str(tmp_path / 'pipes')) == []
+
+
+def test_pipe_emulator_recordio(tmp_path):
+    data = write_files(tmp_path / 'data')
+    emulator = PipeEmulator(epochs=3)
+    train = emulator.add_channel('train', data, record_wrapping='RecordIO', shuffle_seed=1)
+    valid = emulator.add_channel('valid', os.path.join(data, 'a.bin'))
+    with emulator:
+        assert read_fifo(valid + '_0') == FILES['a.bin']
+        for epoch in range(3):
+            with open("{}_{}".format(train, epoch), 'rb') as f:
+                records = [bytes(r) for r in iterate_records(f)]
+            assert sorted(records) == sorted(FILES.values())
+    assert not os.path.exists(emulator.directory)
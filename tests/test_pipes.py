@@ -0,0 +1,32 @@
+import pytest
+from test_recordio import encode
+
+pytest.importorskip('numpy')
+pytest.importorskip('sagemaker')
+from aws_sagemaker_remote.util.pipes import FilePipe, RawPipeIterator, read_examples  # noqa: E402
+
+RECORDS = [bytes([i % 256]) * (i % 17 + 1) for i in range(300)]
+
+
+def write_epochs(path, epochs, records=RECORDS):
+    for epoch in range(epochs):
+        with open("{}_{}".format(path, epoch), 'wb') as f:
+            f.write(encode(records))
+
+
+def test_read_examples(tmp_path):
+    path = str(tmp_path / 'train')
+    write_epochs(path, 1)
+    examples = read_examples(FilePipe(path), buffer_size=64)
+    assert [bytes(example) for example in examples] == RECORDS
+    assert all(isinstance(example, memoryview) for example in read_examples(FilePipe(path)))
+
+
+@pytest.mark.parametrize('prefetch', [0, 3])
+def test_raw_pipe_iterator(tmp_path, prefetch):
+    path = str(tmp_path / 'train')
+    write_epochs(path, 2)
+    iterator = RawPipeIterator(path, size=3, epochs=2, prefetch=prefetch)
+    chunks = list(iterator)
+    assert len(chunks) == 200
+    assert [c.getvalue() for chunk in chunks for c in chunk] == RECORDS * 2
@@ -0,0 +1,157 @@
+import io
+import struct
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('sagemaker')
+from sagemaker.amazon.record_pb2 import Record, Int32Tensor  # noqa: E402
+from sagemaker.amazon.common import _write_recordio, read_recordio  # noqa: E402
+from aws_sagemaker_remote.util.protobuf import (  # noqa: E402
+    encode_binary, encode_varints, encode_feature, encode_record, write_record,
+    write_feature_tensor, length_delimited, RecordWriter, LARGE_TENSOR, decode_strings_batch
+)
+from aws_sagemaker_remote.util.pipes import decode_strings_numpy, decode_strings_torch  # noqa: E402
+
+INT32 = np.array([0, 1, -1, 127, 128, 300, 16383, 16384, -300, 2 ** 21 - 1, 2 ** 21,
+                  2 ** 28, 2 ** 31 - 1, -2 ** 31], dtype=np.int32)
+
+
+def struct_encode_binary(data):
+    data = bytes(data) + b'\x00' * ((4 - len(data) % 4) % 4)
+    return np.array(struct.unpack('i' * (len(data) // 4), data), dtype=np.int32)
+
+
+def reference_record(features, metadata=None):
+    """
+    Serialize with ``write_feature_tensor`` only
+    """
+    record = Record()
+    for k, v in features.items():
+        write_feature_tensor(record, v, k)
+    if metadata:
+        record.metadata = metadata
+    return record
+
+
+def parse(data):
+    record = Record()
+    record.ParseFromString(bytes(data))
+    return record
+
+
+@pytest.mark.parametrize('length', range(10))
+def test_encode_binary(length):
+    data = bytearray(range(1, length + 1))
+    encoded = encode_binary(data)
+    np.testing.assert_array_equal(encoded, struct_encode_binary(data))
+    assert encoded.dtype == np.int32
+    # The result is a writable copy
+    encoded[...] = 0
+    assert data == bytearray(range(1, length + 1))
+
+
+@pytest.mark.parametrize('values', [
+    INT32, INT32[:4], np.arange(-5000, 5000, 7, dtype=np.int32), np.zeros(0, dtype=np.int32)
+])
+def test_encode_varints(values):
+    tensor = Int32Tensor()
+    tensor.values.extend(values.tolist())
+    data = encode_varints(values)
+    # Packed values are field 1 of the tensor; empty packed fields are omitted
+    expected = length_delimited(1, len(data)) + data if data else b''
+    assert tensor.SerializeToString() == expected
+
+
+@pytest.mark.parametrize('vector', [
+    INT32, np.linspace(-1, 1, 9, dtype=np.float32), np.array([np.pi, 1e300]),
+    np.zeros(0, dtype=np.float32), np.arange(3000, dtype=np.int32) - 1500
+])
+def test_encode_feature(vector):
+    data = b''.join(encode_feature('key', vector))
+    assert data == reference_record({'key': vector}).SerializeToString()
+
+
+def features(i):
+    return {
+        'small': INT32 + i,
+        'large': np.arange(LARGE_TENSOR * 2, dtype=np.float32) * i,
+        'large_ids': np.arange(-LARGE_TENSOR, LARGE_TENSOR, dtype=np.int32) * i,
+        'audio': bytes(range(i % 7)) * 1000,
+        'text': 'record {}'.format(i),
+    }
+
+
+def test_encode_record():
+    record = Record()
+    for i in range(5):
+        metadata = '{{"i": {}}}'.format(i)
+        data = encode_record(record, features=features(i), metadata=metadata)
+        assert parse(data) == reference_record(features(i), metadata=metadata)
+
+
+@pytest.mark.parametrize('buffer_size', [1, 1000, 1 << 20])
+def test_record_writer(buffer_size):
+    expected = io.BytesIO()
+    for i in range(10):
+        _write_recordio(expected, reference_record(features(i)).SerializeToString())
+    f = io.BytesIO()
+    with RecordWriter(f, buffer_size=buffer_size) as writer:
+        for i in range(10):
+            writer.write(features=features(i))
+    single = io.BytesIO()
+    for i in range(10):
+        write_record(single, features=features(i))
+    assert writer.records == 10
+    assert writer.bytes == len(f.getvalue())
+    for stream in [f, single]:
+        stream.seek(0)
+        expected.seek(0)
+        records = [parse(r) for r in read_recordio(stream)]
+        assert records == [parse(r) for r in read_recordio(expected)]
+
+
+STRINGS = ['', 'a', 'hello', 'h\u00e9llo w\u00f6rld', 'x' * 9]
+
+
+def string_batch(strings=STRINGS):
+    """
+    Padded int32 matrix and lengths of ``strings``, as read from a protobuf batch
+    """
+    encoded = [s.encode('utf-8') for s in strings]
+    width = max(len(encode_binary(b)) for b in encoded)
+    datas = np.zeros((len(encoded), width), dtype=np.int32)
+    for i, b in enumerate(encoded):
+        row = encode_binary(b)
+        datas[i, :len(row)] = row
+    lengths = np.array([[len(b)] for b in encoded], dtype=np.int32)
+    return datas, lengths
+
+
+def test_decode_strings_batch():
+    datas, lengths = string_batch()
+    assert decode_strings_batch(datas, lengths) == STRINGS
+    assert decode_strings_batch(datas, lengths.reshape(-1)) == STRINGS
+    assert decode_strings_batch(datas, lengths, encoding=None) == [
+        s.encode('utf-8') for s in STRINGS]
+    as_numpy = decode_strings_batch(datas, lengths, as_numpy=True)
+    assert isinstance(as_numpy, np.ndarray)
+    assert as_numpy.dtype == object
+    assert as_numpy.tolist() == STRINGS
+    assert list(decode_strings_numpy(datas, lengths)) == STRINGS
+
+
+def test_decode_strings_batch_errors():
+    datas, lengths = string_batch()
+    with pytest.raises(ValueError):
+        decode_strings_batch(datas, lengths[:-1])
+    lengths[1] = datas.shape[1] * 4 + 1
+    with pytest.raises(ValueError):
+        decode_strings_batch(datas, lengths)
+
+
+def test_decode_strings_torch():
+    torch = pytest.importorskip('torch')
+    datas, lengths = string_batch()
+    datas, lengths = torch.from_numpy(datas), torch.from_numpy(lengths)
+    assert decode_strings_batch(datas, lengths) == STRINGS
+    assert list(decode_strings_torch(datas, lengths)) == STRINGS
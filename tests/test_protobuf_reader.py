@@ -0,0 +1,134 @@
+import io
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('sagemaker')
+from sagemaker.amazon.record_pb2 import Record  # noqa: E402
+from sagemaker.amazon import common  # noqa: E402
+from aws_sagemaker_remote.util.protobuf import encode_feature, write_feature_tensor  # noqa: E402
+from aws_sagemaker_remote.util.protobuf_reader import (  # noqa: E402
+    parse_record, iterate_protobuf_batches, PackedInt32
+)
+from aws_sagemaker_remote.util.recordio import write_recordio  # noqa: E402
+
+INT32 = np.array([0, 1, -1, 127, 128, 300, 16384, -300, 2 ** 21, 2 ** 28,
+                  2 ** 31 - 1, -2 ** 31], dtype=np.int32)
+VECTORS = {
+    'int32': INT32,
+    'float32': np.linspace(-1, 1, 7, dtype=np.float32),
+    'float64': np.array([np.pi, -np.e, 1e300]),
+    'empty': np.zeros(0, dtype=np.int32),
+}
+
+
+def protobuf_features(data):
+    """
+    Parse with the protobuf runtime into a dict of NumPy arrays
+    """
+    record = Record()
+    record.ParseFromString(bytes(data))
+    features = {}
+    for key, value in record.features.items():
+        kind = value.WhichOneof('value')
+        tensor = getattr(value, kind)
+        dtype = {'int32_tensor': np.int32, 'float32_tensor': np.float32,
+                 'float64_tensor': np.float64}[kind]
+        values = np.array(tensor.values, dtype=dtype)
+        if tensor.keys:
+            dense = np.zeros(int(np.prod(tensor.shape)), dtype=dtype)
+            dense[np.array(tensor.keys, dtype=np.int64)] = values
+            values = dense
+        if tensor.shape:
+            values = values.reshape(list(tensor.shape))
+        features[key] = values
+    return features
+
+
+def assert_features_equal(actual, expected):
+    assert sorted(actual.keys()) == sorted(expected.keys())
+    for k, v in expected.items():
+        assert actual[k].dtype == v.dtype, k
+        np.testing.assert_array_equal(actual[k], v)
+
+
+@pytest.mark.parametrize('key', sorted(VECTORS))
+def test_parse_encode_feature(key):
+    data = b''.join(encode_feature(key, VECTORS[key]))
+    expected = protobuf_features(data)
+    assert_features_equal(parse_record(bytearray(data)), expected)
+    np.testing.assert_array_equal(expected[key], VECTORS[key])
+
+
+def test_parse_write_feature_tensor():
+    record = Record()
+    for k, v in VECTORS.items():
+        write_feature_tensor(record, v, k)
+    write_feature_tensor(record, b'\x00\xff' * 5, 'audio')
+    data = record.SerializeToString()
+    expected = protobuf_features(data)
+    assert_features_equal(parse_record(bytearray(data)), expected)
+    lazy = parse_record(bytearray(data), lazy=True)
+    assert isinstance(lazy['int32'], PackedInt32)
+    np.testing.assert_array_equal(lazy['int32'].decode(), INT32)
+
+
+def test_parse_sparse():
+    record = Record()
+    tensor = record.features['sparse'].float32_tensor
+    tensor.values.extend([1.5, -2.0, 3.25])
+    tensor.keys.extend([1, 4, 200])
+    tensor.shape.extend([3, 100])
+    tensor = record.features['ids'].int32_tensor
+    tensor.values.extend([-5, 1 << 20])
+    tensor.keys.extend([0, 5])
+    tensor.shape.extend([6])
+    data = record.SerializeToString()
+    expected = protobuf_features(data)
+    assert_features_equal(parse_record(bytearray(data)), expected)
+    assert expected['sparse'][2, 0] == 3.25
+
+
+def test_write_numpy_to_dense_tensor():
+    write = getattr(common, 'write_numpy_to_dense_tensor', None)
+    if write is None:
+        pytest.skip("sagemaker.amazon.common.write_numpy_to_dense_tensor not available")
+    # sagemaker writes arrays of the default int dtype as int32 tensors
+    for array in [np.arange(-12, 12).reshape(4, 6) * 1000,
+                  np.random.RandomState(0).rand(5, 3),
+                  np.random.RandomState(1).rand(5, 3).astype(np.float32)]:
+        f = io.BytesIO()
+        write(f, array)
+        f.seek(0)
+        batches = list(iterate_protobuf_batches(f, batch_size=2))
+        assert all(len(b['values']) == 2 for b in batches[:-1])
+        values = np.concatenate([b['values'] for b in batches])
+        np.testing.assert_array_equal(values, array.astype(values.dtype))
+
+
+def write_ragged(f, lengths):
+    for i, n in enumerate(lengths):
+        record = Record()
+        write_feature_tensor(record, (np.arange(n) * 1000 - i).astype(np.int32), 'ids')
+        write_feature_tensor(record, np.full(n, i, dtype=np.float32), 'weights')
+        write_recordio(f, record.SerializeToString())
+    f.seek(0)
+
+
+@pytest.mark.parametrize('drop_last', [False, True])
+def test_ragged_batches(drop_last):
+    lengths = [3, 1, 4, 1, 5, 9, 2]
+    f = io.BytesIO()
+    write_ragged(f, lengths)
+    batches = list(iterate_protobuf_batches(
+        f, batch_size=3, features=['ids', 'weights'], drop_last=drop_last))
+    assert len(batches) == (2 if drop_last else 3)
+    for b, batch in enumerate(batches):
+        rows = lengths[3 * b:3 * b + 3]
+        assert batch['ids'].shape == (len(rows), max(rows))
+        assert batch['ids'].dtype == np.int32
+        assert batch['weights'].dtype == np.float32
+        for r, n in enumerate(rows):
+            i = 3 * b + r
+            np.testing.assert_array_equal(batch['ids'][r, :n], np.arange(n) * 1000 - i)
+            assert not batch['ids'][r, n:].any()
+            np.testing.assert_array_equal(batch['weights'][r, :n], i)
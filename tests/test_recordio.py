@@ -0,0 +1,58 @@
+import io
+import pytest
+from aws_sagemaker_remote.util.recordio import write_recordio, iterate_records, MAGIC
+
+
+class PipeStream(object):
+    def __init__(self, data, chunk):
+        self.f = io.BytesIO(data)
+        self.chunk = chunk
+
+    def read(self, buf):
+        return self.f.readinto(buf[:self.chunk])
+
+
+def encode(records):
+    f = io.BytesIO()
+    for record in records:
+        write_recordio(f, record)
+    return f.getvalue()
+
+
+def test_recordio_roundtrip():
+    records = [bytes([i % 256]) * i for i in range(200)]
+    data = encode(records)
+    assert len(data) % 4 == 0
+    for buffer_size in [8, 13, 64, 1024 * 1024]:
+        read = [bytes(r) for r in iterate_records(io.BytesIO(data), buffer_size=buffer_size)]
+        assert read == records
+    read = [bytes(r) for r in iterate_records(PipeStream(data, 7), buffer_size=32)]
+    assert read == records
+
+
+def test_recordio_errors():
+    data = encode([b'abcdef'])
+    with pytest.raises(ValueError):
+        list(iterate_records(io.BytesIO(data[:-3])))
+    with pytest.raises(ValueError):
+        list(iterate_records(io.BytesIO(data[:5])))
+    with pytest.raises(ValueError):
+        list(iterate_records(io.BytesIO(b'\x00' * 4 + data[4:])))
+    assert hex(MAGIC) == '0xced7230a'
+
+
+def test_recordio_index(tmp_path):
+    pytest.importorskip('numpy')
+    from aws_sagemaker_remote.util.recordio_index import RecordIODataset, read_index, index_path
+    records = [bytes([i % 256]) * (i % 13) for i in range(100)]
+    path = str(tmp_path / 'shard.rec')
+    with open(path, 'wb') as f:
+        f.write(encode(records))
+    dataset = RecordIODataset(path)
+    offsets, lengths = read_index(index_path(path))
+    assert len(offsets) == len(dataset) == len(records)
+    assert [bytes(dataset[i]) for i in range(len(dataset))] == records
+    pairs = RecordIODataset(path, size=2)
+    assert [bytes(r) for r in pairs[3]] == records[6:8]
+    with pytest.raises(IndexError):
+        dataset[len(records)]
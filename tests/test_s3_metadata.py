@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+import pytest
+from fake_s3 import FakeS3, FakeS3Error
+
+pytest.importorskip('boto3')
+pytest.importorskip('sagemaker')
+from botocore.exceptions import ClientError  # noqa: E402
+from aws_sagemaker_remote import s3 as s3_module  # noqa: E402
+from aws_sagemaker_remote.s3 import (  # noqa: E402
+    S3MetadataCache, FileType, get_file_type, metadata_cache
+)
+from aws_sagemaker_remote.session import s3_client  # noqa: E402
+
+
+class ClientErrorS3(FakeS3):
+    """
+    Raises ``ClientError`` for missing keys, like boto3
+    """
+
+    def head_object(self, Bucket, Key):
+        try:
+            return super(ClientErrorS3, self).head_object(Bucket=Bucket, Key=Key)
+        except FakeS3Error:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+
+
+class DeniedListS3(ClientErrorS3):
+    def list_objects_v2(self, **kwargs):
+        self.call('list_objects_v2', kwargs.get('Prefix'))
+        raise ClientError({'Error': {'Code': 'AccessDenied'}}, 'ListObjectsV2')
+
+
+class RegionS3(FakeS3):
+    def __init__(self, region_name, **kwargs):
+        super(RegionS3, self).__init__(**kwargs)
+        self.meta = SimpleNamespace(region_name=region_name)
+
+
+class FakeSession(object):
+    def client(self, service, region_name=None, config=None):
+        return RegionS3(region_name)
+
+
+def test_file_type():
+    s3 = FakeS3({
+        'data/file.txt': b'f',
+        'data/folder/a': b'a',
+        'data/both': b'file',
+        'data/both/b': b'b',
+    })
+    assert get_file_type('s3://bucket/data/file.txt', s3) == FileType.FILE
+    assert get_file_type('s3://bucket/data/folder', s3) == FileType.FOLDER
+    assert get_file_type('s3://bucket/data/folder/', s3) == FileType.FOLDER
+    assert get_file_type('s3://bucket/data/both', s3) == FileType.FILE
+    # One LIST per lookup
+    assert s3.calls == {'list_objects_v2': 4}
+
+
+def test_file_type_sibling_keys():
+    # Siblings sort before "data/" and fill the first page, which is truncated
+    s3 = FakeS3({'data-old.txt': b'1', 'data.txt': b'2', 'data/part-0': b'3'})
+    assert get_file_type('s3://bucket/data', s3) == FileType.FOLDER
+    assert s3.calls['list_objects_v2'] == 2
+    s3 = FakeS3({'data-old.txt': b'1', 'data.txt': b'2', 'data0': b'3'})
+    with pytest.raises(ValueError):
+        get_file_type('s3://bucket/data', s3)
+
+
+def test_file_type_without_list_permission():
+    s3 = DeniedListS3({'data/file.txt': b'f'})
+    assert S3MetadataCache(s3).file_type('bucket', 'data/file.txt') == FileType.FILE
+    assert s3.calls['head_object'] == 1
+
+
+def test_misses_not_cached():
+    s3 = ClientErrorS3()
+    with pytest.raises(ValueError):
+        get_file_type('s3://bucket/data/new.txt', s3)
+    s3.put_object(Bucket='bucket', Key='data/new.txt', Body=b'new')
+    assert get_file_type('s3://bucket/data/new.txt', s3) == FileType.FILE
+    assert metadata_cache(s3).head('bucket', 'data/missing') is None
+    assert metadata_cache(s3).head('bucket', 'data/missing') is None
+    assert s3.calls['head_object'] == 2
+
+
+def test_cache_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(s3_module.time, 'monotonic', lambda: now[0])
+    s3 = FakeS3({'data/file.txt': b'f'})
+    cache = S3MetadataCache(s3, ttl=60)
+    assert cache.file_type('bucket', 'data/file.txt') == FileType.FILE
+    del s3.objects[('bucket', 'data/file.txt')]
+    now[0] += 59
+    assert cache.file_type('bucket', 'data/file.txt') == FileType.FILE
+    assert s3.calls['list_objects_v2'] == 1
+    now[0] += 2
+    assert cache.file_type('bucket', 'data/file.txt') is None
+    assert s3.calls['list_objects_v2'] == 2
+
+
+def test_cache_shared_by_session():
+    session = FakeSession()
+    small = s3_client(session)
+    large = s3_client(session, workers=1000)
+    assert small is not large
+    assert metadata_cache(small) is metadata_cache(large)
+    assert metadata_cache(small) is not metadata_cache(s3_client(FakeSession()))
+    assert metadata_cache(FakeS3()) is not metadata_cache(FakeS3())
@@ -0,0 +1,75 @@
+import io
+import json
+import pytest
+from fake_s3 import FakeS3, FakeS3Error
+from aws_sagemaker_remote.util.recordio import iterate_records
+
+pytest.importorskip('numpy')
+pytest.importorskip('sagemaker')
+pytest.importorskip('boto3')
+from aws_sagemaker_remote.util.s3_shards import S3ShardWriter  # noqa: E402
+from aws_sagemaker_remote.util.multipart import MIN_PART_SIZE  # noqa: E402
+from aws_sagemaker_remote.util.download import MB  # noqa: E402
+
+
+def read_records(data):
+    return [bytes(record) for record in iterate_records(io.BytesIO(data))]
+
+
+def test_s3_shard_writer():
+    s3 = FakeS3()
+    records = [bytes([i]) * (i * 13) for i in range(10)]
+    with S3ShardWriter(s3, 's3://bucket/data/train/', shard_records=3, index=True) as writer:
+        for record in records:
+            writer.write(record)
+    shards = ['data/train/shard-{:05d}.rec'.format(i) for i in range(4)]
+    assert s3.keys() == sorted(
+        shards + [k + '.idx' for k in shards] + ['data/train-manifest.json'])
+    assert [r for k in shards for r in read_records(s3.data(k))] == records
+    manifest = json.loads(s3.data('data/train-manifest.json'))
+    assert manifest == [{'prefix': 's3://bucket/data/train/'}] + [
+        'shard-{:05d}.rec'.format(i) for i in range(4)]
+    assert writer.records == 10
+
+
+def test_s3_shard_writer_multipart():
+    s3 = FakeS3()
+    record = b'x' * (MB - 8)
+    with S3ShardWriter(s3, 's3://bucket/data', shard_mb=6, part_size=MIN_PART_SIZE, workers=2) as writer:
+        for _ in range(13):
+            writer.write(record)
+    assert s3.calls['complete_multipart_upload'] == 2
+    assert not s3.uploads
+    keys = [k for k in s3.keys() if k.endswith('.rec')]
+    assert len(keys) == 3
+    assert sum(len(read_records(s3.data(k))) for k in keys) == 13
+
+
+def test_s3_shard_writer_failure_aborts_uploads():
+    # The first shard fails to complete while later shards are queued or still open
+    s3 = FakeS3(delay=0.02)
+    s3.fail[('complete_multipart_upload', 'data/shard-00000.rec')] = FakeS3Error("InternalError")
+    record = b'x' * (MB - 8)
+    with pytest.raises(FakeS3Error):
+        with S3ShardWriter(
+            s3, 's3://bucket/data', shard_mb=6, part_size=MIN_PART_SIZE, workers=2, max_closing=2
+        ) as writer:
+            for _ in range(60):
+                writer.write(record)
+    assert s3.calls['create_multipart_upload'] > 1
+    assert not s3.uploads
+    assert 'data-manifest.json' not in s3.keys()
+
+
+def test_s3_shard_writer_abort():
+    s3 = FakeS3()
+    record = b'x' * (MB - 8)
+    with pytest.raises(ValueError):
+        with S3ShardWriter(s3, 's3://bucket/data', shard_mb=6, part_size=MIN_PART_SIZE) as writer:
+            for _ in range(17):
+                writer.write(record)
+            raise ValueError("stop")
+    assert s3.calls['create_multipart_upload'] == 3
+    # Shards are completed if their upload started before the error, otherwise aborted
+    assert s3.calls.get('complete_multipart_upload', 0) + s3.calls['abort_multipart_upload'] == 3
+    assert not s3.uploads
@@ -0,0 +1,33 @@
+import csv
+import io
+import pytest
+from fake_s3 import FakeS3
+
+pytest.importorskip('boto3')
+pytest.importorskip('sagemaker')
+from aws_sagemaker_remote.s3 import iterate_file_lines, iterate_file_jsonlines, open_file_text  # noqa: E402
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+@pytest.mark.parametrize('read_ahead', [0, 2])
+def test_iterate_file_lines(chunk_size, read_ahead):
+    text = 'first\r\nsecond\n\nünïcode\n' + 'x' * 5000 + '\nlast'
+    s3 = FakeS3({'lines.txt': text.encode('utf-8')})
+    lines = list(iterate_file_lines(
+        url='s3://bucket/lines.txt', s3=s3, chunk_size=chunk_size, read_ahead=read_ahead))
+    assert lines == ['first', 'second', '', 'ünïcode', 'x' * 5000, 'last']
+
+
+def test_iterate_file_jsonlines():
+    s3 = FakeS3({'a.jsonl': b'{"a": 1}\n\n{"a": 2}\n'})
+    assert list(iterate_file_jsonlines(url='s3://bucket/a.jsonl', s3=s3, chunk_size=4)) == [
+        {'a': 1}, {'a': 2}]
+
+
+def test_csv_quoted_newlines():
+    rows = [['bucket', 'key with\nnewline', 'ok'], ['bucket', 'plain', 'error, "quoted"\r\nline']]
+    out = io.StringIO(newline='')
+    csv.writer(out).writerows(rows)
+    s3 = FakeS3({'report.csv': out.getvalue().encode('utf-8')})
+    with open_file_text(url='s3://bucket/report.csv', s3=s3, newline='', chunk_size=5) as f:
+        assert list(csv.reader(f)) == rows
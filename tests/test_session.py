@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip('boto3')
+import aws_sagemaker_remote  # noqa: E402
+from aws_sagemaker_remote.session import get_client, s3_client  # noqa: E402
+
+
+class FakeClient(object):
+    def __init__(self, service, region_name=None, config=None):
+        self.service = service
+        self.region_name = region_name
+        self.config = config
+
+
+class FakeSession(object):
+    def client(self, service, region_name=None, config=None):
+        return FakeClient(service, region_name=region_name, config=config)
+
+
+def test_shared_client():
+    session = FakeSession()
+    client = get_client(session, 's3')
+    assert get_client(session, 's3') is client
+    assert s3_client(session) is client
+    assert get_client(SimpleNamespace(boto_session=session), 's3') is client
+    assert get_client(FakeSession(), 's3') is not client
+
+
+def test_client_settings():
+    session = FakeSession()
+    client = get_client(session, 's3')
+    regional = get_client(session, 's3', region_name='us-west-2')
+    pooled = get_client(session, 's3', max_pool_connections=200)
+    assert len({id(client), id(regional), id(pooled)}) == 3
+    assert regional.region_name == 'us-west-2'
+    assert get_client(session, 's3', region_name='us-west-2') is regional
+    assert get_client(session, 's3', max_pool_connections=200) is pooled
+    assert s3_client(session, workers=200) is pooled
+    assert get_client(session, 'sagemaker') is not client
+
+
+def test_import_without_sagemaker():
+    # Inference containers import the session module without sagemaker installed
+    code = (
+        "import sys\n"
+        "sys.modules['sagemaker'] = None\n"
+        "import aws_sagemaker_remote.session\n"
+    )
+    root = os.path.dirname(os.path.dirname(aws_sagemaker_remote.__file__))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
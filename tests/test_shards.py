@@ -0,0 +1,78 @@
+import json
+import os
+import pytest
+from aws_sagemaker_remote.util.recordio import iterate_records
+
+pytest.importorskip('numpy')
+pytest.importorskip('sagemaker')
+from aws_sagemaker_remote.util.shards import write_shards  # noqa: E402
+from aws_sagemaker_remote.util.protobuf import decode_strings_batch  # noqa: E402
+from aws_sagemaker_remote.util.protobuf_reader import iterate_protobuf_records  # noqa: E402
+from aws_sagemaker_remote.util.recordio_index import RecordIODataset, index_path  # noqa: E402
+
+
+def write_samples(directory, count=20):
+    samples = {}
+    for i in range(count):
+        key = "{}/{:03d}".format('ab'[i % 2], i)
+        samples[key] = [bytes([i]) * (i * 37 % 101), "text {}".format(i).encode()]
+        for extension, data in zip(['.wav', '.txt'], samples[key]):
+            path = directory / (key + extension)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+    # Examples missing an extension are skipped
+    (directory / 'a' / 'orphan.wav').write_bytes(b'orphan')
+    return samples
+
+
+def read_shard(path):
+    with open(path, 'rb') as f:
+        return [bytes(record) for record in iterate_records(f)]
+
+
+def test_write_shards_recordio(tmp_path):
+    samples = write_samples(tmp_path / 'input')
+    output = str(tmp_path / 'output')
+    with pytest.warns(UserWarning):
+        shards = write_shards(
+            str(tmp_path / 'input'), output, extensions=['wav', 'txt'],
+            shard_records=6, workers=2, manifest_prefix='s3://bucket/shards', index=True)
+    assert [shard['examples'] for shard in shards] == [6, 6, 6, 2]
+    records = []
+    for shard in shards:
+        assert shard['bytes'] == os.path.getsize(shard['path'])
+        assert os.path.exists(index_path(shard['path']))
+        records.extend(read_shard(shard['path']))
+    assert records == [data for key in sorted(samples) for data in samples[key]]
+    with open(output + '-manifest.json') as f:
+        manifest = json.load(f)
+    assert manifest == [{'prefix': 's3://bucket/shards/'}] + [
+        'shard-{:05d}.rec'.format(i) for i in range(4)]
+    dataset = RecordIODataset([shard['path'] for shard in shards], size=2)
+    assert len(dataset) == len(samples)
+    assert [bytes(r) for r in dataset[7]] == samples[sorted(samples)[7]]
+
+
+def test_write_shards_protobuf(tmp_path):
+    samples = write_samples(tmp_path / 'input', count=9)
+    output = str(tmp_path / 'output')
+    with pytest.warns(UserWarning):
+        shards = write_shards(
+            str(tmp_path / 'input'), output, extensions=['.wav', '.txt'], format='protobuf',
+            shard_records=4, name='train', manifest=str(tmp_path / 'manifest.json'),
+            shuffle_seed=3)
+    assert [shard['examples'] for shard in shards] == [4, 4, 1]
+    with open(str(tmp_path / 'manifest.json')) as f:
+        manifest = json.load(f)
+    assert manifest[0] == {'prefix': output + '/'}
+    assert manifest[1:] == [os.path.basename(shard['path']) for shard in shards]
+    examples = []
+    for name in manifest[1:]:
+        with open(os.path.join(output, name), 'rb') as f:
+            for features in iterate_protobuf_records(f):
+                examples.append([
+                    decode_strings_batch(features[k][None], features[k + '_length'], encoding=None)[0]
+                    for k in ['wav', 'txt']])
+    assert len(examples) == len(samples)
+    assert sorted(examples) == sorted(samples.values())
+    assert examples != [samples[key] for key in sorted(samples)]
@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+from aws_sagemaker_remote.util import shuffle
+from aws_sagemaker_remote.util.shuffle import epoch_seed, shuffle_iterable
+
+
+def test_shuffle_iterable():
+    items = list(range(1000))
+    shuffled = list(shuffle_iterable(items, buffer_size=100, seed=3))
+    assert sorted(shuffled) == items
+    assert shuffled != items
+    assert list(shuffle_iterable(items, buffer_size=100, seed=3)) == shuffled
+
+
+def test_epoch_seed_workers(monkeypatch):
+    assert epoch_seed(None, 2) is None
+    assert epoch_seed(5, 2) == 7
+    seeds = set()
+    for worker in range(4):
+        monkeypatch.setattr(
+            shuffle, 'get_worker_info', lambda: SimpleNamespace(id=worker, num_workers=4))
+        for epoch in range(3):
+            seeds.add(epoch_seed(5, epoch))
+            assert epoch_seed(5, epoch, worker=0) == 5 + epoch
+    assert len(seeds) == 12
@@ -0,0 +1,71 @@
+import os
+import pytest
+from fake_s3 import FakeS3
+
+pytest.importorskip('boto3')
+from aws_sagemaker_remote.util import sync as sync_module  # noqa: E402
+from aws_sagemaker_remote.util.sync import sync_upload  # noqa: E402
+
+
+def write(path, data, mtime=None):
+    with open(path, 'wb') as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def sync(s3, src, compare='mtime'):
+    uploaded, skipped = sync_upload(
+        s3=s3, src=str(src), Bucket='bucket', Key='data', compare=compare, verbose=False)
+    return uploaded.files, skipped.files
+
+
+@pytest.mark.parametrize('compare', ['mtime', 'md5'])
+def test_sync(tmpdir, compare):
+    s3 = FakeS3()
+    os.makedirs(str(tmpdir.join('sub')))
+    write(str(tmpdir.join('a.txt')), b'aaaa')
+    write(str(tmpdir.join('sub', 'b.txt')), b'bbbb')
+    assert sync(s3, tmpdir, compare) == (2, 0)
+    assert s3.keys() == ['data/a.txt', 'data/sub/b.txt']
+    assert sync(s3, tmpdir, compare) == (0, 2)
+
+    # Same size, modification time before the upload: only detected by md5
+    uploaded_at = s3.objects[('bucket', 'data/a.txt')].LastModified
+    write(str(tmpdir.join('a.txt')), b'AAAA', mtime=uploaded_at - 100)
+    if compare == 'mtime':
+        assert sync(s3, tmpdir, compare) == (0, 2)
+        assert s3.data('data/a.txt') == b'aaaa'
+    else:
+        assert sync(s3, tmpdir, compare) == (1, 1)
+        assert s3.data('data/a.txt') == b'AAAA'
+
+    # Touched but unchanged: uploaded again only by mtime
+    os.utime(str(tmpdir.join('sub', 'b.txt')), (uploaded_at + 100, uploaded_at + 100))
+    assert sync(s3, tmpdir, compare) == ((1, 1) if compare == 'mtime' else (0, 2))
+
+
+def test_sync_mtime_no_hash(tmpdir, monkeypatch):
+    s3 = FakeS3()
+    write(str(tmpdir.join('a.txt')), b'aaaa')
+    assert sync(s3, tmpdir) == (1, 0)
+
+    def calc_etag(*args, **kwargs):
+        raise AssertionError("mtime mode hashed a file")
+    monkeypatch.setattr(sync_module, 'calc_etag', calc_etag)
+    assert sync(s3, tmpdir) == (0, 1)
+
+
+def test_sync_kms(tmpdir):
+    s3 = FakeS3()
+    write(str(tmpdir.join('a.txt')), b'aaaa')
+    assert sync(s3, tmpdir) == (1, 0)
+    obj = s3.objects[('bucket', 'data/a.txt')]
+    # SSE-KMS ETags are not the MD5 of the data
+    obj.ETag = '"0123456789abcdef0123456789abcdef"'
+    obj.headers['ServerSideEncryption'] = 'aws:kms'
+    os.utime(str(tmpdir.join('a.txt')), (obj.LastModified - 100, obj.LastModified - 100))
+    assert sync(s3, tmpdir) == (0, 1)
+    assert sync(s3, tmpdir, 'md5') == (0, 1)
+    os.utime(str(tmpdir.join('a.txt')), (obj.LastModified + 100, obj.LastModified + 100))
+    assert sync(s3, tmpdir) == (1, 0)
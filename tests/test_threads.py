@@ -0,0 +1,45 @@
+import itertools
+import pytest
+from aws_sagemaker_remote.util.threads import PrefetchIterator, prefetch_iterable
+
+
+@pytest.mark.parametrize('depth', [1, 4, 100])
+def test_prefetch_order(depth):
+    with PrefetchIterator(range(50), depth=depth) as items:
+        assert list(items) == list(range(50))
+        assert items.count == 50
+    assert list(prefetch_iterable(iter('abc'), depth)) == ['a', 'b', 'c']
+
+
+def test_prefetch_error():
+    def fail():
+        yield 1
+        yield 2
+        raise ValueError("bad record")
+
+    items = PrefetchIterator(fail(), depth=2)
+    assert next(items) == 1
+    assert next(items) == 2
+    with pytest.raises(ValueError, match="bad record"):
+        next(items)
+    with pytest.raises(StopIteration):
+        next(items)
+
+
+def test_prefetch_close():
+    produced = itertools.count()
+
+    def forever():
+        while True:
+            yield next(produced)
+
+    items = PrefetchIterator(forever(), depth=3)
+    assert [next(items) for _ in range(5)] == list(range(5))
+    items.close()
+    items.thread.join(timeout=5)
+    assert not items.thread.is_alive()
+    # The producer stops once the queue is full
+    assert next(produced) <= 5 + 3 + 2
+    with pytest.raises(StopIteration):
+        next(items)
+